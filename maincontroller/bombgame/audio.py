@@ -1,22 +1,31 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from asyncio import wrap_future, get_running_loop, AbstractEventLoop, run_coroutine_threadsafe
+import asyncio
+from asyncio import wrap_future, get_running_loop, AbstractEventLoop, run_coroutine_threadsafe, TimerHandle
+from collections import deque
 from concurrent.futures import Future
 from enum import Enum
+from hashlib import sha1
+from heapq import heapify, heappop, heappush
+from itertools import count
 from logging import getLogger
-from math import floor
-from os import listdir
-from os.path import dirname, realpath, join, isfile, isdir
-from random import choice
-from threading import current_thread, Thread
-from time import monotonic
-from typing import NamedTuple, Dict, List, Optional, TYPE_CHECKING, Collection
-import wave
+from mmap import mmap, ACCESS_READ
+from os import makedirs, replace, stat
+from os.path import dirname, realpath, join, isfile
+from tempfile import NamedTemporaryFile
+from threading import Thread, Event as ThreadEvent
+from time import monotonic, perf_counter
+from typing import (NamedTuple, Dict, List, Optional, TYPE_CHECKING, Collection, Set, Tuple, Iterator, Deque, Union,
+                    Callable)
 
 import pygame
 
-from bombgame.config import AUDIO_CHANNELS, ROOM_MUSIC_ENABLED, MUSIC_VOLUME, SOUND_VOLUME
+from bombgame.config import (AUDIO_CHANNELS, ROOM_MUSIC_ENABLED, SOUND_VOLUME, SOUND_CACHE_FOLDER,
+                             AUDIO_END_POLL_INTERVAL)
+from bombgame.metrics import LATENCY
+from bombgame.music import (MusicStemLoaded, SelectMusicStem, MusicStemPrepared, PlayMusic, StopMusic, MusicMixer,
+                            MusicManager)
 from bombgame.roomserver.common import RoomServerChannel
 from bombgame.websocket import InvalidMessage
 
@@ -27,12 +36,8 @@ if TYPE_CHECKING:
 SOUND_REGISTRY: Dict[type, List[SoundSpec]] = {}
 
 SOUND_FOLDER = join(dirname(dirname(dirname(realpath(__file__)))), "sounds")
-MUSIC_FOLDER = join(SOUND_FOLDER, "music")
 
-AUDIO_EVENT = pygame.USEREVENT
 AUDIO_END_EVENT = pygame.USEREVENT + 1
-MUSIC_END_EVENT = pygame.USEREVENT + 2
-MUSIC_REQUEUE_EVENT = pygame.USEREVENT + 3
 
 # how many seconds to wait before forgetting room audio that hasn't been marked as playing
 UNACKED_ROOM_AUDIO_LIFETIME = 10
@@ -40,14 +45,106 @@ UNACKED_ROOM_AUDIO_LIFETIME = 10
 LOGGER = getLogger("Audio")
 
 
-class AudioEvent(Enum):
-    LOAD_SOUND = "load_sound"
-    LOAD_MUSIC = "load_music"
-    PLAY_SOUND = "play_sound"
-    PLAY_MUSIC = "play_music"
-    STOP_SOUND = "stop_sound"
-    STOP_MUSIC = "stop_music"
-    STOP_ALL = "stop_all"
+class LoadSound(NamedTuple):
+    filename: str
+
+
+class SoundsLoaded(NamedTuple):
+    """Completes ``done`` when the commands queued before it have been handled."""
+    done: Future
+
+
+class PlaySound(NamedTuple):
+    sound: LocalPlayingSound
+    # the perf_counter() time when the sound was requested
+    requested: float
+
+
+class ScheduleSound(NamedTuple):
+    sound: LocalPlayingSound
+    # the time.monotonic() time to start the sound at
+    at: float
+
+
+class StopSound(NamedTuple):
+    sound: LocalPlayingSound
+
+
+class StopAllSounds(NamedTuple):
+    pass
+
+
+class StopAudio(NamedTuple):
+    pass
+
+
+AudioCommand = Union[LoadSound, SoundsLoaded, PlaySound, ScheduleSound, StopSound, StopAllSounds, MusicStemLoaded,
+                     SelectMusicStem, MusicStemPrepared, PlayMusic, StopMusic, StopAudio]
+
+
+class AudioStoppedError(Exception):
+    """Raised by the futures of ``SoundsLoaded`` commands that the audio thread exited without handling."""
+
+
+class AudioCommandQueue:
+    """Hands commands to the audio thread without going through the SDL event queue.
+
+    Commands can be put from any thread. The audio thread wakes up when commands are put and takes all of the queued
+    commands at once. When the audio thread exits, it closes the queue, after which commands are discarded and the
+    futures of ``SoundsLoaded`` commands complete instead of waiting forever.
+    """
+
+    _commands: Deque[AudioCommand]
+    _wakeup: ThreadEvent
+    _closed: bool
+    _failed: bool
+
+    def __init__(self):
+        self._commands = deque()
+        self._wakeup = ThreadEvent()
+        self._closed = False
+        self._failed = False
+
+    def put(self, command: AudioCommand):
+        self._commands.append(command)
+        self._wakeup.set()
+        # the command was either appended before close() drained the queue, or has to be discarded here
+        if self._closed:
+            self._discard(self.drain())
+
+    def close(self, unhandled: Collection[AudioCommand] = (), failed: bool = False):
+        """Discards the queued commands and the given ones taken from the queue, and all commands put afterwards.
+
+        The futures of discarded ``SoundsLoaded`` commands are cancelled, or fail with ``AudioStoppedError`` if
+        ``failed`` is set because the audio thread crashed.
+        """
+        self._failed = failed
+        self._closed = True
+        self._discard([*unhandled, *self.drain()])
+
+    def _discard(self, commands: Collection[AudioCommand]):
+        for command in commands:
+            if not isinstance(command, SoundsLoaded) or command.done.done():
+                continue
+            if not self._failed:
+                command.done.cancel()
+            elif command.done.running() or command.done.set_running_or_notify_cancel():
+                command.done.set_exception(AudioStoppedError("audio thread stopped before loading the sounds"))
+
+    def drain(self) -> List[AudioCommand]:
+        commands = []
+        try:
+            while True:
+                commands.append(self._commands.popleft())
+        except IndexError:
+            return commands
+
+    def wait(self, timeout: Optional[float]) -> List[AudioCommand]:
+        """Waits up to ``timeout`` seconds (forever if None) for commands to be put, then takes all queued commands."""
+        self._wakeup.wait(timeout)
+        # clear before draining, so that a command put during the drain sets the event again
+        self._wakeup.clear()
+        return self.drain()
 
 
 class PlayingSound(ABC):
@@ -57,24 +154,48 @@ class PlayingSound(ABC):
 
 
 class LocalPlayingSound(PlayingSound):
-    _pygame_thread: Thread
+    _commands: AudioCommandQueue
     channel: Optional[PlaybackChannel]
     filename: str
     priority: int
     remote_id: Optional[int]
+    # the time.monotonic() time when the sound started playing
+    started: Optional[float]
+    stopped: bool
 
-    def __init__(self, filename: str, priority: int):
-        self._pygame_thread = current_thread()
+    def __init__(self, filename: str, priority: int, commands: AudioCommandQueue):
+        self._commands = commands
         self.filename = filename
         self.priority = priority
         self.remote_id = None
         self.channel = None
+        self.started = None
+        self.stopped = False
+
+    def stop(self):
+        self._commands.put(StopSound(self))
+
+
+class DelayedPlayingSound(PlayingSound):
+    """A sound that is started at a given time by the event loop, for sounds that the audio thread can't schedule."""
+
+    _handle: Optional[TimerHandle]
+    _playing: Optional[PlayingSound]
+
+    def __init__(self, loop: AbstractEventLoop, at: float, play: Callable[[], Optional[PlayingSound]]):
+        self._handle = loop.call_at(at, self._play, play)
+        self._playing = None
+
+    def _play(self, play: Callable[[], Optional[PlayingSound]]):
+        self._handle = None
+        self._playing = play()
 
     def stop(self):
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.STOP_SOUND,
-            "sound": self,
-        }))
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        elif self._playing is not None:
+            self._playing.stop()
 
 
 class RemotePlayingSound(PlayingSound):
@@ -101,17 +222,24 @@ class RemotePlayingSound(PlayingSound):
 
 class PlaybackChannel:
     channel: pygame.mixer.Channel
+    index: int
     end: float
     current_sound: Optional[LocalPlayingSound]
+    generation: int
+    ignored_ends: int
 
-    def __init__(self, channel: pygame.mixer.ChannelType):
+    def __init__(self, channel: pygame.mixer.ChannelType, index: int):
         self.channel = channel
+        self.index = index
         self.end = monotonic()
         self.current_sound = None
+        self.generation = 0
+        self.ignored_ends = 0
 
     def play(self, sound: pygame.mixer.Sound, playing: LocalPlayingSound):
         self.channel.play(sound)
-        self.end = monotonic() + sound.get_length()
+        playing.started = monotonic()
+        self.end = playing.started + sound.get_length()
         self.current_sound = playing
         playing.channel = self
 
@@ -120,6 +248,84 @@ class PlaybackChannel:
         return self.current_sound.priority if self.current_sound is not None else -1
 
 
+# priority, end time, generation, channel index
+_BusyChannelEntry = Tuple[int, float, int, int]
+
+
+class ChannelPool:
+    """The playback channels of the mixer, tracking which ones are free without querying the mixer.
+
+    A channel is free from the start and again after the end event of its sound. Busy channels are kept in a heap
+    ordered by the priority and end time of their sound, so that the channel to preempt when all of them are busy is
+    found without scanning them. Heap entries of channels that have since been freed or reused are skipped lazily.
+    """
+
+    _channels: List[PlaybackChannel]
+    _free: List[PlaybackChannel]
+    _busy: List[_BusyChannelEntry]
+    _generations: Iterator[int]
+
+    def __init__(self, channels: Collection[pygame.mixer.ChannelType]):
+        self._channels = [PlaybackChannel(channel, index) for index, channel in enumerate(channels)]
+        self._free = self._channels[::-1]
+        self._busy = []
+        self._generations = count(1)
+
+    def __iter__(self) -> Iterator[PlaybackChannel]:
+        return iter(self._channels)
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    @property
+    def busy(self) -> bool:
+        """Whether any channel has a sound that hasn't ended yet."""
+        return len(self._free) < len(self._channels)
+
+    def _is_current(self, entry: _BusyChannelEntry) -> bool:
+        channel = self._channels[entry[3]]
+        return channel.current_sound is not None and channel.generation == entry[2]
+
+    def acquire(self, priority: int) -> Optional[PlaybackChannel]:
+        """Finds a channel for a sound of the given priority.
+
+        Returns a free channel if there is one, or else the busy channel with the lowest priority and the sound ending
+        soonest, unless its priority is higher than the given one. A returned channel must be passed to ``play``.
+        """
+        if self._free:
+            return self._free.pop()
+        busy = self._busy
+        while busy and not self._is_current(busy[0]):
+            heappop(busy)
+        if not busy or busy[0][0] > priority:
+            return None
+        return self._channels[heappop(busy)[3]]
+
+    def play(self, channel: PlaybackChannel, sound: pygame.mixer.Sound, playing: LocalPlayingSound):
+        """Plays a sound on a channel returned by ``acquire``, stopping the sound playing on it if necessary."""
+        if channel.current_sound is not None:
+            # the mixer sends an end event for the preempted sound, which must not free the channel
+            channel.ignored_ends += 1
+        channel.play(sound, playing)
+        channel.generation = next(self._generations)
+        heappush(self._busy, (playing.priority, channel.end, channel.generation, channel.index))
+        if len(self._busy) > 2 * len(self._channels):
+            self._busy = [entry for entry in self._busy if self._is_current(entry)]
+            heapify(self._busy)
+
+    def ended(self, index: int) -> Optional[LocalPlayingSound]:
+        """Handles the end event of a channel. Returns the sound that ended, if the channel was not preempted."""
+        channel = self._channels[index]
+        if channel.ignored_ends:
+            channel.ignored_ends -= 1
+            return None
+        sound = channel.current_sound
+        if sound is not None:
+            channel.current_sound = None
+            self._free.append(channel)
+        return sound
+
+
 class AudioLocation(Enum):
     BOMB_ONLY = "bomb_only"
     PREFER_ROOM = "prefer_room"
@@ -131,12 +337,6 @@ class SoundSpec(NamedTuple):
     location: AudioLocation
 
 
-class MusicTrack(NamedTuple):
-    name: str
-    filenames: List[str]
-    loop_duration: float
-
-
 def register_sound(owner_class: type, filename: str, location: AudioLocation) -> SoundSpec:
     path = join(SOUND_FOLDER, filename)
     if not isfile(path):
@@ -147,42 +347,128 @@ def register_sound(owner_class: type, filename: str, location: AudioLocation) ->
     return sound
 
 
+class SoundBank:
+    """Sound effects decoded into the mixer's sample format, so that playing them requires no further decoding.
+
+    With a cache folder, the decoded samples are also stored in files named by a hash of the source file's path, size
+    and modification time and the mixer format. Later loads of the same file, including ones by another process on the
+    same machine such as the room server, memory-map the cached samples instead of decoding the file again.
+
+    Sounds must be loaded on the pygame thread after the mixer has been initialized.
+    """
+
+    _sounds: Dict[str, pygame.mixer.Sound]
+    _cache_folder: Optional[str]
+
+    def __init__(self, cache_folder: Optional[str] = SOUND_CACHE_FOLDER):
+        self._sounds = {}
+        self._cache_folder = cache_folder
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._sounds
+
+    def __len__(self) -> int:
+        return len(self._sounds)
+
+    def get(self, filename: str) -> Optional[pygame.mixer.Sound]:
+        return self._sounds.get(filename)
+
+    def load(self, filename: str) -> pygame.mixer.Sound:
+        sound = self._sounds.get(filename)
+        if sound is not None:
+            return sound
+        path = join(SOUND_FOLDER, filename)
+        cache_path = self._cache_path(path) if self._cache_folder is not None else None
+        sound = self._load_cached(cache_path) if cache_path is not None else None
+        if sound is None:
+            LOGGER.debug("Decoding sound %s", filename)
+            sound = pygame.mixer.Sound(path)
+            if cache_path is not None:
+                self._store_cached(cache_path, sound)
+        # avoid sound distortion by capping volume
+        # doing this here ensures that no clipping occurs in pygame/SDL mixer and allows us to ignore system volume
+        sound.set_volume(SOUND_VOLUME)
+        self._sounds[filename] = sound
+        return sound
+
+    def _cache_path(self, path: str) -> str:
+        # a changed file gets a new size or modification time, so the file itself doesn't have to be read
+        file_stat = stat(path)
+        key = (pygame.mixer.get_init(), realpath(path), file_stat.st_size, file_stat.st_mtime_ns)
+        return join(self._cache_folder, sha1(repr(key).encode()).hexdigest() + ".pcm")
+
+    @staticmethod
+    def _load_cached(cache_path: str) -> Optional[pygame.mixer.Sound]:
+        try:
+            with open(cache_path, "rb") as file, mmap(file.fileno(), 0, access=ACCESS_READ) as samples:
+                return pygame.mixer.Sound(buffer=samples)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, pygame.error):
+            LOGGER.warning("Ignoring unreadable cached sound %s", cache_path, exc_info=True)
+            return None
+
+    def _store_cached(self, cache_path: str, sound: pygame.mixer.Sound):
+        # write to a temporary file first so that other processes never map a partially written file
+        try:
+            makedirs(self._cache_folder, exist_ok=True)
+            with NamedTemporaryFile(dir=self._cache_folder, suffix=".tmp", delete=False) as file:
+                file.write(sound.get_raw())
+            replace(file.name, cache_path)
+        except OSError:
+            LOGGER.warning("Failed to cache decoded sound to %s", cache_path, exc_info=True)
+
+
 class SoundSystem:
-    _loaded_sounds: Dict[str, pygame.mixer.Sound]
-    _playback_channels: List[PlaybackChannel]
+    _bank: SoundBank
+    _requested_sounds: Set[str]
+    _channels: Optional[ChannelPool]
     _music: Optional[MusicManager]
-    _queued_music: Optional[str]
-    _music_playing: bool
+    _music_mixer: Optional[MusicMixer]
+    _commands: AudioCommandQueue
+    _scheduled: List[Tuple[float, int, LocalPlayingSound]]
     _pygame_thread: Optional[Thread]
     _pygame_init: Future[None]
     _loop: AbstractEventLoop
+    loaded: Optional[asyncio.Future]
 
     def __init__(self):
-        self._loaded_sounds = {}
-        self._playback_channels = []
+        self._bank = SoundBank()
+        self._requested_sounds = set()
+        self._channels = None
         self._music = None
-        self._queued_music = None
-        self._music_playing = False
+        self._music_mixer = None
+        self._commands = AudioCommandQueue()
+        self._scheduled = []
+        self._schedule_order = count()
         self._pygame_thread = None
         self._pygame_init = Future()
         self._loop = get_running_loop()
+        self.loaded = None
+
+    def load_sounds(self, classes: Collection[type]) -> asyncio.Future:
+        """Requests the sounds of the given classes to be loaded.
 
-    def load_sounds(self, classes: Collection[type]):
+        Returns a future that completes when the sounds to be played locally have been loaded.
+        """
         LOGGER.info("Loading sounds for %d classes", len(classes))
         for module_class in classes:
             for sound in SOUND_REGISTRY.get(module_class, []):
                 self._load_sound_in_location(sound)
-        # TODO: add method of waiting for this to complete
+        # the pygame thread handles commands in order, so this completes after all the loads above
+        done = Future()
+        self._commands.put(SoundsLoaded(done))
+        return wrap_future(done)
 
     def _load_sound_in_location(self, sound: SoundSpec):
         self._load_sound_locally(sound.filename)
 
     def _load_sound_locally(self, filename: str):
+        if filename in self._requested_sounds:
+            return
+        self._requested_sounds.add(filename)
         LOGGER.debug("Requesting load for sound %s", filename)
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.LOAD_SOUND,
-            "filename": filename,
-        }))
+        self._commands.put(LoadSound(filename))
 
     async def start(self):
         if self._pygame_thread is not None:
@@ -191,34 +477,122 @@ class SoundSystem:
         self._pygame_thread = Thread(target=self._pygame_event_thread, name="Pygame thread")
         self._pygame_thread.start()
         await wrap_future(self._pygame_init)
+        # decode all known sounds before any of them are needed instead of when the bomb is being initialized
+        self.loaded = self.load_sounds(SOUND_REGISTRY.keys())
 
     def stop(self):
         LOGGER.info("Stopping local audio playback")
         if self._pygame_thread is not None:
-            pygame.fastevent.post(pygame.event.Event(pygame.QUIT, {}))
+            self._commands.put(StopAudio())
             self._pygame_thread.join()
 
     def play_sound_locally(self, filename: str, priority: int) -> LocalPlayingSound:
         LOGGER.debug("Requesting playback for priority %s sound %s", priority, filename)
-        playing = LocalPlayingSound(filename, priority)
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.PLAY_SOUND,
-            "sound": playing,
-        }))
+        playing = LocalPlayingSound(filename, priority, self._commands)
+        self._commands.put(PlaySound(playing, perf_counter()))
+        return playing
+
+    def schedule_sound_locally(self, filename: str, priority: int, at: float) -> LocalPlayingSound:
+        """Requests a sound to be played at the given ``time.monotonic()`` time, the time of the event loop.
+
+        The sound is started by the audio thread, so it plays on time even if the event loop is busy at that moment.
+        Stopping the returned sound before it has started cancels it.
+        """
+        LOGGER.debug("Scheduling priority %s sound %s in %.3f seconds", priority, filename, at - monotonic())
+        playing = LocalPlayingSound(filename, priority, self._commands)
+        self._commands.put(ScheduleSound(playing, at))
         return playing
 
     def stop_all_sounds(self):
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.STOP_ALL,
-        }))
+        self._commands.put(StopAllSounds())
 
     def _sound_stopped(self, sound: LocalPlayingSound):
         LOGGER.debug("Sound %s ended", sound.filename)
 
-    def _stop_music(self):
-        self._queued_music = None
-        self._music_playing = False
-        pygame.mixer.music.stop()
+    def _play(self, sound: LocalPlayingSound) -> bool:
+        clip = self._bank.get(sound.filename)
+        if clip is None:
+            LOGGER.error(f"sound file not loaded: {sound.filename}")
+            return False
+        # find a free channel, or the lowest-priority channel with the sound ending soonest to override
+        channel = self._channels.acquire(sound.priority)
+        if channel is None:
+            LOGGER.warning("Out of channels, not playing priority %d audio %s", sound.priority, sound.filename)
+            return False
+        to_stop = channel.current_sound
+        if to_stop is not None:
+            LOGGER.warning("Out of channels, stopping priority %d audio %s with %s seconds left",
+                           channel.priority, to_stop.filename, channel.end - monotonic())
+        # play the sound
+        LOGGER.debug("Playing priority %d audio %s", sound.priority, sound.filename)
+        self._channels.play(channel, clip, sound)
+        return True
+
+    def _play_scheduled(self) -> float:
+        """Plays the scheduled sounds that are due. Returns the time until the next one is due, or infinity."""
+        scheduled = self._scheduled
+        while scheduled:
+            at, _, sound = scheduled[0]
+            now = monotonic()
+            if at > now:
+                return at - now
+            heappop(scheduled)
+            if not sound.stopped and self._play(sound) and LATENCY.enabled:
+                LATENCY.record("scheduled sound -> play", sound.started - at)
+        return float("inf")
+
+    def _handle_command(self, command: AudioCommand):
+        if isinstance(command, PlaySound):
+            if self._play(command.sound) and LATENCY.enabled:
+                LATENCY.record("sound request -> play", perf_counter() - command.requested)
+
+        elif isinstance(command, ScheduleSound):
+            heappush(self._scheduled, (command.at, next(self._schedule_order), command.sound))
+
+        elif isinstance(command, StopSound):
+            sound = command.sound
+            sound.stopped = True
+            if sound.channel is not None and sound.channel.current_sound is sound:
+                sound.channel.channel.stop()
+
+        elif isinstance(command, StopAllSounds):
+            self._scheduled.clear()
+            for channel in self._channels:
+                channel.channel.stop()
+            self._music_mixer.stop()
+
+        elif isinstance(command, LoadSound):
+            LOGGER.debug("Loading sound %s", command.filename)
+            try:
+                self._bank.load(command.filename)
+            except (OSError, pygame.error):
+                LOGGER.error("Failed to load sound %s", command.filename, exc_info=True)
+
+        elif isinstance(command, SoundsLoaded):
+            LOGGER.debug("%d sounds loaded", len(self._bank))
+            if command.done.set_running_or_notify_cancel():
+                command.done.set_result(None)
+
+        elif isinstance(command, SelectMusicStem):
+            self._music_mixer.select(command)
+
+        elif isinstance(command, MusicStemLoaded):
+            self._music_mixer.stem_loaded(command)
+
+        elif isinstance(command, MusicStemPrepared):
+            self._music_mixer.stem_prepared(command)
+
+        elif isinstance(command, PlayMusic):
+            self._music_mixer.play()
+
+        elif isinstance(command, StopMusic):
+            self._music_mixer.stop()
+
+    def _handle_mixer_event(self, event: pygame.event.Event):
+        if event.type == AUDIO_END_EVENT:
+            sound = self._channels.ended(event.code)
+            if sound is not None:
+                self._sound_stopped(sound)
 
     def _pygame_event_thread(self):
         if self._music:
@@ -226,115 +600,54 @@ class SoundSystem:
 
         try:
             pygame.display.init()
-            pygame.fastevent.init()
+            # only the mixer's notifications are read from the SDL event queue
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed([AUDIO_END_EVENT])
             pygame.mixer.init(44100, -16, 2, 512)
-            pygame.mixer.set_num_channels(AUDIO_CHANNELS)
-            self._playback_channels.clear()
-            for num in range(AUDIO_CHANNELS):
-                channel = pygame.mixer.Channel(num)
-                self._playback_channels.append(PlaybackChannel(channel))
+            # the channels after the sound effect channels are dedicated to music
+            pygame.mixer.set_num_channels(AUDIO_CHANNELS + 2)
+            channels = [pygame.mixer.Channel(num) for num in range(AUDIO_CHANNELS)]
+            for channel in channels:
                 channel.set_endevent(AUDIO_END_EVENT)
-            pygame.mixer.music.set_endevent(MUSIC_END_EVENT)
+            self._channels = ChannelPool(channels)
+            self._music_mixer = MusicMixer(pygame.mixer.Channel(AUDIO_CHANNELS),
+                                           pygame.mixer.Channel(AUDIO_CHANNELS + 1), self._commands)
             self._pygame_init.set_result(None)
         except BaseException as ex:
             self._pygame_init.set_exception(ex)
+            self._commands.close(failed=True)
             pygame.quit()
             return
 
+        commands: Deque[AudioCommand] = deque()
+        failed = False
         try:
             while True:
-                event = pygame.fastevent.wait()
-
-                if event.type == pygame.QUIT:
-                    pygame.fastevent.get()
-                    return
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.LOAD_SOUND:
-                    LOGGER.debug("Loading sound %s", event.filename)
-                    path = join(SOUND_FOLDER, event.filename)
-                    sound_obj = pygame.mixer.Sound(path)
-                    # avoid sound distortion by capping volume
-                    # doing this here ensures that no clipping occurs in pygame/SDL mixer and allows us to ignore system volume
-                    sound_obj.set_volume(SOUND_VOLUME)
-                    self._loaded_sounds[event.filename] = sound_obj
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.PLAY_SOUND:
-                    sound: LocalPlayingSound = event.sound
-                    # try to find a free channel
-                    channel = next((channel for channel in self._playback_channels if not channel.channel.get_busy()), None)
-                    if not channel:
-                        # find a channel to override: find the lowest-priority channel, with the sound ending soonest
-                        channel = min(self._playback_channels, key=lambda ch: (ch.priority, ch.end))
-                        if channel.priority > sound.priority:
-                            LOGGER.warning("Out of channels, not playing priority %d audio %s", sound.priority, sound.filename)
-                            continue
-                        to_stop = channel.current_sound
-                        if to_stop is not None:
-                            LOGGER.warning("Out of channels, stopping priority %d audio %s with %s seconds left",
-                                           channel.priority, to_stop.filename, channel.end - monotonic())
-                    # play the sound
-                    LOGGER.debug("Playing priority %d audio %s", sound.priority, sound.filename)
-                    try:
-                        clip = self._loaded_sounds[sound.filename]
-                    except KeyError:
-                        LOGGER.error(f"sound file not loaded: {sound.filename}")
-                        continue
-                    channel.play(clip, sound)
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.STOP_SOUND:
-                    sound: LocalPlayingSound = event.sound
-                    if sound.channel is not None and sound.channel.current_sound is sound:
-                        sound.channel.channel.stop()
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.STOP_ALL:
-                    for channel in self._playback_channels:
-                        channel.channel.stop()
-                    self._stop_music()
-
-                elif event.type == AUDIO_END_EVENT:
-                    channel = self._playback_channels[event.code]
-                    if channel.current_sound is not None:
-                        self._sound_stopped(channel.current_sound)
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.LOAD_MUSIC:
-                    filename = join(event.track_name, event.filename)
-                    path = join(MUSIC_FOLDER, filename)
-                    if self._queued_music == filename:
-                        # avoid re-queueing same song
-                        pass
-                    elif pygame.mixer.music.get_busy():
-                        LOGGER.debug("Queueing music %s", filename)
-                        pygame.mixer.music.queue(path)
-                        self._queued_music = filename
-                    else:
-                        LOGGER.debug("Loading music %s", filename)
-                        pygame.mixer.music.load(path)
-                        pygame.mixer.music.set_volume(MUSIC_VOLUME)
-                        self._queued_music = filename
-                    # keep re-queueing on demand
-                    pygame.time.set_timer(MUSIC_REQUEUE_EVENT, int(1000 * event.duration / 2))
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.PLAY_MUSIC:
-                    self._queued_music = None
-                    self._music_playing = True
-                    pygame.mixer.music.play()
-
-                elif event.type == AUDIO_EVENT and event.subtype == AudioEvent.STOP_MUSIC:
-                    self._stop_music()
-
-                elif event.type == MUSIC_END_EVENT:
-                    if self._queued_music:
-                        LOGGER.debug("Continuing to queued music %s", self._queued_music)
-                        self._queued_music = None
-                    elif self._music_playing:
-                        LOGGER.debug("Restarting previous music")
-                        pygame.mixer.music.play()
-                    else:
-                        LOGGER.debug("Music stopped")
+                # mixer end notifications can only be received through the SDL event queue, so check it every time
+                # the thread wakes up, and before handling commands so that channels freed since are reused
+                for event in pygame.event.get():
+                    self._handle_mixer_event(event)
+                # wake up for the next scheduled sound without waiting for commands or the event loop, and poll for
+                # end notifications only while sounds are playing
+                timeout = self._play_scheduled()
+                if self._channels.busy:
+                    timeout = min(timeout, AUDIO_END_POLL_INTERVAL)
+                commands.extend(self._commands.wait(None if timeout == float("inf") else timeout))
+                while commands:
+                    # a command is only removed once handled, so that a failing SoundsLoaded is failed on exit
+                    if isinstance(commands[0], StopAudio):
+                        return
+                    self._handle_command(commands[0])
+                    commands.popleft()
+                self._play_scheduled()
 
         except Exception:
             LOGGER.error("Error in pygame audio thread", exc_info=True)
+            failed = True
         finally:
+            # nobody may wait for sounds that will never be loaded
+            self._commands.close(commands, failed)
+            self._music_mixer.close()
             pygame.quit()
 
 
@@ -371,7 +684,7 @@ class BombSoundSystem(SoundSystem):
             raise InvalidMessage("unknown audio action from room server")
 
     def _load_sound_in_location(self, sound: SoundSpec):
-        if sound.location in (AudioLocation.ROOM_ONLY, AudioLocation.PREFER_ROOM) and self._remote_client is not None:
+        if self._plays_remotely(sound):
             # sound can and should be played via room server
             LOGGER.debug("Requesting room server to load sound %s", sound.filename)
             self._remote_client.send_async(RoomServerChannel.AUDIO, {
@@ -384,8 +697,23 @@ class BombSoundSystem(SoundSystem):
             # sound should be played locally
             self._load_sound_locally(sound.filename)
 
+    def _plays_remotely(self, sound: SoundSpec) -> bool:
+        return (sound.location in (AudioLocation.ROOM_ONLY, AudioLocation.PREFER_ROOM)
+                and self._remote_client is not None)
+
+    def schedule_sound(self, sound: SoundSpec, at: float, priority: int = 0) -> Optional[PlayingSound]:
+        """Schedules a sound to be played at the given event loop time. See ``schedule_sound_locally``."""
+        if self._plays_remotely(sound):
+            # the room server can't schedule sounds, so start them from the event loop instead
+            return DelayedPlayingSound(self._loop, at, lambda: self.play_sound(sound, priority))
+        if sound.location == AudioLocation.ROOM_ONLY:
+            LOGGER.debug("Room audio unavailable, skipping room-only sound %s", sound.filename)
+            return None
+        return self.schedule_sound_locally(sound.filename, priority, at)
+
     def play_sound(self, sound: SoundSpec, priority: int = 0) -> Optional[PlayingSound]:
-        if sound.location in (AudioLocation.ROOM_ONLY, AudioLocation.PREFER_ROOM) and self._remote_client is not None:
+        LATENCY.record_reaction("sound")
+        if self._plays_remotely(sound):
             self._next_remote_id += 1
             self._remote_client.send_async(RoomServerChannel.AUDIO, {
                 "play": sound.filename,
@@ -452,9 +780,14 @@ class RoomServerSoundSystem(SoundSystem):
         self._playing_sounds = {}
         room_server.add_handler(RoomServerChannel.AUDIO, self._handle_audio_message)
         if ROOM_MUSIC_ENABLED:
-            self._music = MusicManager()
+            self._music = MusicManager(self._commands)
             room_server.add_handler(RoomServerChannel.MUSIC, self._music.handle_music_message)
 
+    def stop(self):
+        super().stop()
+        if self._music is not None:
+            self._music.close()
+
     async def _handle_audio_message(self, data: dict):
         if "load" in data:
             filename = data["load"]
@@ -497,92 +830,3 @@ class RoomServerSoundSystem(SoundSystem):
             run_coroutine_threadsafe(self._room_server.send(RoomServerChannel.AUDIO, {
                 "stopped": sound.remote_id,
             }), self._loop)
-
-
-class MusicManager:
-    _tracks: List[MusicTrack]
-    _selected_track: Optional[MusicTrack] = None
-    _time_left: float = 1.0
-
-    def __init__(self):
-        self._tracks = []
-
-    def discover(self):
-        if not isdir(MUSIC_FOLDER):
-            LOGGER.warning("Missing music folder %s", MUSIC_FOLDER)
-            return
-
-        track_dirs = listdir(MUSIC_FOLDER)
-        for track_name in track_dirs:
-            # a music track must be a folder with >= 1 wav file
-            track_path = join(MUSIC_FOLDER, track_name)
-            if not isdir(track_path):
-                continue
-            track_files = sorted(file for file in listdir(track_path)
-                                 if file.endswith(".wav") and isfile(join(track_path, file)))
-            if not track_files:
-                continue
-            # determine loop duration
-            test_file = join(track_path, track_files[0])
-            try:
-                with wave.open(test_file, "rb") as wavfile:
-                    duration = wavfile.getnframes() / wavfile.getframerate()
-            except Exception:
-                LOGGER.warning("Failed to load music track %s", test_file, exc_info=True)
-                continue
-            self._tracks.append(MusicTrack(track_name, track_files, duration))
-
-        if self._tracks:
-            LOGGER.info("Discovered %s music tracks", len(self._tracks))
-        else:
-            LOGGER.warning("No music tracks discovered")
-
-    def _init_music(self):
-        if self._tracks:
-            self._stop_music()
-            self._selected_track = choice(self._tracks)
-            self._time_left = 1.0
-            self._queue_music_file()
-        else:
-            LOGGER.warning("No music tracks available to choose from")
-
-    def _queue_music_file(self):
-        if not self._selected_track:
-            LOGGER.warning("No music track selected, can't queue file")
-            return
-        index = floor((1.0 - self._time_left) * len(self._selected_track.filenames))
-        file = self._selected_track.filenames[index]
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.LOAD_MUSIC,
-            "track_name": self._selected_track.name,
-            "filename": file,
-            "duration": self._selected_track.loop_duration,
-        }))
-
-    def _update_music_timer(self, time_left: float):
-        self._time_left = time_left
-
-    def _play_music(self):
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.PLAY_MUSIC,
-        }))
-
-    def _stop_music(self):
-        pygame.fastevent.post(pygame.event.Event(AUDIO_EVENT, {
-            "subtype": AudioEvent.STOP_MUSIC,
-        }))
-
-    async def handle_music_message(self, data: dict):
-        if "init" in data:
-            self._init_music()
-        elif "play" in data:
-            self._play_music()
-        elif "stop" in data:
-            self._stop_music()
-        elif "time" in data:
-            if not isinstance(data["time"], (float, int)) or not 0.0 <= data["time"] <= 1.0:
-                raise InvalidMessage("time must be numeric and between 0-1")
-            self._time_left = data["time"]
-            self._queue_music_file()
-        else:
-            raise InvalidMessage("unknown audio action")
@@ -1,25 +1,30 @@
-from asyncio import (Lock, Condition, TimeoutError as AsyncTimeoutError, create_task, sleep as async_sleep,
-                     wait_for, Task)
+from asyncio import (Lock, Condition, Event, TimeoutError as AsyncTimeoutError, create_task, sleep as async_sleep,
+                     wait_for, Task, gather, get_running_loop)
+from collections import deque
+from contextvars import Context
 from logging import getLogger
-from time import monotonic
-from typing import List, Dict, Optional, Coroutine
+from typing import List, Dict, Optional, Coroutine, Iterable, Deque, Set, Tuple
 
-from bombgame.audio import register_sound, AudioLocation, BombSoundSystem
+from bombgame.audio import register_sound, AudioLocation, BombSoundSystem, PlayingSound, AudioStoppedError
+from bombgame.bomb.clock import GameClock
 from bombgame.bomb.edgework import Edgework
+from bombgame.bomb.ping import ModulePinger
 from bombgame.bomb.state import BombState
 from bombgame.bus.bus import BombBus
 from bombgame.bus.messages import (BusMessage, ResetMessage, AnnounceMessage, DefuseBombMessage, ExplodeBombMessage,
-                                   ModuleId, LaunchGameMessage, StartTimerMessage)
+                                   ModuleId, LaunchGameMessage, StartTimerMessage, PingMessage)
 from bombgame.casings import Casing
-from bombgame.config import MODULE_RESET_PERIOD, MODULE_ANNOUNCE_TIMEOUT, DEFAULT_MAX_STRIKES, DEFAULT_STARTING_TIME
+from bombgame.config import (MODULE_RESET_PERIOD, MODULE_ANNOUNCE_TIMEOUT, MODULE_INIT_TIMEOUT, DEFAULT_MAX_STRIKES,
+                             DEFAULT_STARTING_TIME, SOUND_LOAD_TIMEOUT)
 from bombgame.events import (BombErrorLevel, BombError, BombModuleAdded, ModuleStateChanged, BombStateChanged,
                              ModuleStriked, TimerTick)
 from bombgame.gpio import AbstractGpio, ModuleReadyChange
+from bombgame.metrics import LATENCY, RECEIVED_MESSAGE
 from bombgame.modules.base import ModuleState, Module
 from bombgame.modules.needy import NeedyModule
 from bombgame.modules.registry import MODULE_ID_REGISTRY
 from bombgame.modules.timer import TimerModule
-from bombgame.utils import EventSource, log_errors
+from bombgame.utils import EventSource, OverflowPolicy, log_errors
 
 LOGGER = getLogger("Bomb")
 
@@ -37,14 +42,20 @@ class Bomb(EventSource):
     modules_by_location: Dict[int, Module]
     max_strikes: int
     strikes: int
-    time_left: float
-    timer_speed: float
     edgework: Edgework
     _state: BombState
-    _init_location: Optional[int]
+    _enabled_locations: Set[int]
+    _announces: Deque[AnnounceMessage]
+    _held_messages: Dict[ModuleId, Deque[BusMessage]]
+    _hotswap_location: Optional[int]
     _state_lock: Lock
     _init_cond: Condition
     _gpio: AbstractGpio
+    _clock: GameClock
+    _paused: Event
+    _unpaused: Event
+    _tick_sound: Optional[Tuple[float, Optional[PlayingSound]]]
+    _pinger: ModulePinger
     _running_tasks: List[Task]
 
     def __init__(self, bus: BombBus, gpio: AbstractGpio, sound_system: BombSoundSystem, casing: Casing):
@@ -59,16 +70,24 @@ class Bomb(EventSource):
         self.max_strikes = DEFAULT_MAX_STRIKES
         self.strikes = 0
         self.starting_time = DEFAULT_STARTING_TIME
-        self.time_left = 0.0
-        self.timer_speed = 1.0
         self.edgework = Edgework()
         self._state = BombState.UNINITIALIZED
-        self._init_location = None
+        self._enabled_locations = set()
+        self._announces = deque()
+        self._held_messages = {}
+        self._hotswap_location = None
         self._state_lock = Lock()
         self._init_cond = Condition(self._state_lock)
-        self._last_timer_update = 0.0
+        self._clock = GameClock(self._timer_tick, self._timer_expired, on_reschedule=self._plan_tick_sound)
+        self._paused = Event()
+        self._unpaused = Event()
+        self._unpaused.set()
+        self._tick_sound = None
+        self._pinger = ModulePinger(self)
         self._running_tasks = []
-        bus.add_listener(BusMessage, self._receive_message)
+        # messages from modules must not be lost, so if the bomb falls behind, the bus stops receiving until it has
+        # caught up: the receiver thread waits, or reading on the event loop pauses
+        bus.add_listener(BusMessage, self._receive_message, overflow=OverflowPolicy.BLOCK)
         gpio.add_listener(ModuleReadyChange, self._module_ready_change)
         self.add_listener(ModuleStateChanged, self._handle_module_state_change)
 
@@ -77,65 +96,214 @@ class Bomb(EventSource):
             raise RuntimeError("Bomb already initialized")
         self.sound_system.stop_all_sounds()
         await self._state_lock.acquire()
-        LOGGER.debug("Resetting all modules")
-        self._state = BombState.RESETTING
-        # reset enable and widget pins
-        await self._gpio.reset()
-        # send reset to all modules
-        await self._bus.send(ResetMessage(ModuleId.BROADCAST))
-        # wait for modules to reset
-        self._state_lock.release()
-        await async_sleep(MODULE_RESET_PERIOD)
-        await self._state_lock.acquire()
-        # get modules that are ready
-        connected_modules = await self._gpio.check_ready_changes()
-        LOGGER.debug("Detected %d modules", len(connected_modules))
-        self._state = BombState.DETECTING_MODULES
+        connected_modules = await self._reset_modules()
         # initialize each module in order
-        for location in connected_modules:
-            LOGGER.debug("Initializing module at %s", self.casing.location(location))
-            # check that we have not failed yet
-            if self._state == BombState.INITIALIZATION_FAILED:
-                return
-            # initialize a module
-            self._init_location = location
-            await self._gpio.set_enable(location, True)
-            try:
-                await wait_for(self._init_cond.wait_for(lambda: location in self.modules_by_location), MODULE_ANNOUNCE_TIMEOUT)  # pylint: disable=cell-var-from-loop
-            except AsyncTimeoutError:
-                self._init_fail(f"module at {self.casing.location(location)} did not announce in time")
-                return
-            finally:
-                await self._gpio.set_enable(location, False)
-        self._init_location = None
+        if not await self._detect_modules_sequential(connected_modules):
+            return
+        for module in self.modules:
+            self.trigger(BombModuleAdded(self, module))
         # check that we have a timer module somewhere
         if not any(isinstance(module, TimerModule) for module in self.modules):
             self._init_fail("no timer found on bomb")
             return
         # start pinging modules that have not sent anything in a while
-        self.create_task(self._ping_loop())
+        for module in self.modules:
+            self._pinger.add(module)
+        self.create_task(self._pinger.run())
         # load sounds for the modules
-        self.sound_system.load_sounds({Bomb, Module, NeedyModule} | set(type(module) for module in self.modules))
+        await self._load_sounds({Bomb, Module, NeedyModule} | set(type(module) for module in self.modules))
         self.sound_system.init_music()
         # wait for all modules to initialize
         if not all(module.state == ModuleState.CONFIGURATION for module in self.modules):
             self._state = BombState.INITIALIZING_MODULES
             LOGGER.debug("All modules recognized, waiting for initialization")
-            await self._init_cond.wait_for(lambda: self._state == BombState.INITIALIZED)
+            try:
+                await wait_for(self._init_cond.wait_for(lambda: self._state == BombState.INITIALIZED),
+                               MODULE_INIT_TIMEOUT)
+            except AsyncTimeoutError:
+                uninitialized = [str(module) for module in self.modules if module.state != ModuleState.CONFIGURATION]
+                self._init_fail(f"modules did not finish initializing in time: {', '.join(uninitialized)}")
+                return
         self._state = BombState.INITIALIZED
         self._state_lock.release()
         LOGGER.debug("Initialization complete")
         self.trigger(BombStateChanged(BombState.INITIALIZED))
         # TODO implement an actual solution generation system
-        self.time_left = self.starting_time
+        self._clock.reset(self.starting_time)
         for module in self.modules:
             module.generate()
             self.trigger(ModuleStateChanged(module))
 
+    async def _reset_modules(self) -> List[int]:
+        """Resets all modules and returns the locations of the ones that are ready. Called with the state lock held."""
+        LOGGER.debug("Resetting all modules")
+        self._state = BombState.RESETTING
+        self.modules.clear()
+        self.modules_by_bus_id.clear()
+        self.modules_by_location.clear()
+        self._announces.clear()
+        self._held_messages.clear()
+        self._init_cond.notify_all()
+        # reset enable and widget pins
+        await self._gpio.reset()
+        # send reset to all modules
+        await self._bus.send(ResetMessage(ModuleId.BROADCAST))
+        # wait for modules to reset
+        self._state_lock.release()
+        await async_sleep(MODULE_RESET_PERIOD)
+        await self._state_lock.acquire()
+        # get modules that are ready
+        connected_modules = await self._gpio.check_ready_changes()
+        LOGGER.debug("Detected %d modules", len(connected_modules))
+        self._state = BombState.DETECTING_MODULES
+        return connected_modules
+
+    async def _set_enabled(self, changes: Dict[int, bool]):
+        """Enables and disables module locations with a single batch of GPIO writes."""
+        for location, enabled in changes.items():
+            if enabled:
+                LOGGER.debug("Initializing module at %s", self.casing.location(location))
+                self._enabled_locations.add(location)
+        await self._gpio.apply(enables=changes)
+        for location, enabled in changes.items():
+            if not enabled:
+                self._enabled_locations.discard(location)
+
+    async def _enable_location(self, location: int):
+        await self._set_enabled({location: True})
+
+    async def _disable_location(self, location: int):
+        await self._set_enabled({location: False})
+
+    async def _detect_modules_sequential(self, locations: List[int]) -> bool:
+        """Enables each location in turn and waits for the module there to announce itself.
+
+        Returns ``False`` if initialization failed. Called with the state lock held.
+        """
+        previous = None
+        try:
+            for location in locations:
+                # disable the previous location in the same batch
+                changes = {location: True}
+                if previous is not None:
+                    changes[previous] = False
+                await self._set_enabled(changes)
+                previous = location
+                try:
+                    await wait_for(self._init_cond.wait_for(lambda: self._announces or self._state == BombState.INITIALIZATION_FAILED),
+                                   MODULE_ANNOUNCE_TIMEOUT)
+                except AsyncTimeoutError:
+                    self._init_fail(f"module at {self.casing.location(location)} did not announce in time")
+                    return False
+                if self._state == BombState.INITIALIZATION_FAILED:
+                    return False
+                self._add_module(self._announces.popleft(), location)
+            return True
+        finally:
+            if previous is not None:
+                await self._disable_location(previous)
+
+    async def _load_sounds(self, classes: Set[type]):
+        """Loads the sounds of the given classes, giving up after ``SOUND_LOAD_TIMEOUT`` or if the audio thread died."""
+        try:
+            await wait_for(self.sound_system.load_sounds(classes), SOUND_LOAD_TIMEOUT)
+        except (AsyncTimeoutError, AudioStoppedError):
+            LOGGER.error("Failed to load sounds", exc_info=True)
+            self.trigger(BombError(None, BombErrorLevel.WARNING, "Sounds could not be loaded and may not play."))
+
+    def _add_module(self, message: AnnounceMessage, location: int) -> Module:
+        """Creates the module for an announcement that was matched to a location. Called with the state lock held."""
+        module_class = MODULE_ID_REGISTRY[message.module.type]
+        module = module_class(self, message.module, location, message.hw_version, message.sw_version)
+        if message.init_complete:
+            module.state = ModuleState.CONFIGURATION
+        self.modules_by_bus_id[message.module] = module
+        self.modules_by_location[location] = module
+        self.modules.append(module)
+        # handle the messages from the module that arrived before it was matched, once the state lock is released
+        if message.module in self._held_messages:
+            self.create_task(self._release_held_messages(message.module))
+        self._init_cond.notify_all()
+        return module
+
+    def _remove_module(self, module: Module):
+        """Forgets a module that has been replaced by another one. Called with the state lock held."""
+        self.modules.remove(module)
+        del self.modules_by_bus_id[module.bus_id]
+        del self.modules_by_location[module.location]
+        self._pinger.remove(module)
+
+    async def _hotswap_module(self, location: int):
+        """Initializes a module that was plugged in after the bomb was initialized, without resetting the others."""
+        async with self._state_lock:
+            # modules plugged in at the same time are initialized one after another
+            await self._init_cond.wait_for(lambda: self._hotswap_location is None)
+            if self._state != BombState.INITIALIZED:
+                self.trigger(BombError(None, BombErrorLevel.WARNING,
+                                       f"A module was added at {self.casing.location(location)} "
+                                       f"after the game started."))
+                return
+            LOGGER.info("Initializing hot-swapped module at %s", self.casing.location(location))
+            self._hotswap_location = location
+            self._state = BombState.DETECTING_MODULES
+            try:
+                module = await self._detect_hotswapped_module(location)
+            finally:
+                self._hotswap_location = None
+                if self._state in (BombState.DETECTING_MODULES, BombState.INITIALIZING_MODULES):
+                    self._state = BombState.INITIALIZED
+                self._init_cond.notify_all()
+        if module is None:
+            return
+        self._pinger.add(module)
+        if not any(type(other) is type(module) for other in self.modules if other is not module):
+            await self._load_sounds({type(module)})
+        self.trigger(BombModuleAdded(self, module))
+        module.generate()
+        self.trigger(ModuleStateChanged(module))
+        await module.send_state()
+        LOGGER.debug("Hot-swapped module at %s initialized", self.casing.location(location))
+
+    async def _detect_hotswapped_module(self, location: int) -> Optional[Module]:
+        """Enables a single location and waits for the module there to announce and initialize itself.
+
+        A module that was previously at the location is replaced. Returns None if the new module does not announce or
+        initialize itself in time. Called with the state lock held.
+        """
+        previous = self.modules_by_location.get(location)
+        if previous is not None:
+            LOGGER.info("Replacing %s", previous)
+            self._remove_module(previous)
+        self._announces.clear()
+        self._held_messages.clear()
+        await self._enable_location(location)
+        try:
+            await wait_for(self._init_cond.wait_for(lambda: self._announces), MODULE_ANNOUNCE_TIMEOUT)
+        except AsyncTimeoutError:
+            self.trigger(BombError(None, BombErrorLevel.WARNING,
+                                   f"Hot-swapped module at {self.casing.location(location)} did not announce in time."))
+            return None
+        finally:
+            await self._disable_location(location)
+        module = self._add_module(self._announces.popleft(), location)
+        if module.state != ModuleState.CONFIGURATION:
+            self._state = BombState.INITIALIZING_MODULES
+            try:
+                await wait_for(self._init_cond.wait_for(lambda: self._state == BombState.INITIALIZED),
+                               MODULE_INIT_TIMEOUT)
+            except AsyncTimeoutError:
+                self._remove_module(module)
+                self.trigger(BombError(None, BombErrorLevel.WARNING,
+                                       f"Hot-swapped module at {self.casing.location(location)} did not finish "
+                                       f"initializing in time."))
+                return None
+        return module
+
     def deinitialize(self):
         """Stops all running tasks for the bomb."""
         if self._state == BombState.DEINITIALIZED:
             raise RuntimeError("Bomb already deinitialized")
+        self._clock.stop()
         for task in self._running_tasks:
             task.cancel()
         self._bus.remove_listener(BusMessage, self._receive_message)
@@ -147,8 +315,10 @@ class Bomb(EventSource):
 
         Returns an ``asyncio.Task``. If you want to cancel this task yourself, pass it to ``Bomb.cancel_task``
         so that it can be removed from the bomb's task list.
+
+        The task runs in an empty context, so its messages are not counted as reactions to the message being handled.
         """
-        task = create_task(log_errors(task))
+        task = Context().run(create_task, log_errors(task))
         self._running_tasks.append(task)
         return task
 
@@ -160,19 +330,28 @@ class Bomb(EventSource):
     def _module_ready_change(self, change: ModuleReadyChange):
         if self._state in (BombState.UNINITIALIZED, BombState.RESETTING):
             return
-        if change.present:
-            # TODO trigger hotswap initialization for the single module
+        if change.present and (self._state == BombState.INITIALIZED or self._hotswap_location is not None):
+            self.create_task(self._hotswap_module(change.location))
+        elif change.present:
             self.trigger(BombError(None, BombErrorLevel.WARNING,
                                    f"A module was added at {self.casing.location(change.location)} "
                                    f"after initialization started."))
-        elif change.location != self._init_location and change.location not in self.modules_by_location:
+        elif change.location not in self._enabled_locations and change.location not in self.modules_by_location:
             # TODO handle cases where a module becomes unready during initialization
             self.trigger(BombError(None, BombErrorLevel.WARNING,
                                    f"A module was removed at {self.casing.location(change.location)} "
                                    f"after initialization started."))
 
+    def _reject_announce(self, reason):
+        if self._hotswap_location is None:
+            self._init_fail(reason)
+        else:
+            # a bad hot-swapped module must not fail the rest of the bomb, it simply times out
+            self.trigger(BombError(None, BombErrorLevel.WARNING, reason))
+
     def _init_fail(self, reason):
         self._state = BombState.INITIALIZATION_FAILED
+        self._init_cond.notify_all()
         self.trigger(BombError(None, BombErrorLevel.INIT_FAILURE, reason))
 
     async def _receive_message(self, message: BusMessage):
@@ -181,51 +360,87 @@ class Bomb(EventSource):
                 return
             if isinstance(message, AnnounceMessage):
                 if self._state != BombState.DETECTING_MODULES:
-                    # TODO implement module hotswap
                     self.trigger(BombError(None, BombErrorLevel.WARNING,
                                            f"{message.module} was announced after module detection phase."))
                     return
-                if message.module in self.modules_by_bus_id:
-                    self._init_fail(f"Multiple modules were announced with id {message.module}.")
+                if message.module in self.modules_by_bus_id or self._is_announced(message.module):
+                    self._reject_announce(f"Multiple modules were announced with id {message.module}.")
                     return
-                if self._init_location is None:
-                    self._init_fail(f"An unrequested announce was received from {message.module}.")
+                if not self._enabled_locations:
+                    self._reject_announce(f"An unrequested announce was received from {message.module}.")
                     return
                 if message.module.type not in MODULE_ID_REGISTRY:
-                    self._init_fail(f"The module type of {message.module} is not known.")
+                    self._reject_announce(f"The module type of {message.module} is not known.")
                     return
-                module_class = MODULE_ID_REGISTRY[message.module.type]
-                module = module_class(self, message.module, self._init_location, message.hw_version, message.sw_version)
-                if message.init_complete:
-                    module.state = ModuleState.CONFIGURATION
-                self.modules_by_bus_id[message.module] = module
-                self.modules_by_location[self._init_location] = module
-                self.modules.append(module)
-                self.trigger(BombModuleAdded(self, module))
-                self._init_location = None
+                # the module detection matches the announcement to a location
+                self._announces.append(message)
                 self._init_cond.notify_all()
                 return
-            module = self.modules_by_bus_id.get(message.module)
-            if module is None:
-                self.trigger(BombError(None, BombErrorLevel.WARNING, f"Received {message.__class__.__name__} from "
-                                                                     f"unannounced module {message.module}."))
+            held = self._held_messages.get(message.module)
+            if held is not None or self._is_announced(message.module):
+                # hold the message until module detection matches the module to a location, without blocking the
+                # messages after it, which detection may be waiting for
+                if held is None:
+                    held = self._held_messages[message.module] = deque()
+                held.append(message)
                 return
-            module.last_received = monotonic()
-            if not await module.handle_message(message):
-                module.trigger_error(BombErrorLevel.WARNING, f"Received {message.__class__.__name__} in an "
-                                                             f"invalid state.")
+            await self._handle_module_message(message)
+
+    async def _release_held_messages(self, module_id: ModuleId):
+        """Handles the messages that were held while the module was waiting to be matched to a location."""
+        async with self._state_lock:
+            held = self._held_messages.pop(module_id, None)
+            while held:
+                await self._handle_module_message(held.popleft())
+
+    async def _handle_module_message(self, message: BusMessage):
+        """Passes a message to the module that sent it. Called with the state lock held."""
+        module = self.modules_by_bus_id.get(message.module)
+        if module is None:
+            self.trigger(BombError(None, BombErrorLevel.WARNING, f"Received {message.__class__.__name__} from "
+                                                                 f"unannounced module {message.module}."))
+            return
+        module.last_received = get_running_loop().time()
+        if message.received_at is not None:
+            token = RECEIVED_MESSAGE.set((message.__class__.__name__, message.received_at))
+            try:
+                handled = await module.handle_message(message)
+            finally:
+                RECEIVED_MESSAGE.reset(token)
+        else:
+            handled = await module.handle_message(message)
+        self._pinger.touch(module)
+        if not handled:
+            module.trigger_error(BombErrorLevel.WARNING, f"Received {message.__class__.__name__} in an "
+                                                         f"invalid state.")
+
+    def _is_announced(self, module_id: ModuleId) -> bool:
+        """Checks if the module has announced itself but not been matched to a location yet."""
+        return any(announce.module == module_id for announce in self._announces)
 
     async def send(self, message: BusMessage):
         """Sends a message to the bus."""
         # TODO check state maybe?
         await self._bus.send(message)
+        LATENCY.record_reaction(message.__class__.__name__)
 
-    async def _ping_loop(self):
-        while True:
-            for module in self.modules:
-                await module.ping_check()
-                # TODO module auto-restart?
-            await async_sleep(0.1)
+    async def send_many(self, messages: Iterable[BusMessage]):
+        """Sends multiple messages to the bus in a single batch."""
+        messages = list(messages)
+        await self._bus.send_many(messages)
+        for message_class in {message.__class__.__name__ for message in messages}:
+            LATENCY.record_reaction(message_class)
+
+    def ping_module(self, module: Module) -> Optional[PingMessage]:
+        """Pings the given module right away instead of waiting for it to go quiet.
+
+        Returns the ping message, which is sent in the background, or ``None`` if the module is already being pinged.
+        """
+        ping = module.start_ping(get_running_loop().time())
+        if ping is not None:
+            self._pinger.touch(module)
+            self.create_task(self.send(ping))
+        return ping
 
     def start_game(self):
         """Starts the game with the initial wait phase."""
@@ -236,8 +451,9 @@ class Bomb(EventSource):
             return
         self._state = BombState.GAME_STARTING
         self.trigger(BombStateChanged(BombState.GAME_STARTING))
+        # let the modules' state messages queue up so that they are transmitted together
+        await gather(*(module.send_state() for module in self.modules))
         for module in self.modules:
-            await module.send_state()
             module.state = ModuleState.GAME
         await self.send(LaunchGameMessage(ModuleId.BROADCAST))
         self.sound_system.play_music()
@@ -252,35 +468,87 @@ class Bomb(EventSource):
         self._state = BombState.GAME_STARTED
         self.trigger(BombStateChanged(BombState.GAME_STARTED))
         await self.send(StartTimerMessage(ModuleId.BROADCAST))
-        # timer task: trigger explosion and keep timer module in sync
-        self._last_timer_update = monotonic()
-        while self._state == BombState.GAME_STARTED:
-            await self._update_time()
-            expected_tick = (self.time_left % 1) / self.timer_speed
-            await async_sleep(expected_tick)
-
-    async def _update_time(self):
-        now = monotonic()
-        prev_second = int(self.time_left)
-        self.time_left -= (now - self._last_timer_update) * self.timer_speed
-        self.time_left = max(self.time_left, 0.0)
-        self._last_timer_update = now
-        curr_second = int(self.time_left)
-        if self.time_left == 0.0:
-            await self.explode()
+        self._clock.start()
+
+    @property
+    def time_left(self) -> float:
+        return self._clock.time_left
+
+    @property
+    def timer_speed(self) -> float:
+        return self._clock.speed
+
+    @property
+    def paused(self) -> bool:
+        return self._state == BombState.GAME_PAUSED
+
+    def pause_game(self):
+        """Pauses the timer and everything waiting with ``sleep_unpaused``, such as needy module activations.
+
+        Strikes are ignored while the game is paused.
+        """
+        if self._state != BombState.GAME_STARTED:
             return
+        self._clock.stop()
+        self._state = BombState.GAME_PAUSED
+        self._unpaused.clear()
+        self._paused.set()
+        self.trigger(BombStateChanged(BombState.GAME_PAUSED))
+
+    def resume_game(self):
+        """Resumes a paused game."""
+        if self._state != BombState.GAME_PAUSED:
+            return
+        self._state = BombState.GAME_STARTED
+        self._paused.clear()
+        self._unpaused.set()
+        self.trigger(BombStateChanged(BombState.GAME_STARTED))
+        self._clock.start()
+
+    async def sleep_unpaused(self, duration: float):
+        """Sleeps for the given number of seconds, not counting the time the game is paused."""
+        loop = get_running_loop()
+        while True:
+            await self._unpaused.wait()
+            start = loop.time()
+            try:
+                await wait_for(self._paused.wait(), duration)
+            except AsyncTimeoutError:
+                return
+            duration -= loop.time() - start
+
+    def _timer_tick(self, _: int):
         self.sound_system.update_music_timer(min(1.0, self.time_left / self.starting_time))
-        if prev_second != curr_second:
-            self.trigger(TimerTick(self))
-            if self.timer_speed <= 1.0:
-                self.sound_system.play_sound(TICK_SOUND_SLOW)
-            elif self.timer_speed <= 1.25:
-                self.sound_system.play_sound(TICK_SOUND_MEDIUM)
-            else:
-                self.sound_system.play_sound(TICK_SOUND_FAST)
+        self.trigger(TimerTick(self))
+
+    def _plan_tick_sound(self):
+        """Schedules the tick sound of the clock's next tick, replacing the previously scheduled one if it's not due yet.
+
+        The sound is scheduled a tick ahead, so it plays on time even if the event loop is busy when the tick is reached.
+        """
+        if self._tick_sound is not None:
+            at, playing = self._tick_sound
+            if playing is not None and at > get_running_loop().time():
+                playing.stop()
+            self._tick_sound = None
+        next_tick = self._clock.next_tick
+        if next_tick is None or next_tick[0] == 0:
+            return
+        if self.timer_speed <= 1.0:
+            sound = TICK_SOUND_SLOW
+        elif self.timer_speed <= 1.25:
+            sound = TICK_SOUND_MEDIUM
+        else:
+            sound = TICK_SOUND_FAST
+        self._tick_sound = (next_tick[1], self.sound_system.schedule_sound(sound, next_tick[1]))
+
+    def _timer_expired(self):
+        if self._state == BombState.GAME_STARTED:
+            self.create_task(self.explode())
 
     async def explode(self):
         """Ends the game by exploding the bomb."""
+        self._clock.stop()
         self._state = BombState.EXPLODED
         self.trigger(BombStateChanged(BombState.EXPLODED))
         await self.send(ExplodeBombMessage(ModuleId.BROADCAST))
@@ -293,7 +561,8 @@ class Bomb(EventSource):
                 self._init_cond.notify_all()
                 self._state = BombState.INITIALIZED
                 return
-            if self._state == BombState.GAME_STARTED and all(module.state == ModuleState.DEFUSED or not module.must_solve for module in self.modules):
+            if self._state in (BombState.GAME_STARTED, BombState.GAME_PAUSED) and all(module.state == ModuleState.DEFUSED or not module.must_solve for module in self.modules):
+                self._clock.stop()
                 self._state = BombState.DEFUSED
                 self.trigger(BombStateChanged(BombState.DEFUSED))
                 await self.send(DefuseBombMessage(ModuleId.BROADCAST))
@@ -309,13 +578,15 @@ class Bomb(EventSource):
         """
         if self._state == BombState.EXPLODED:
             return True
+        if self._state == BombState.GAME_PAUSED:
+            LOGGER.debug("Ignoring strike from %s while paused", module)
+            return False
         self.strikes += 1
         if self.strikes >= self.max_strikes:
             await self.explode()
             return True
         if self.strikes <= 4 and self._state == BombState.GAME_STARTED:
-            await self._update_time()
-            self.timer_speed += 0.25
+            self._clock.set_speed(self.timer_speed + 0.25)
         self.trigger(ModuleStriked(module))
         return False
 
@@ -0,0 +1,132 @@
+from asyncio import AbstractEventLoop, TimerHandle, get_running_loop
+from contextvars import Context
+from math import ceil
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+
+class ClockSegment(NamedTuple):
+    """A period during which the game clock ran at a constant speed."""
+    start: float
+    time_left: float
+    speed: float
+
+
+class GameClock:
+    """The countdown clock of the game.
+
+    The clock stores the event loop time and time left at the start of the current segment, and starts a new segment
+    whenever its speed changes or it is paused or resumed. The time left is always computed from the current segment,
+    so no error accumulates between segments, and each whole second is scheduled with ``loop.call_at`` at the exact
+    loop time it is reached.
+
+    ``on_tick`` is called with the number of seconds left whenever a whole second is reached, and ``on_expire`` when
+    the clock reaches zero. Both are called on the event loop. ``on_reschedule`` is called whenever the next tick (see
+    ``next_tick``) is scheduled or cancelled, so that things can be planned ahead of the ticks.
+    """
+
+    segments: List[ClockSegment]
+    _handle: Optional[TimerHandle]
+    _next_tick: Optional[Tuple[int, float]]
+
+    def __init__(self, on_tick: Callable[[int], None], on_expire: Callable[[], None],
+                 loop: Optional[AbstractEventLoop] = None, on_reschedule: Optional[Callable[[], None]] = None):
+        self._on_tick = on_tick
+        self._on_expire = on_expire
+        self._on_reschedule = on_reschedule
+        self._loop = loop or get_running_loop()
+        self.segments = [ClockSegment(self._loop.time(), 0.0, 1.0)]
+        self._running = False
+        self._handle = None
+        self._next_tick = None
+        self._last_tick = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def speed(self) -> float:
+        return self.segments[-1].speed
+
+    @property
+    def next_tick(self) -> Optional[Tuple[int, float]]:
+        """The second that will be reached next and the loop time it is reached at, or None if the clock is stopped."""
+        return self._next_tick
+
+    @property
+    def time_left(self) -> float:
+        return self._time_left_at(self._loop.time())
+
+    def _time_left_at(self, now: float) -> float:
+        segment = self.segments[-1]
+        if not self._running:
+            return segment.time_left
+        return max(0.0, segment.time_left - (now - segment.start) * segment.speed)
+
+    def reset(self, time_left: float, speed: float = 1.0):
+        """Stops the clock and sets its time left and speed."""
+        self.stop()
+        self.segments = [ClockSegment(self._loop.time(), time_left, speed)]
+        self._last_tick = None
+
+    def start(self):
+        """Starts or resumes the clock."""
+        if self._running:
+            return
+        self._new_segment(self.speed)
+        self._running = True
+        self._schedule()
+
+    def stop(self):
+        """Stops or pauses the clock."""
+        if not self._running:
+            return
+        self._new_segment(self.speed)
+        self._running = False
+        self._cancel()
+
+    def set_speed(self, speed: float):
+        """Changes the speed of the clock, starting from the current time left."""
+        self._new_segment(speed)
+        if self._running:
+            self._cancel()
+            self._schedule()
+
+    def _new_segment(self, speed: float):
+        now = self._loop.time()
+        self.segments.append(ClockSegment(now, self._time_left_at(now), speed))
+
+    def _schedule(self, second: Optional[int] = None):
+        """Schedules the tick for the given second, or the next whole second if not given."""
+        segment = self.segments[-1]
+        if second is None:
+            second = max(0, ceil(segment.time_left) - 1)
+            # a tick may fire a hair early, so don't repeat it if the time left is still slightly above it
+            if self._last_tick is not None:
+                second = min(second, self._last_tick - 1)
+        when = segment.start + (segment.time_left - second) / segment.speed
+        # ticks run in an empty context so that they don't inherit the context of e.g. a strike changing the speed
+        self._handle = self._loop.call_at(when, self._tick, second, context=Context())
+        self._next_tick = (second, when)
+        if self._on_reschedule is not None:
+            self._on_reschedule()
+
+    def _cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._next_tick = None
+            if self._on_reschedule is not None:
+                self._on_reschedule()
+
+    def _tick(self, second: int):
+        self._handle = None
+        self._next_tick = None
+        self._last_tick = second
+        if second == 0:
+            self.segments.append(ClockSegment(self._loop.time(), 0.0, self.speed))
+            self._running = False
+            self._on_expire()
+            return
+        self._schedule(second - 1)
+        self._on_tick(second)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from asyncio import Event, get_running_loop
+from heapq import heappush, heappop
+from itertools import count
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bombgame.bomb.bomb import Bomb
+    from bombgame.modules.base import Module
+
+
+class ModulePinger:
+    """Pings modules that have not sent anything in a while and detects ping timeouts.
+
+    Each module has a single deadline (see ``Module.ping_deadline``) kept in a heap, and the pinger only wakes up when
+    the earliest deadline passes. Deadlines that move later, such as when a message is received, are not updated in the
+    heap until they are reached; deadlines that move earlier are pushed immediately.
+    """
+
+    _heap: List[Tuple[float, int, Module]]
+    _scheduled: Dict[Module, Optional[float]]
+
+    def __init__(self, bomb: Bomb):
+        self._bomb = bomb
+        self._heap = []
+        self._scheduled = {}
+        self._counter = count()
+        self._wakeup = Event()
+
+    def add(self, module: Module):
+        """Starts pinging the given module."""
+        self._scheduled[module] = None
+        self.touch(module)
+
+    def remove(self, module: Module):
+        """Stops pinging the given module. Its entries in the heap become stale."""
+        self._scheduled.pop(module, None)
+
+    def touch(self, module: Module):
+        """Updates the module's deadline after its ping state has changed, e.g. when a message was received from it."""
+        if module not in self._scheduled:
+            return
+        deadline = module.ping_deadline
+        scheduled = self._scheduled[module]
+        if deadline is None or (scheduled is not None and scheduled <= deadline):
+            return
+        self._push(module, deadline)
+        if self._heap[0][2] is module:
+            self._wakeup.set()
+
+    def _push(self, module: Module, deadline: float):
+        self._scheduled[module] = deadline
+        heappush(self._heap, (deadline, next(self._counter), module))
+
+    def _is_stale(self, entry: Tuple[float, int, Module]) -> bool:
+        return self._scheduled.get(entry[2]) != entry[0]
+
+    async def run(self):
+        loop = get_running_loop()
+        while True:
+            now = loop.time()
+            pings = []
+            while self._heap and (self._heap[0][0] <= now or self._is_stale(self._heap[0])):
+                entry = heappop(self._heap)
+                if self._is_stale(entry):
+                    continue
+                module = entry[2]
+                self._scheduled[module] = None
+                # the deadline may have moved later since this entry was pushed
+                deadline = module.ping_deadline
+                if deadline is not None and deadline > now:
+                    self._push(module, deadline)
+                    continue
+                ping = module.ping_check(now)
+                if ping is not None:
+                    pings.append(ping)
+                self.touch(module)
+                # TODO module auto-restart?
+            if pings:
+                await self._bomb.send_many(pings)
+                continue
+            self._wakeup.clear()
+            timer = loop.call_at(self._heap[0][0], self._wakeup.set) if self._heap else None
+            try:
+                await self._wakeup.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-import time
-from asyncio import create_task, get_running_loop
+from asyncio import create_task, get_running_loop, shield, Event, Future, CancelledError, Task
 from logging import getLogger
+from time import perf_counter
+from typing import Iterable, List, Optional, Dict, Tuple
 
 import can
 
-from bombgame.bus.messages import BusMessage
-from bombgame.config import CAN_ERROR_MAX_COUNT, CAN_ERROR_MAX_INTERVAL
+from bombgame.bus.messages import BusMessage, BusMessageDecoder, ModuleId
+from bombgame.bus.trace import CanTraceRecorder
+from bombgame.config import CAN_ERROR_MAX_COUNT, CAN_ERROR_MAX_INTERVAL, CAN_RECEIVE_ON_LOOP
+from bombgame.metrics import LATENCY
 from bombgame.utils import EventSource, AuxiliaryThreadExecutor, FatalError, log_errors
 
 LOGGER = getLogger("BombBus")
@@ -17,66 +20,197 @@ class BombBus(EventSource):
     """The CAN-based bus used for controlling the physical bomb.
 
     Listen for suitable BusMessage events to get incoming messages.
+
+    The bus should be created after ``load_modules()`` so that its decoder knows all module-specific messages.
+
+    Outgoing messages are queued and all frames queued while the previous batch was being transmitted are sent in a
+    single wake-up of the sender thread. A queued message of a ``coalescable`` class is dropped if a newer message
+    of the same class to the same module is queued before it is transmitted.
+
+    If the CAN interface exposes a file descriptor (like socketcan) and ``CAN_RECEIVE_ON_LOOP`` is set, incoming
+    frames are read directly on the event loop whenever the descriptor becomes readable, and reading pauses while a
+    listener with ``OverflowPolicy.BLOCK`` has a full queue. Otherwise, a receiver thread polls the interface and
+    waits for such listeners itself.
+
+    If a ``CanTraceRecorder`` is given, all received and transmitted frames are recorded to it with event loop
+    timestamps.
     """
 
-    def __init__(self, can_bus: can.BusABC):
+    _send_queue: List[Optional[can.Message]]
+    _send_coalesced: Dict[Tuple[type, ModuleId], int]
+    _send_done: Optional[Future]
+
+    def __init__(self, can_bus: can.BusABC, trace: Optional[CanTraceRecorder] = None):
         super().__init__()
         self._can_bus = can_bus
-        self._last_can_error = time.monotonic()
+        self._trace = trace
+        self._decoder = BusMessageDecoder()
+        # errors may be handled in the sender thread, so keep a reference to the loop for its clock
+        self._loop = get_running_loop()
+        self._last_can_error = self._loop.time()
         self._can_error_count = 0
         self._error_limit_exceeded = False
         self._send_executor = AuxiliaryThreadExecutor(name="CANSender")
         self._receive_executor = AuxiliaryThreadExecutor(name="CANReceiver")
         self._receiver = None
+        self._receive_fd = None
+        self._receive_resume: Optional[Task] = None
+        self._sender = None
+        self._stopped = False
+        self._send_queue = []
+        self._send_coalesced = {}
+        self._send_done = None
+        self._send_wakeup = Event()
 
     def start(self):
-        if self._receiver is not None:
+        if self._sender is not None:
             raise RuntimeError("bus already started")
-        LOGGER.info("Starting bus receiver")
-        self._receive_executor.start()
         self._send_executor.start()
-        self._receiver = create_task(log_errors(self._receive_loop()))
+        self._sender = create_task(log_errors(self._send_loop()))
+        self._receive_fd = self._get_receive_fd() if CAN_RECEIVE_ON_LOOP else None
+        if self._receive_fd is not None:
+            LOGGER.info("Starting bus receiver on event loop")
+            get_running_loop().add_reader(self._receive_fd, self._receive_available)
+        else:
+            LOGGER.info("Starting bus receiver thread")
+            self._receive_executor.start()
+            self._receiver = create_task(log_errors(self._receive_loop()))
 
     def stop(self):
-        if self._receiver is None:
+        if self._sender is None:
             raise RuntimeError("bus not started")
+        self._stopped = True
         LOGGER.info("Stopping bus receiver")
-        self._receiver.cancel()
-        self._receive_executor.shutdown(True)
+        if self._receive_fd is not None:
+            get_running_loop().remove_reader(self._receive_fd)
+            if self._receive_resume is not None:
+                self._receive_resume.cancel()
+        else:
+            self._receiver.cancel()
+            # the receiver thread may be waiting for space in a listener queue
+            self.close_listener_queues()
+            self._receive_executor.shutdown(True)
+        self._sender.cancel()
+        # the sender may be cancelled before it picks up the last batch
+        if self._send_done is not None:
+            self._send_done.cancel()
         self._send_executor.shutdown(True)
 
+    def _get_receive_fd(self) -> Optional[int]:
+        try:
+            fileno = self._can_bus.fileno()
+        except (AttributeError, NotImplementedError):
+            return None
+        return fileno if isinstance(fileno, int) and fileno >= 0 else None
+
     async def _receive_loop(self):
         while True:
             await get_running_loop().run_in_executor(self._receive_executor, self._sync_receive)
 
     def _sync_receive(self):
         try:
-            message = self._can_bus.recv(1)
-            if message is not None:
-                try:
-                    message = BusMessage.parse(message)
-                except ValueError as ex:
-                    self._handle_bus_error()
-                    LOGGER.error("Invalid message from CAN: %s", ex)
-                else:
-                    self.trigger(message)
+            frame = self._can_bus.recv(1)
+            if frame is not None:
+                self._handle_frame(frame, perf_counter() if LATENCY.enabled else None)
+        except can.CanError as ex:
+            LOGGER.error("I/O error receiving message from CAN: %s", ex, exc_info=True)
+
+    def _receive_available(self):
+        try:
+            while True:
+                if self.listener_queues_full():
+                    # leave further frames in the interface's receive buffer until the listeners catch up
+                    self._loop.remove_reader(self._receive_fd)
+                    self._receive_resume = create_task(log_errors(self._resume_receive()))
+                    return
+                frame = self._can_bus.recv(0)
+                if frame is None:
+                    return
+                self._handle_frame(frame, perf_counter() if LATENCY.enabled else None)
         except can.CanError as ex:
             LOGGER.error("I/O error receiving message from CAN: %s", ex, exc_info=True)
 
+    async def _resume_receive(self):
+        await self.wait_for_listener_queues()
+        self._receive_resume = None
+        if not self._stopped:
+            self._loop.add_reader(self._receive_fd, self._receive_available)
+
+    def _handle_frame(self, frame: can.Message, received_at: Optional[float]):
+        if self._trace is not None:
+            self._trace.record(self._loop.time(), frame, False)
+        try:
+            message = self._decoder.decode(frame)
+        except ValueError as ex:
+            self._handle_bus_error()
+            LOGGER.error("Invalid message from CAN: %s", ex)
+        else:
+            if received_at is not None:
+                message.received_at = received_at
+            self.trigger(message)
+
     async def send(self, message: BusMessage):
-        """Send a message to the bus."""
-        await get_running_loop().run_in_executor(self._send_executor, self._sync_send, message)
+        """Send a message to the bus. Returns when the batch containing the message has been transmitted."""
+        await self.send_many((message,))
 
-    def _sync_send(self, message: BusMessage):
+    async def send_many(self, messages: Iterable[BusMessage]):
+        """Send multiple messages to the bus in order. Returns when all of them have been transmitted."""
+        if self._sender is None:
+            raise RuntimeError("bus not started")
+        if self._stopped:
+            raise RuntimeError("bus stopped")
+        for message in messages:
+            frame = message.serialize()
+            if message.coalescable:
+                key = (message.__class__, message.module)
+                stale = self._send_coalesced.get(key)
+                if stale is not None:
+                    self._send_queue[stale] = None
+                self._send_coalesced[key] = len(self._send_queue)
+            self._send_queue.append(frame)
+        if self._send_done is None:
+            self._send_done = get_running_loop().create_future()
+            self._send_wakeup.set()
+        await shield(self._send_done)
+
+    async def _send_loop(self):
+        while True:
+            await self._send_wakeup.wait()
+            self._send_wakeup.clear()
+            frames, done = self._send_queue, self._send_done
+            self._send_queue, self._send_done = [], None
+            self._send_coalesced.clear()
+            try:
+                await get_running_loop().run_in_executor(self._send_executor, self._sync_send_batch, frames)
+            except CancelledError:
+                done.cancel()
+                if self._send_done is not None:
+                    self._send_done.cancel()
+                raise
+            except BaseException as ex:  # pylint: disable=broad-except
+                done.set_exception(ex)
+            else:
+                done.set_result(None)
+
+    def _sync_send_batch(self, frames: List[Optional[can.Message]]):
+        for frame in frames:
+            if frame is not None:
+                self._sync_send(frame)
+
+    def _sync_send(self, frame: can.Message):
         try:
-            self._can_bus.send(message.serialize())
+            self._can_bus.send(frame)
         except can.CanError as ex:
             self._handle_bus_error()
             LOGGER.error("I/O error sending message to CAN: %s", ex, exc_info=True)
+        else:
+            if self._trace is not None:
+                self._trace.record(self._loop.time(), frame, True)
 
     def _handle_bus_error(self):
-        if time.monotonic() > self._last_can_error + CAN_ERROR_MAX_INTERVAL:
-            self._last_can_error = time.monotonic()
+        now = self._loop.time()
+        if now > self._last_can_error + CAN_ERROR_MAX_INTERVAL:
+            self._last_can_error = now
             self._can_error_count = 1
         else:
             self._can_error_count += 1
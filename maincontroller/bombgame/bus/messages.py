@@ -3,6 +3,7 @@ from __future__ import annotations
 import struct
 from abc import ABC, abstractmethod
 from enum import IntEnum
+from typing import ClassVar, Dict, Tuple, Type
 
 import can
 
@@ -19,31 +20,63 @@ MODULEID_SERIAL_MAX = (1 << MODULEID_SERIAL_BITS) - 1
 class ModuleId:
     """
     A module identifier as used on the bus.
+
+    Module IDs are immutable and interned: constructing the same ID twice returns the same object, so IDs can be
+    compared by identity. Use ``ModuleId.of`` in hot paths to skip validation for IDs that have already been seen.
     """
 
-    BROADCAST: ModuleId
+    __slots__ = ("type", "serial", "_hash")
+
+    _interned: ClassVar[Dict[Tuple[int, int], ModuleId]] = {}
 
-    def __init__(self, type_: int, serial: int):
+    type: int
+    serial: int
+    _hash: int
+
+    def __new__(cls, type_: int, serial: int):
+        try:
+            return cls._interned[type_, serial]
+        except KeyError:
+            pass
         if not 0 <= type_ <= MODULEID_TYPE_MAX:
             raise ValueError(f"type must be between 0 and {MODULEID_TYPE_MAX}")
         if not 0 <= serial <= MODULEID_SERIAL_MAX:
             raise ValueError(f"serial must be between 0 and {MODULEID_SERIAL_MAX}")
         if type_ == 0 and serial != 0:
             raise ValueError("serial must be 0 if type is 0")
-        self.type = type_
-        self.serial = serial
+        self = super().__new__(cls)
+        object.__setattr__(self, "type", int(type_))
+        object.__setattr__(self, "serial", int(serial))
+        object.__setattr__(self, "_hash", (self.type << MODULEID_SERIAL_BITS) | self.serial)
+        cls._interned[type_, serial] = self
+        return self
+
+    @classmethod
+    def of(cls, type_: int, serial: int) -> ModuleId:
+        """Returns the interned ID for the given type and serial, creating it if necessary."""
+        module_id = cls._interned.get((type_, serial))
+        return module_id if module_id is not None else cls(type_, serial)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ModuleId is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ModuleId is immutable")
+
+    def __reduce__(self):
+        return ModuleId, (self.type, self.serial)
 
     def is_broadcast(self):
         return self.type == 0
 
     def __int__(self):
-        return (self.type << MODULEID_SERIAL_BITS) | self.serial
+        return self._hash
 
     def __eq__(self, other):
-        return isinstance(other, ModuleId) and other.type == self.type and other.serial == self.serial
+        return self is other
 
     def __hash__(self):
-        return self.__int__()
+        return self._hash
 
     def __repr__(self):
         return f"ModuleId({self.type}, {self.serial})"
@@ -56,6 +89,7 @@ class ModuleId:
         return f"{self.type}#{self.serial}"
 
 
+# a class attribute, set after the class body because an annotation there would declare a missing slot
 ModuleId.BROADCAST = ModuleId(0, 0)
 
 
@@ -119,6 +153,10 @@ MESSAGE_ID_REGISTRY = Registry("message_id")
 
 class BusMessage(ABC):
     message_id = Ungettable
+    # if True, only the latest queued message of this class to a module is transmitted
+    coalescable = False
+    # the perf_counter() time when the message was received, if latency metrics are enabled
+    received_at = None
 
     def __init__(self, id_: BusMessageId, module: ModuleId, direction: BusMessageDirection = BusMessageDirection.OUT):
         if id_ < BusMessageId.MODULE_SPECIFIC_0 and MESSAGE_ID_REGISTRY[id_] != self.__class__:
@@ -141,20 +179,8 @@ class BusMessage(ABC):
         message_id = (message.arbitration_id & MESSAGE_ID_MASK) >> MESSAGE_ID_OFFSET
 
         direction = BusMessageDirection(direction)
-        module_id = ModuleId(module_type, module_serial)
-
-        if message_id >= BusMessageId.MODULE_SPECIFIC_0:
-            if module_id.type not in MODULE_ID_REGISTRY:
-                raise ValueError(f"unknown module type {hex(module_id.type)}")
-            module_type = MODULE_ID_REGISTRY[module_id.type]
-            lookup = (module_type, message_id)
-            if lookup not in MODULE_MESSAGE_ID_REGISTRY:
-                raise ValueError(f"unknown message id {hex(message_id)} for {module_type.__name__}")
-            message_class = MODULE_MESSAGE_ID_REGISTRY[lookup]
-        else:
-            if message_id not in MESSAGE_ID_REGISTRY:
-                raise ValueError(f"unknown message id {hex(message_id)}")
-            message_class = MESSAGE_ID_REGISTRY[message_id]
+        module_id = ModuleId.of(module_type, module_serial)
+        message_class = _lookup_message_class(module_id.type, message_id)
 
         return message_class._parse_data(module_id, direction, message.data)
 
@@ -186,6 +212,77 @@ class BusMessage(ABC):
         pass
 
 
+def _lookup_message_class(module_type: int, message_id: int) -> Type[BusMessage]:
+    """Finds the message class for a message ID sent to or from a module of the given type."""
+    if message_id >= BusMessageId.MODULE_SPECIFIC_0:
+        if module_type not in MODULE_ID_REGISTRY:
+            raise ValueError(f"unknown module type {hex(module_type)}")
+        module_class = MODULE_ID_REGISTRY[module_type]
+        lookup = (module_class, message_id)
+        if lookup not in MODULE_MESSAGE_ID_REGISTRY:
+            raise ValueError(f"unknown message id {hex(message_id)} for {module_class.__name__}")
+        return MODULE_MESSAGE_ID_REGISTRY[lookup]
+    if message_id not in MESSAGE_ID_REGISTRY:
+        raise ValueError(f"unknown message id {hex(message_id)}")
+    return MESSAGE_ID_REGISTRY[message_id]
+
+
+class BusMessageDecoder:
+    """Decodes CAN frames to BusMessages using lookup tables instead of the registries.
+
+    The message classes for all module types known at creation time are precomputed, so this should be created after
+    ``load_modules()``. Each arbitration ID seen on the bus is then resolved once to its message class, interned
+    ``ModuleId`` and direction, after which decoding a frame costs a single dict lookup plus ``_parse_data``.
+    Frames not covered by the precomputed table fall back to the registries.
+    """
+
+    _classes: Dict[int, Type[BusMessage]]
+    _frames: Dict[int, Tuple[Type[BusMessage], ModuleId, BusMessageDirection]]
+
+    def __init__(self):
+        self._classes = {}
+        self._frames = {}
+        for direction in BusMessageDirection:
+            module_types = list(MODULE_ID_REGISTRY.keys())
+            if direction == BusMessageDirection.OUT:
+                module_types.append(0)
+            for module_type in module_types:
+                for message_id in range(1 << MESSAGE_ID_BITS):
+                    try:
+                        message_class = _lookup_message_class(module_type, message_id)
+                    except ValueError:
+                        continue
+                    key = ((direction << MESSAGE_DIRECTION_OFFSET)
+                           | (module_type << MESSAGE_MODULE_TYPE_OFFSET)
+                           | (message_id << MESSAGE_ID_OFFSET))
+                    self._classes[key] = message_class
+
+    def decode(self, message: can.Message) -> BusMessage:
+        """Decodes a CAN frame. Raises ``ValueError`` for invalid frames, like ``BusMessage.parse``."""
+        if not message.is_extended_id:
+            raise ValueError("non-extended arbitration id")
+        return self.decode_raw(message.arbitration_id, message.data)
+
+    def decode_raw(self, arbitration_id: int, data: bytes) -> BusMessage:
+        """Decodes a frame with an extended arbitration ID, given as its ID and data."""
+        try:
+            message_class, module_id, direction = self._frames[arbitration_id]
+        except KeyError:
+            message_class, module_id, direction = self._frames[arbitration_id] = self._resolve(arbitration_id)
+        return message_class._parse_data(module_id, direction, data)
+
+    def _resolve(self, arbitration_id: int) -> Tuple[Type[BusMessage], ModuleId, BusMessageDirection]:
+        direction = BusMessageDirection((arbitration_id & MESSAGE_DIRECTION_MASK) >> MESSAGE_DIRECTION_OFFSET)
+        module_type = (arbitration_id & MESSAGE_MODULE_TYPE_MASK) >> MESSAGE_MODULE_TYPE_OFFSET
+        module_serial = (arbitration_id & MESSAGE_MODULE_SERIAL_MASK) >> MESSAGE_MODULE_SERIAL_OFFSET
+        message_id = (arbitration_id & MESSAGE_ID_MASK) >> MESSAGE_ID_OFFSET
+        module_id = ModuleId.of(module_type, module_serial)
+        message_class = self._classes.get(arbitration_id & ~MESSAGE_MODULE_SERIAL_MASK)
+        if message_class is None:
+            message_class = _lookup_message_class(module_type, message_id)
+        return message_class, module_id, direction
+
+
 class SimpleBusMessage(BusMessage):
     def __init__(self, module: ModuleId, direction: BusMessageDirection = BusMessageDirection.OUT):
         super().__init__(self.__class__.message_id, module, direction)
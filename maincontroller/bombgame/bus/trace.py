@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import struct
+from logging import getLogger
+from mmap import mmap, ACCESS_READ
+from os import SEEK_END
+from threading import Condition, Lock, Thread
+from time import time
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import can
+
+from bombgame.config import CAN_TRACE_FLUSH_INTERVAL
+
+LOGGER = getLogger("CANTrace")
+
+TRACE_MAGIC = b"KTANECAN"
+TRACE_VERSION = 1
+
+# magic, version, record size, wall clock time when the file was created
+TRACE_HEADER = struct.Struct("<8sHH4xd")
+# timestamp, arbitration id, flags, dlc, data
+TRACE_RECORD = struct.Struct("<dIBB2x8s")
+
+TRACE_FLAG_OUTBOUND = 0x01
+TRACE_FLAG_EXTENDED = 0x02
+TRACE_FLAG_REMOTE = 0x04
+
+# a raw record: timestamp, arbitration id, flags, dlc, padded data
+RawTraceRecord = Tuple[float, int, int, int, bytes]
+
+
+class TraceRecord(NamedTuple):
+    timestamp: float
+    outbound: bool
+    frame: can.Message
+
+
+class CanTraceRecorder:
+    """Appends CAN frames to a binary trace file.
+
+    The file consists of a header followed by fixed-size records (see ``TRACE_HEADER`` and ``TRACE_RECORD``), so it
+    can be memory-mapped and indexed directly. Timestamps are given by the caller, e.g. from the event loop's monotonic
+    clock, so they are only comparable within a single run of the controller.
+
+    Frames may be recorded from any thread. Records are buffered in memory and written to the file by a writer thread
+    at most ``flush_interval`` seconds after being recorded, so recording never waits for the file. The writer thread
+    sleeps while nothing is buffered.
+    """
+
+    def __init__(self, path: str, flush_interval: float = CAN_TRACE_FLUSH_INTERVAL):
+        self.path = path
+        self._pending = Condition()
+        self._buffer = bytearray()
+        self._closed = False
+        # held while writing so that records reach the file in order
+        self._file_lock = Lock()
+        # the file stays open for the writer thread until close()
+        self._file = open(path, "a+b")  # pylint: disable=consider-using-with
+        try:
+            self._prepare_file()
+        except BaseException:
+            self._file.close()
+            raise
+        self._writer = Thread(target=self._write_loop, args=(flush_interval,), name="CANTrace", daemon=True)
+        self._writer.start()
+        LOGGER.info("Recording CAN trace to %s", path)
+
+    def _prepare_file(self):
+        size = self._file.seek(0, SEEK_END)
+        if size == 0:
+            self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD.size, time()))
+            return
+        self._file.seek(0)
+        _check_header(self._file.read(TRACE_HEADER.size))
+        # drop a partial record left behind by a crash so that new records stay aligned
+        excess = (size - TRACE_HEADER.size) % TRACE_RECORD.size
+        if excess:
+            LOGGER.warning("Dropping partial record at the end of %s", self.path)
+            self._file.truncate(size - excess)
+        self._file.seek(0, SEEK_END)
+
+    def record(self, timestamp: float, frame: can.Message, outbound: bool):
+        flags = ((TRACE_FLAG_OUTBOUND if outbound else 0)
+                 | (TRACE_FLAG_EXTENDED if frame.is_extended_id else 0)
+                 | (TRACE_FLAG_REMOTE if frame.is_remote_frame else 0))
+        record = TRACE_RECORD.pack(timestamp, frame.arbitration_id, flags, frame.dlc, bytes(frame.data))
+        with self._pending:
+            if self._closed:
+                return
+            if not self._buffer:
+                self._pending.notify()
+            self._buffer += record
+
+    def _write_loop(self, flush_interval: float):
+        try:
+            while True:
+                with self._pending:
+                    self._pending.wait_for(lambda: self._buffer or self._closed)
+                    if self._closed:
+                        return
+                    # records arriving until then are written together
+                    self._pending.wait_for(lambda: self._closed, flush_interval)
+                self.flush()
+        except OSError:
+            LOGGER.error("Failed to write CAN trace to %s", self.path, exc_info=True)
+
+    def flush(self):
+        """Writes the buffered records to the file now."""
+        with self._file_lock:
+            with self._pending:
+                buffer, self._buffer = self._buffer, bytearray()
+            if buffer and self._file is not None:
+                self._file.write(buffer)
+                self._file.flush()
+
+    def close(self):
+        with self._pending:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.notify_all()
+        self._writer.join()
+        self.flush()
+        with self._file_lock:
+            self._file.close()
+            self._file = None
+
+
+def _check_header(header: bytes):
+    if len(header) < TRACE_HEADER.size:
+        raise ValueError("not a CAN trace file")
+    magic, version, record_size, _ = TRACE_HEADER.unpack(header)
+    if magic != TRACE_MAGIC:
+        raise ValueError("not a CAN trace file")
+    if version != TRACE_VERSION or record_size != TRACE_RECORD.size:
+        raise ValueError(f"unsupported CAN trace version {version}")
+
+
+class CanTrace:
+    """A CAN trace file opened for reading.
+
+    The records are read straight from a memory map of the file. A partial record at the end of the file, e.g. one
+    that was being written when the file was opened, is ignored.
+    """
+
+    created: float
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._map = mmap(file.fileno(), 0, access=ACCESS_READ)
+        try:
+            _check_header(self._map[:TRACE_HEADER.size])
+        except ValueError:
+            self._map.close()
+            raise
+        self.created = TRACE_HEADER.unpack_from(self._map)[3]
+        self._count = (len(self._map) - TRACE_HEADER.size) // TRACE_RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> CanTrace:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def raw(self, index: int) -> RawTraceRecord:
+        if not 0 <= index < self._count:
+            raise IndexError("record index out of range")
+        return TRACE_RECORD.unpack_from(self._map, TRACE_HEADER.size + index * TRACE_RECORD.size)
+
+    def iter_raw(self) -> Iterator[RawTraceRecord]:
+        """Iterates over the records without constructing ``can.Message`` objects."""
+        end = TRACE_HEADER.size + self._count * TRACE_RECORD.size
+        with memoryview(self._map) as view:
+            yield from TRACE_RECORD.iter_unpack(view[TRACE_HEADER.size:end])
+
+    def __getitem__(self, index: int) -> TraceRecord:
+        return _to_record(self.raw(index))
+
+    def __iter__(self) -> Iterator[TraceRecord]:
+        return map(_to_record, self.iter_raw())
+
+    @property
+    def duration(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return self.raw(self._count - 1)[0] - self.raw(0)[0]
+
+
+def _to_record(raw: RawTraceRecord) -> TraceRecord:
+    timestamp, arbitration_id, flags, dlc, data = raw
+    frame = can.Message(timestamp=timestamp, arbitration_id=arbitration_id,
+                        is_extended_id=bool(flags & TRACE_FLAG_EXTENDED), is_remote_frame=bool(flags & TRACE_FLAG_REMOTE),
+                        dlc=dlc, data=data[:dlc])
+    return TraceRecord(timestamp, bool(flags & TRACE_FLAG_OUTBOUND), frame)
@@ -5,6 +5,13 @@ BOMB_CASING = VanillaCasing()
 
 # the configuration for can.Bus
 CAN_CONFIG = {"interface": "socketcan", "channel": "can0"}
+# whether or not to read CAN frames directly on the event loop if the interface supports it (socketcan does)
+CAN_RECEIVE_ON_LOOP = True
+# the file to append a binary trace of all CAN frames to, or None to not record a trace
+# replay it with: python -m bombgame.test.replay <file>
+CAN_TRACE_FILE = None
+# how often buffered trace records are written to the file, in seconds
+CAN_TRACE_FLUSH_INTERVAL = 1.0
 
 # the URL of the room server, or None if none is in use
 # example: ROOM_SERVER = "ws://192.168.0.123:8082/"
@@ -34,9 +41,23 @@ AUDIO_CHANNELS = 16
 # sound and music volume (should be less than 1 to avoid mix clipping)
 SOUND_VOLUME = 0.25
 MUSIC_VOLUME = 0.25
+# how long the crossfade between the stems of a music track is, in seconds
+MUSIC_CROSSFADE_DURATION = 1.0
+# how often the audio thread checks for sounds that have ended while sounds are playing
+AUDIO_END_POLL_INTERVAL = 0.02
+# the time the bomb waits for its sounds to be loaded before starting without them, in seconds
+SOUND_LOAD_TIMEOUT = 10.0
+# the folder to cache decoded sound effects in, or None to decode them in memory at every startup
+# off by default: the bundled sound effects are short, so decoding them takes about as long as mapping cached samples
+# example: SOUND_CACHE_FOLDER = "/var/cache/ktane/sounds"
+SOUND_CACHE_FOLDER = None
 
 # how often to manually check GPIO pins for changes
 GPIO_POLL_INTERVAL = 1.0
+# how often to manually check GPIO pins for changes when changes are detected with interrupts
+GPIO_INTERRUPT_POLL_INTERVAL = 10.0
+# how long the module ready pins are let to settle after an interrupt before they are read
+GPIO_INTERRUPT_DEBOUNCE = 0.01
 # the address of the I2C bus where the expanders are connected
 GPIO_SMBUS_ADDR = 1
 # whether or not to enable GPIO interrupts
@@ -44,6 +65,24 @@ GPIO_INTERRUPT_ENABLED = True
 # the RasPi pin where the interrupts are connected
 GPIO_INTERRUPT_PIN = 22  # TODO: check actual pin number
 
+# how often to measure the event loop lag, in seconds
+LOOP_MONITOR_INTERVAL = 0.1
+# how many of the latest lag measurements to compute the rolling percentiles from
+LOOP_MONITOR_WINDOW = 600
+# event loop callbacks that run longer than this many seconds are reported, or None to not time callbacks
+# (timing wraps the callbacks of every asyncio event loop in the process, so it is off by default)
+LOOP_SLOW_CALLBACK_DURATION = None
+# how many of the latest slow callbacks to keep for the web UI
+LOOP_SLOW_CALLBACK_HISTORY = 50
+
+# the default maximum number of queued events per non-reentrant event listener
+EVENT_QUEUE_SIZE = 256
+
+# whether or not to record the latency from receiving a bus message to the bomb's reactions (see bombgame.metrics)
+LATENCY_METRICS_ENABLED = False
+# the file where latency metrics are written when the controller stops, or None to not write them
+LATENCY_METRICS_FILE = None
+
 # if CAN_ERROR_MAX_COUNT bus errors are encountered in CAN_ERROR_MAX_INTERVAL seconds, a fatal error is raised
 CAN_ERROR_MAX_INTERVAL = 15
 CAN_ERROR_MAX_COUNT = 10
@@ -59,6 +98,8 @@ WEB_LOGIN_TIMEOUT = 2
 MODULE_RESET_PERIOD = 0.6
 # the time waited for a module to respond to the MODULE_ENABLE line
 MODULE_ANNOUNCE_TIMEOUT = 1.0
+# the time waited for announced modules to report that they have finished initializing
+MODULE_INIT_TIMEOUT = 5.0
 # the time waited after a module's last message before pinging it
 # set to slightly over 1s to avoid unnecessarily pinging the timer
 MODULE_PING_INTERVAL = 0.99  # TODO: 1.2
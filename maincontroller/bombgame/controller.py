@@ -7,11 +7,14 @@ import can
 from bombgame.audio import BombSoundSystem
 from bombgame.bomb.bomb import Bomb
 from bombgame.bus.bus import BombBus
-from bombgame.config import BOMB_CASING, CAN_CONFIG, ROOM_SERVER
+from bombgame.bus.trace import CanTraceRecorder
+from bombgame.config import BOMB_CASING, CAN_CONFIG, CAN_TRACE_FILE, ROOM_SERVER, LATENCY_METRICS_FILE
 from bombgame.dmx import DMXController, initialize_bomb_dmx
 from bombgame.events import BombChanged
 from bombgame.gpio import Gpio, AbstractGpio
+from bombgame.metrics import LATENCY
 from bombgame.modules import load_modules
+from bombgame.monitor import LoopMonitor
 from bombgame.roomserver.client import RoomServerClient
 from bombgame.utils import FatalError, EventSource, log_errors
 from bombgame.web.server import WebInterface, initialize_web_ui
@@ -34,9 +37,11 @@ class BombGameController(EventSource):
     gpio: Optional[AbstractGpio]
     sound_system: Optional[BombSoundSystem]
     bus: Optional[BombBus]
+    can_trace: Optional[CanTraceRecorder]
     web_ui: Optional[WebInterface]
     room_server: Optional[RoomServerClient]
     dmx: Optional[DMXController]
+    monitor: Optional[LoopMonitor]
     bomb: Optional[Bomb]
     _bomb_init_task: Optional[Task]
 
@@ -47,8 +52,10 @@ class BombGameController(EventSource):
         self.sound_system = None
         self.room_server = None
         self.bus = None
+        self.can_trace = None
         self.web_ui = None
         self.dmx = None
+        self.monitor = None
         self.bomb = None
         self._bomb_init_task = None
 
@@ -67,6 +74,8 @@ class BombGameController(EventSource):
             self.bomb.deinitialize()
 
     async def start(self):
+        self.monitor = LoopMonitor()
+        self.monitor.start()
         LOGGER.info("Loading modules")
         load_modules()
         if self.can_bus is None:
@@ -79,7 +88,9 @@ class BombGameController(EventSource):
             await self.room_server.start()
         self.sound_system = BombSoundSystem(self.room_server)
         await self.sound_system.start()
-        self.bus = BombBus(self.can_bus)
+        if CAN_TRACE_FILE is not None:
+            self.can_trace = CanTraceRecorder(CAN_TRACE_FILE)
+        self.bus = BombBus(self.can_bus, self.can_trace)
         self.bus.add_listener(FatalError, handle_fatal_error)
         self.bus.start()
         self.web_ui = await initialize_web_ui(self)
@@ -92,6 +103,8 @@ class BombGameController(EventSource):
             await self.dmx.stop()
         await self.web_ui.stop()
         self.bus.stop()
+        if self.can_trace is not None:
+            self.can_trace.close()
         if self.sound_system is not None:
             self.sound_system.stop()  # TODO wrap in executor?
         if self.room_server is not None:
@@ -100,6 +113,10 @@ class BombGameController(EventSource):
             self.gpio.stop()  # TODO wrap in executor?
         if self.can_bus is not None:
             self.can_bus.shutdown()
+        if LATENCY_METRICS_FILE is not None:
+            LATENCY.dump(LATENCY_METRICS_FILE)
+        if self.monitor is not None:
+            self.monitor.stop()
 
     def reset(self):
         self._deinitialize_bomb()
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from asyncio import Lock, create_task, sleep as async_sleep, get_running_loop, Task
+from asyncio import Lock, Event, create_task, sleep as async_sleep, get_running_loop, Task
 from collections import namedtuple
+from functools import partial
 from logging import getLogger
-from typing import List, Optional
+from typing import Callable, List, Optional, Mapping
+
+from smbus2 import SMBus
 
 from bombgame import mcp23017
 from bombgame.casings import Casing
-from bombgame.config import GPIO_SMBUS_ADDR, GPIO_POLL_INTERVAL, GPIO_INTERRUPT_ENABLED, GPIO_INTERRUPT_PIN
+from bombgame.config import (GPIO_SMBUS_ADDR, GPIO_POLL_INTERVAL, GPIO_INTERRUPT_ENABLED, GPIO_INTERRUPT_PIN,
+                             GPIO_INTERRUPT_POLL_INTERVAL, GPIO_INTERRUPT_DEBOUNCE)
 from bombgame.utils import AuxiliaryThreadExecutor, EventSource, log_errors
 
 LOGGER = getLogger("GPIO")
@@ -56,8 +60,61 @@ class AbstractGpio(EventSource, ABC):
     async def set_widget(self, location: int, value: bool) -> None:
         """Sets the state of a widget pin."""
 
+    async def apply(self, enables: Optional[Mapping[int, bool]] = None,
+                    widgets: Optional[Mapping[int, bool]] = None) -> None:
+        """Sets the MODULE_ENABLE signals and widget pins given by location in a single batch.
+
+        The default implementation sets each pin separately.
+        """
+        for location, enabled in (enables or {}).items():
+            await self.set_enable(location, enabled)
+        for location, value in (widgets or {}).items():
+            await self.set_widget(location, value)
+
+
+class InterruptSource(ABC):
+    """A source of interrupts from the MCP23017 chips, such as the pin their INT outputs are connected to."""
+
+    @abstractmethod
+    def start(self, callback: Callable[[], None]) -> None:
+        """Starts calling ``callback`` on every interrupt. The callback may be called from any thread."""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Stops calling the callback."""
+
 
-_ModuleInfo = namedtuple("_ModuleInfo", ["mcp", "ready", "enable"])
+class RPiInterruptSource(InterruptSource):
+    """Detects interrupts as falling edges on a pin of the Raspberry Pi using RPi.GPIO."""
+
+    def __init__(self, pin: int):
+        # pylint: disable=import-outside-toplevel
+        import RPi.GPIO as GPIO
+        self._gpio = GPIO
+        self._pin = pin
+
+    def start(self, callback: Callable[[], None]):
+        # pylint: disable=no-member
+        self._gpio.setmode(self._gpio.BOARD)
+        self._gpio.setup(self._pin, self._gpio.IN)
+        # RPi.GPIO passes the pin number to the callback on its own thread
+        self._gpio.add_event_detect(self._pin, self._gpio.FALLING, lambda _: callback())
+
+    def stop(self):
+        self._gpio.remove_event_detect(self._pin)  # pylint: disable=no-member
+
+
+def _default_interrupt_source() -> Optional[InterruptSource]:
+    if not GPIO_INTERRUPT_ENABLED:
+        return None
+    try:
+        return RPiInterruptSource(GPIO_INTERRUPT_PIN)
+    except (ImportError, RuntimeError):
+        LOGGER.warning("Failed to load RPi.GPIO module. Module ready interrupts will be disabled.")
+        return None
+
+
+_ModuleInfo = namedtuple("_ModuleInfo", ["mcp", "ready", "enable", "mcp_index"])
 _WidgetInfo = namedtuple("_WidgetInfo", ["mcp", "widget"])
 
 
@@ -65,29 +122,52 @@ class Gpio(AbstractGpio):
     """A class that manages all the MCP23017 chips in a Casing.
 
     All public methods are asynchronous.
+
+    The ready pins are polled with a single block read per chip, and changes are found by comparing the read words to
+    the previous ones under a mask of each chip's ready pins.
+
+    If an interrupt source is available, an interrupt wakes up a task on the event loop, which reads the interrupt
+    registers of each chip to find the ones with ready pin changes and clear the interrupt. After waiting
+    ``GPIO_INTERRUPT_DEBOUNCE`` seconds for the pins to settle, only those chips are read. The ready pins are then
+    polled only every ``GPIO_INTERRUPT_POLL_INTERVAL`` seconds in case an interrupt is missed.
     """
 
+    _bus: SMBus
     _mcps: List[mcp23017.MCP23017]
     _modules: List[_ModuleInfo]
     _widgets: List[_WidgetInfo]
     _ready: List[bool]
+    _ready_masks: List[int]
+    _ready_words: List[int]
     _lock: Lock
     _poller: Optional[Task]
     _executor: AuxiliaryThreadExecutor
+    _interrupts: Optional[InterruptSource]
+    _interrupt_handler: Optional[Task]
+    _interrupt_pending: Optional[Event]
+
+    def __init__(self, casing: Casing, bus: Optional[SMBus] = None, interrupts: Optional[InterruptSource] = None):
+        """Creates a Gpio object and synchronously initializes the MCP23017 chips.
 
-    def __init__(self, casing: Casing):
-        """Creates a Gpio object and synchronously initializes the MCP23017 chips."""
+        All chips share the SMBus ``bus``, or a new one opened at ``GPIO_SMBUS_ADDR`` if none is given. Interrupts are
+        received from ``interrupts``, or from ``GPIO_INTERRUPT_PIN`` if none is given and interrupts are enabled.
+        """
         AbstractGpio.__init__(self)
         LOGGER.info("Initializing GPIO for %s", casing.__class__.__name__)
+        self._bus = SMBus(GPIO_SMBUS_ADDR) if bus is None else bus
         self._mcps = []
         self._modules = []
         self._widgets = []
         self._ready = [False] * casing.capacity
+        self._ready_masks = []
+        self._ready_words = []
         self._lock = Lock()
         self._poller = None
         self._executor = AuxiliaryThreadExecutor(name="GPIO")
+        self._interrupts = interrupts if interrupts is not None else _default_interrupt_source()
+        self._interrupt_handler = None
+        self._interrupt_pending = None
         self._initialize_mcps(casing)
-        self._initialize_interrupt()
         assert len(self._modules) == casing.capacity
         assert len(self._widgets) == casing.widget_capacity
 
@@ -95,67 +175,114 @@ class Gpio(AbstractGpio):
         for spec in casing.gpio_config:
             assert len(spec.ready_pins) == len(spec.enable_pins)
             LOGGER.debug("Initializing MCP23017 at SMBus %s address %#x", GPIO_SMBUS_ADDR, spec.mcp23017_addr)
-            mcp = mcp23017.MCP23017(GPIO_SMBUS_ADDR, spec.mcp23017_addr)
+            mcp = mcp23017.MCP23017(GPIO_SMBUS_ADDR, spec.mcp23017_addr, self._bus)
+            ready_mask = 0
             with mcp.begin_configuration():
                 mcp.configure_int_pins(mirror=True)
                 for ready, enable in zip(spec.ready_pins, spec.enable_pins):
                     mcp.pin_mode(None, ready, mcp23017.INPUT_PULLUP, invert=True)
-                    mcp.pin_interrupt(None, ready, mcp23017.BOTH if GPIO_INTERRUPT_ENABLED else mcp23017.OFF)
+                    mcp.pin_interrupt(None, ready, mcp23017.BOTH if self._interrupts is not None else mcp23017.OFF)
                     mcp.pin_mode(None, enable, mcp23017.OUTPUT)
                     mcp.write_pin(None, enable, True)
-                    self._modules.append(_ModuleInfo(mcp, ready, enable))
+                    self._modules.append(_ModuleInfo(mcp, ready, enable, len(self._mcps)))
+                    ready_mask |= 1 << ready
                 for widget in spec.widget_pins:
                     mcp.pin_mode(None, widget, mcp23017.OUTPUT)
                     mcp.write_pin(None, widget, False)
                     self._widgets.append(_WidgetInfo(mcp, widget))
             self._mcps.append(mcp)
-
-    def _initialize_interrupt(self):
-        # pylint: disable=no-member
-        try:
-            import RPi.GPIO as GPIO
-        except (ImportError, RuntimeError):
-            LOGGER.warning("Failed to load RPi.GPIO module. Module ready interrupts will be disabled.")
-            return
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setup(GPIO_INTERRUPT_PIN, GPIO.IN)
-        GPIO.add_event_detect(GPIO_INTERRUPT_PIN, GPIO.FALLING, self.check_ready_changes)
+            self._ready_masks.append(ready_mask)
+            self._ready_words.append(0)
 
     def start(self):
-        """Starts the GPIO auxiliary thread and module ready polling."""
+        """Starts the GPIO auxiliary thread, module ready interrupt handling and polling."""
         if self._poller is not None:
             raise RuntimeError("polling already started")
         LOGGER.info("Starting GPIO poller")
         self._executor.start()
-        self._poller = create_task(log_errors(self._poll_gpio_loop()))
+        interval = GPIO_POLL_INTERVAL
+        if self._interrupts is not None:
+            self._interrupt_pending = Event()
+            self._interrupt_handler = create_task(log_errors(self._handle_interrupts()))
+            self._interrupts.start(partial(get_running_loop().call_soon_threadsafe, self._interrupt_pending.set))
+            interval = GPIO_INTERRUPT_POLL_INTERVAL
+        self._poller = create_task(log_errors(self._poll_gpio_loop(interval)))
 
     def stop(self):
-        """Stops the GPIO auxiliary thread and module ready polling."""
+        """Stops the GPIO auxiliary thread, module ready interrupt handling and polling."""
         if self._poller is None:
             raise RuntimeError("polling not started")
         LOGGER.info("Stopping GPIO poller")
+        if self._interrupt_handler is not None:
+            self._interrupts.stop()
+            self._interrupt_handler.cancel()
+            self._interrupt_handler = None
         self._poller.cancel()
         self._executor.shutdown(True)
 
-    async def _poll_gpio_loop(self):
+    async def _poll_gpio_loop(self, interval: float):
         while True:
             await self.check_ready_changes()
-            await async_sleep(GPIO_POLL_INTERVAL)
+            await async_sleep(interval)
+
+    async def _handle_interrupts(self):
+        loop = get_running_loop()
+        while True:
+            await self._interrupt_pending.wait()
+            self._interrupt_pending.clear()
+            async with self._lock:
+                interrupted = await loop.run_in_executor(self._executor, self._sync_read_interrupts)
+            if not interrupted:
+                continue
+            # let the pins settle, an edge during this time sets the interrupt again and is handled afterwards
+            await async_sleep(GPIO_INTERRUPT_DEBOUNCE)
+            async with self._lock:
+                await loop.run_in_executor(self._executor, self._sync_check_ready_changes, interrupted)
+
+    def _sync_read_interrupts(self) -> List[int]:
+        """Reads and clears the interrupts of all chips. Returns the indices of the chips with ready pin changes."""
+        interrupted = []
+        for index, mcp in enumerate(self._mcps):
+            flags, _ = mcp.read_interrupts()
+            if flags & self._ready_masks[index]:
+                interrupted.append(index)
+        return interrupted
 
     async def reset(self):
         """Resets all module enable and widget pins to off."""
+        await self.apply({location: False for location in range(len(self._modules))},
+                         {location: False for location in range(len(self._widgets))})
+
+    async def apply(self, enables: Optional[Mapping[int, bool]] = None, widgets: Optional[Mapping[int, bool]] = None):
+        """Sets the MODULE_ENABLE signals and widget pins given by location in a single batch.
+
+        The changes are collected in the output latch shadows of the chips, and each chip whose outputs changed is
+        written with a single transaction.
+        """
+        enables = dict(enables or {})
+        widgets = dict(widgets or {})
+        if not all(0 <= location < len(self._modules) for location in enables):
+            raise ValueError("module location out of range")
+        if not all(0 <= location < len(self._widgets) for location in widgets):
+            raise ValueError("widget location out of range")
         async with self._lock:
-            await get_running_loop().run_in_executor(self._executor, self._sync_reset)
-
-    def _sync_reset(self):
-        for mcp in self._mcps:
+            await get_running_loop().run_in_executor(self._executor, self._sync_apply, enables, widgets)
+
+    def _sync_apply(self, enables: Mapping[int, bool], widgets: Mapping[int, bool]):
+        pins = [(self._modules[location].mcp, self._modules[location].enable, not enabled)
+                for location, enabled in enables.items()]
+        pins += [(self._widgets[location].mcp, self._widgets[location].widget, value)
+                 for location, value in widgets.items()]
+        # dicts keep the order in which the chips were first touched
+        mcps = dict.fromkeys(mcp for mcp, _, _ in pins)
+        for mcp in mcps:
             mcp.begin_write()
-        for module in self._modules:
-            module.mcp.write_pin(None, module.enable, True)
-        for widget in self._widgets:
-            widget.mcp.write_pin(None, widget.widget, False)
-        for mcp in self._mcps:
-            mcp.end_write()
+        try:
+            for mcp, pin, value in pins:
+                mcp.write_pin(None, pin, value)
+        finally:
+            for mcp in mcps:
+                mcp.end_write()
 
     async def check_ready_changes(self):
         """Polls for changes in module ready pins and returns the locations of currently connected modules."""
@@ -163,35 +290,25 @@ class Gpio(AbstractGpio):
             await get_running_loop().run_in_executor(self._executor, self._sync_check_ready_changes)
         return [location for location in range(len(self._modules)) if self._ready[location]]
 
-    def _sync_check_ready_changes(self):
-        for mcp in self._mcps:
-            mcp.begin_read()
+    def _sync_check_ready_changes(self, indices: Optional[List[int]] = None):
+        changes = [0] * len(self._mcps)
+        for index in range(len(self._mcps)) if indices is None else indices:
+            word = self._mcps[index].read_ports() & self._ready_masks[index]
+            changes[index] = word ^ self._ready_words[index]
+            self._ready_words[index] = word
+        if not any(changes):
+            return
         for location, module in enumerate(self._modules):
-            current = module.mcp.read_pin(None, module.ready)
-            if current != self._ready[location]:
+            bit = 1 << module.ready
+            if changes[module.mcp_index] & bit:
+                current = bool(self._ready_words[module.mcp_index] & bit)
+                self._ready[location] = current
                 self.trigger(ModuleReadyChange(location, current))
-            self._ready[location] = current
-        for mcp in self._mcps:
-            mcp.end_read()
 
     async def set_enable(self, location: int, enabled: bool):
         """Sets the state of a single module enable pin."""
-        if not 0 <= location < len(self._modules):
-            raise ValueError("module location out of range")
-        async with self._lock:
-            await get_running_loop().run_in_executor(self._executor, self._sync_set_enable, location, enabled)
-
-    def _sync_set_enable(self, location: int, enabled: bool):
-        module = self._modules[location]
-        module.mcp.write_pin(None, module.enable, not enabled)
+        await self.apply(enables={location: enabled})
 
     async def set_widget(self, location: int, value: bool):
         """Sets the state of a single widget pin."""
-        if not 0 <= location <= len(self._widgets):
-            raise ValueError("widget location out of range")
-        async with self._lock:
-            await get_running_loop().run_in_executor(self._executor, self._sync_set_widget, location, value)
-
-    def _sync_set_widget(self, location: int, value: bool):
-        widget = self._widgets[location]
-        widget.mcp.write_pin(None, widget.widget, value)
+        await self.apply(widgets={location: value})
@@ -1,5 +1,5 @@
 from collections import namedtuple
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from smbus2 import SMBus
 
@@ -66,13 +66,21 @@ class MCP23017:
     No methods should be considered thread-safe.
 
     On all methods expecting a port and a pin number, one may pass ``None`` for the port,
-    which maps port A to pins 0-7 and port B to pins 8-15.
+    which maps port A to pins 0-7 and port B to pins 8-15. Methods reading both ports at once
+    return 16-bit words in the same order.
+
+    The chip is assumed to use the default register layout (``IOCON.BANK`` unset) with sequential
+    operation enabled, so that the A and B registers of a pair can be read in a single block read.
     """
 
-    def __init__(self, smbus_addr: int, i2c_addr: int):
-        """Creates a MCP23017 object."""
+    def __init__(self, smbus_addr: int, i2c_addr: int, bus: Optional[SMBus] = None):
+        """Creates a MCP23017 object.
+
+        If ``bus`` is given, it is used instead of opening the SMBus ``smbus_addr``, so that multiple chips can share
+        a single bus object.
+        """
         self._addr = i2c_addr
-        self._bus = SMBus(smbus_addr)
+        self._bus = SMBus(smbus_addr) if bus is None else bus
         self._outputs = [0x00, 0x00]
         self._dirs = [0xff, 0xff]
         self._invs = [0x00, 0x00]
@@ -97,6 +105,20 @@ class MCP23017:
             return self._reads[port.number]
         return self._bus.read_byte_data(self._addr, port.GPIOx)
 
+    def read_ports(self, *, ignore_transaction=False) -> int:
+        """Reads the pins of both ports as a 16-bit word in a single block read.
+
+        If a read transaction is ongoing, the state of the ports is cached until the
+        end of the transaction.
+        """
+        if self._reads is not None and not ignore_transaction:
+            if self._reads[0] is None or self._reads[1] is None:
+                word = self.read_ports(ignore_transaction=True)
+                self._reads = [word & 0xff, word >> 8]
+            return self._reads[0] | self._reads[1] << 8
+        port_a, port_b = self._bus.read_i2c_block_data(self._addr, GPIOA, 2)
+        return port_a | port_b << 8
+
     def read_port_interrupt(self, port: Port):
         """Reads the interrupt flags of a port as a byte.
 
@@ -111,9 +133,21 @@ class MCP23017:
         """
         return self._bus.read_byte_data(self._addr, port.INTCAPx)
 
+    def read_interrupts(self) -> Tuple[int, int]:
+        """Reads the interrupt flags and interrupt captured values of both ports as 16-bit words.
+
+        The four registers are read in a single block read. This method always issues a request to the chip,
+        regardless of transactions.
+        """
+        flags_a, flags_b, captured_a, captured_b = self._bus.read_i2c_block_data(self._addr, INTFA, 4)
+        return flags_a | flags_b << 8, captured_a | captured_b << 8
+
     def write_port(self, port: Port, byte: int, *, ignore_transaction=False):
         """Writes the pins of the given port.
 
+        The value is written to the output latch register (OLATx) like in ``write_ports``. Writing
+        GPIOx has the same effect on output pins, as the chip forwards such writes to OLATx.
+
         If a write or configuration transaction is ongoing, the change is committed at the
         end of the transaction.
         """
@@ -121,7 +155,19 @@ class MCP23017:
             self._writes[port.number] = byte
         else:
             self._outputs[port.number] = byte
-            self._bus.write_byte_data(self._addr, port.GPIOx, byte)
+            self._bus.write_byte_data(self._addr, port.OLATx, byte)
+
+    def write_ports(self, word: int, *, ignore_transaction=False):
+        """Writes the pins of both ports from a 16-bit word in a single block write.
+
+        If a write or configuration transaction is ongoing, the change is committed at the
+        end of the transaction.
+        """
+        if self._writes is not None and not ignore_transaction:
+            self._writes = [word & 0xff, word >> 8]
+        else:
+            self._outputs = [word & 0xff, word >> 8]
+            self._bus.write_i2c_block_data(self._addr, OLATA, self._outputs)
 
     def set_port_direction(self, port: Port, dirs: int):
         """Writes the direction of the given port.
@@ -249,14 +295,19 @@ class MCP23017:
 
     def get_interrupts(self, port: Optional[Port] = None) -> List[Interrupt]:
         """Gets the interrupts currently pending on one or both ports."""
-        ports = [port] if port else [A, B]
+        if port is None:
+            flags, captures = self.read_interrupts()
+            ports = [A, B]
+        else:
+            flags = self.read_port_interrupt(port) << (port.number * 8)
+            captures = self.read_port_interrupt_captured(port) << (port.number * 8)
+            ports = [port]
         ints = []
         for port in ports:
-            flags = self.read_port_interrupt(port)
-            captures = self.read_port_interrupt_captured(port)
             for pin in range(8):
-                if flags & (1 << pin):
-                    ints.append(Interrupt(port, pin, port.number * 8 + pin, (captures >> pin) & 1))
+                cont_pin = port.number * 8 + pin
+                if flags & (1 << cont_pin):
+                    ints.append(Interrupt(port, pin, cont_pin, (captures >> cont_pin) & 1))
         return ints
 
     def _check_ongoing_transaction(self):
@@ -290,12 +341,17 @@ class MCP23017:
         return self._Writer(self)
 
     def end_write(self):
-        """Ends a write transaction and commits all writes performed after the call to ``begin_write()``."""
+        """Ends a write transaction and commits all writes performed after the call to ``begin_write()``.
+
+        Only the ports whose output latches changed are written, both of them in a single block write.
+        """
         if self._writes is None:
             raise RuntimeError("no write transaction started")
-        for port in [A, B]:
-            if self._writes[port.number] != self._outputs[port.number]:
-                self.write_port(port, self._writes[port.number], ignore_transaction=True)
+        changed = [port for port in [A, B] if self._writes[port.number] != self._outputs[port.number]]
+        if len(changed) == 2:
+            self.write_ports(self._writes[0] | self._writes[1] << 8, ignore_transaction=True)
+        elif changed:
+            self.write_port(changed[0], self._writes[changed[0].number], ignore_transaction=True)
         self._writes = None
 
     def begin_configuration(self):
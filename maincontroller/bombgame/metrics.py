@@ -0,0 +1,115 @@
+import json
+from contextvars import ContextVar
+from logging import getLogger
+from time import perf_counter
+from typing import Dict, Optional, Tuple, Any
+
+from bombgame.config import LATENCY_METRICS_ENABLED
+
+LOGGER = getLogger("Metrics")
+
+#: the class name and receive time of the bus message currently being handled, if it was timestamped
+RECEIVED_MESSAGE: ContextVar[Optional[Tuple[str, float]]] = ContextVar("RECEIVED_MESSAGE", default=None)
+
+
+class LatencyHistogram:
+    """A histogram of latencies with log-linear buckets and a fixed memory footprint, in the style of HdrHistogram.
+
+    Values are recorded in whole microseconds. Each power of two is split into ``2 ** precision_bits`` linear
+    sub-buckets, so percentiles are reported with a relative error of at most ``2 ** -precision_bits``. Values above
+    ``max_value`` seconds are counted in the highest bucket.
+    """
+
+    __slots__ = ("_sub_bits", "_max_index", "_counts", "count", "total", "min", "max")
+
+    def __init__(self, max_value: float = 60.0, precision_bits: int = 5):
+        self._sub_bits = precision_bits
+        self._max_index = self._index(int(max_value * 1_000_000))
+        self._counts = [0] * (self._max_index + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, micros: int) -> int:
+        shift = max(0, micros.bit_length() - self._sub_bits - 1)
+        return (shift << self._sub_bits) + (micros >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < 2 << self._sub_bits:
+            return index
+        shift = (index >> self._sub_bits) - 1
+        return ((index - (shift << self._sub_bits) + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        micros = max(0, int(seconds * 1_000_000))
+        self._counts[min(self._index(micros), self._max_index)] += 1
+        self.count += 1
+        self.total += micros
+        self.min = micros if self.min is None else min(self.min, micros)
+        self.max = max(self.max, micros)
+
+    def percentile(self, percent: float) -> float:
+        """Returns the given percentile of the recorded latencies in seconds, or 0 if nothing has been recorded."""
+        if not self.count:
+            return 0.0
+        target = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the count and the mean, percentiles and maximum in milliseconds."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count / 1000 if self.count else 0.0,
+            "p50": self.percentile(50) * 1000,
+            "p90": self.percentile(90) * 1000,
+            "p99": self.percentile(99) * 1000,
+            "max": self.max / 1000,
+        }
+
+
+class LatencyMetrics:
+    """Per-message-class histograms of the latency from a bus message being received to the bomb reacting to it."""
+
+    enabled: bool
+    histograms: Dict[str, LatencyHistogram]
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms = {}
+
+    def record(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_reaction(self, reaction: str):
+        """Records the latency of a reaction to the bus message currently being handled, if there is one.
+
+        The histogram is named after the received message class and the reaction, e.g. the sent message class.
+        """
+        received = RECEIVED_MESSAGE.get()
+        if received is not None:
+            self.record(f"{received[0]} -> {reaction}", perf_counter() - received[1])
+
+    def reset(self):
+        self.histograms.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def dump(self, path: str):
+        """Writes the summaries of all histograms to the given file as JSON."""
+        LOGGER.info("Writing latency metrics to %s", path)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+#: the latency metrics of the controller; received messages are only timestamped if ``enabled`` is set
+LATENCY = LatencyMetrics(LATENCY_METRICS_ENABLED)
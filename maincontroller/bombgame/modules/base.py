@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from asyncio import get_running_loop
 from enum import Enum
 from logging import getLogger
-from time import monotonic
-from typing import Tuple, List, TYPE_CHECKING
+from typing import Tuple, List, Optional, TYPE_CHECKING
 
 from bombgame.audio import register_sound, AudioLocation
 from bombgame.bus.messages import (StrikeModuleMessage, SolveModuleMessage, ModuleId, ErrorMessage,
@@ -52,7 +52,7 @@ class Module(ABC):
         self.location = location
         self.hw_version = hw_version
         self.sw_version = sw_version
-        self.last_received = monotonic()
+        self.last_received = get_running_loop().time()
         self.last_ping_time = None
         self.last_ping_id = 0
         self.ping_timeout = False
@@ -72,22 +72,43 @@ class Module(ABC):
         except KeyError:
             return UNKNOWN_ERROR_DESCRIPTION
 
-    async def ping_check(self) -> bool:
-        """Checks if the module should trigger a ping timeout or send a ping. Returns ``False`` if a ping timeout
-        occurred, ``True`` otherwise.
+    @property
+    def ping_deadline(self) -> Optional[float]:
+        """The event loop time at which ``ping_check`` should be called next, or ``None`` if the module has timed out
+        and nothing needs to be done before it responds.
         """
-        now = monotonic()
-        if not self.ping_timeout and self.last_ping_time is not None and now > self.last_ping_time + MODULE_PING_TIMEOUT:
+        if self.last_ping_time is None:
+            return self.last_received + MODULE_PING_INTERVAL
+        if self.ping_timeout:
+            return None
+        return self.last_ping_time + MODULE_PING_TIMEOUT
+
+    def ping_check(self, now: float) -> Optional[PingMessage]:
+        """Checks if the module should trigger a ping timeout or send a ping. Returns the ping message to send, if any.
+
+        ``now`` is the current event loop time.
+        """
+        if (not self.ping_timeout and self.last_ping_time is not None
+                and now >= self.last_ping_time + MODULE_PING_TIMEOUT):
             PING_LOGGER.warning("%s didn't respond to ping id %d.", self, self.last_ping_id)
             self.ping_timeout = True
             self.trigger_error(BombErrorLevel.WARNING, "Ping timeout.")
-            return False
-        if self.last_ping_time is None and now > self.last_received + MODULE_PING_INTERVAL:
-            self.last_ping_time = monotonic()
-            self.last_ping_id = (self.last_ping_id + 1) & 0xFF
-            PING_LOGGER.debug("Sending ping id %d to %s.", self.last_ping_id, self)
-            await self._bomb.send(PingMessage(self.bus_id, number=self.last_ping_id))
-        return True
+            return None
+        if self.last_ping_time is None and now >= self.last_received + MODULE_PING_INTERVAL:
+            return self.start_ping(now)
+        return None
+
+    def start_ping(self, now: float) -> Optional[PingMessage]:
+        """Starts a new ping and returns the ping message to send, or ``None`` if a ping is already in progress.
+
+        ``now`` is the current event loop time.
+        """
+        if self.last_ping_time is not None:
+            return None
+        self.last_ping_time = now
+        self.last_ping_id = (self.last_ping_id + 1) & 0xFF
+        PING_LOGGER.debug("Sending ping id %d to %s.", self.last_ping_id, self)
+        return PingMessage(self.bus_id, number=self.last_ping_id)
 
     async def handle_message(self, message: BusMessage):
         """Handles an incoming message from the module. Returns ``True`` if the message was handled and the module was
@@ -108,7 +129,7 @@ class Module(ABC):
         if isinstance(message, PingMessage):
             if self.last_ping_time is not None and self.last_ping_id == message.number:
                 PING_LOGGER.debug("%s responded to ping id %d in %dms.",
-                                  self, self.last_ping_id, (monotonic() - self.last_ping_time) * 1000)
+                                  self, self.last_ping_id, (get_running_loop().time() - self.last_ping_time) * 1000)
                 self.last_ping_time = None
             return True
         if isinstance(message, ErrorMessage):
@@ -148,7 +169,9 @@ class Module(ABC):
         await self._bomb.send(SolveModuleMessage(self.bus_id))
 
     async def strike(self, count=True):
-        """Called by module code to record a strike on the module."""
+        """Called by module code to record a strike on the module. Strikes are ignored while the game is paused."""
+        if self._bomb.paused:
+            return False
         self._bomb.sound_system.play_sound(STRIKE_SOUND)
         if count:
             if await self._bomb.strike(self):
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from abc import ABC
-from asyncio import sleep as async_sleep
 from enum import Enum
 from random import random, randint
 
@@ -46,7 +45,13 @@ class NeedyModule(Module, ABC):
 
     def _handle_bomb_state(self, event: BombStateChanged):
         if event.state == BombState.GAME_STARTED:
-            self._activate_with_delay(NEEDY_INITIAL_DELAY)
+            # the game is also started again when resuming from a pause
+            if self.needy_state == NeedyState.INITIAL_SLEEP and self._needy_task is None:
+                self._activate_with_delay(NEEDY_INITIAL_DELAY)
+        elif event.state == BombState.GAME_PAUSED:
+            # the activation and warning timers are paused by Bomb.sleep_unpaused
+            if self._needy_playing_sound:
+                self._needy_playing_sound.stop()
         elif event.state in (BombState.DEFUSED, BombState.EXPLODED):
             self._stop_activation()
             self.needy_state = NeedyState.DEACTIVATED
@@ -56,7 +61,7 @@ class NeedyModule(Module, ABC):
         self._needy_task = self._bomb.create_task(self._sleep_and_activate(duration))
 
     async def _sleep_and_activate(self, duration: float):
-        await async_sleep(duration)
+        await self._bomb.sleep_unpaused(duration)
         await self.activate()
 
     async def activate(self):
@@ -67,10 +72,10 @@ class NeedyModule(Module, ABC):
         await self._play_needy_warning_loop()
 
     async def _play_needy_warning_loop(self, timer: float = NEEDY_DEFAULT_TIMER):
-        await async_sleep(timer - NEEDY_WARNING_START_TIME)
+        await self._bomb.sleep_unpaused(timer - NEEDY_WARNING_START_TIME)
         while True:
             self._needy_playing_sound = self._bomb.sound_system.play_sound(NEEDY_WARNING_SOUND)
-            await async_sleep(NEEDY_WARNING_REPEAT_TIME)
+            await self._bomb.sleep_unpaused(NEEDY_WARNING_REPEAT_TIME)
 
     async def deactivate(self, *, permanently: bool = False):
         if self.needy_state == NeedyState.DEACTIVATED:
@@ -94,6 +99,8 @@ class NeedyModule(Module, ABC):
             self._needy_playing_sound.stop()
 
     async def needy_strike(self):
+        if self._bomb.paused:
+            return
         if not await self.strike():
             await self.deactivate()
 
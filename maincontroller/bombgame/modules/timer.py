@@ -1,7 +1,8 @@
 import struct
 
+from bombgame.bomb.state import BombState
 from bombgame.bus.messages import BusMessage, BusMessageId, ModuleId, BusMessageDirection
-from bombgame.events import TimerTick, ModuleStriked
+from bombgame.events import TimerTick, ModuleStriked, BombStateChanged
 from bombgame.modules.base import Module
 from bombgame.modules.registry import MODULE_ID_REGISTRY, MODULE_MESSAGE_ID_REGISTRY
 
@@ -15,6 +16,7 @@ class TimerModule(Module):
         super().__init__(bomb, bus_id, location, hw_version, sw_version)
         bomb.add_listener(TimerTick, self._update_timer)
         bomb.add_listener(ModuleStriked, self._update_timer)
+        bomb.add_listener(BombStateChanged, self._handle_bomb_state)
 
     def generate(self):
         pass
@@ -25,11 +27,16 @@ class TimerModule(Module):
     def ui_state(self):
         return None
 
+    async def _handle_bomb_state(self, event: BombStateChanged):
+        # the timer is stopped with a zero speed while paused, and restarted when resumed
+        if event.state in (BombState.GAME_PAUSED, BombState.GAME_STARTED):
+            await self._update_timer(None)
+
     async def _update_timer(self, _):
         await self._bomb.send(SetTimerStateMessage(
             self.bus_id,
             time_left=self._bomb.time_left,
-            speed=self._bomb.timer_speed,
+            speed=0.0 if self._bomb.paused else self._bomb.timer_speed,
             strikes=self._bomb.strikes,
             max_strikes=self._bomb.max_strikes
         ))
@@ -38,6 +45,7 @@ class TimerModule(Module):
 @MODULE_MESSAGE_ID_REGISTRY.register
 class SetTimerStateMessage(BusMessage):
     message_id = (TimerModule, BusMessageId.MODULE_SPECIFIC_0)
+    coalescable = True
 
     __slots__ = ("secs", "speed", "strikes", "max_strikes")
 
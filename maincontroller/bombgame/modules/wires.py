@@ -209,7 +209,7 @@ class WiresUpdateMessage(BusMessage):
         return cls(module, direction, wires=wires)
 
     def _serialize_data(self):
-        return struct.pack("<6B", self.wires)
+        return struct.pack("<6B", *self.wires)
 
     def _data_repr(self):
         return " ".join(wire.name for wire in self.wires)
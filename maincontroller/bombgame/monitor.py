@@ -0,0 +1,133 @@
+from asyncio import Task, Handle, create_task, sleep as async_sleep, get_running_loop
+from collections import deque
+from logging import getLogger
+from time import perf_counter
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from bombgame.config import (LOOP_MONITOR_INTERVAL, LOOP_MONITOR_WINDOW, LOOP_SLOW_CALLBACK_DURATION,
+                             LOOP_SLOW_CALLBACK_HISTORY)
+from bombgame.utils import log_errors
+
+LOGGER = getLogger("LoopMonitor")
+
+
+class SlowCallback(NamedTuple):
+    """A callback that blocked the event loop for longer than the slow callback threshold."""
+    name: str
+    duration: float
+    time: float
+
+
+def describe_callback(handle: Handle) -> str:
+    """Returns a readable description of what a handle runs.
+
+    Task steps are described by the task name and the chain of coroutines the task is awaiting, so e.g. event listener
+    tasks show the listener they run.
+    """
+    callback = handle._callback  # pylint: disable=protected-access
+    task = getattr(callback, "__self__", None)
+    if not isinstance(task, Task):
+        return getattr(callback, "__qualname__", repr(callback))
+    coros = []
+    coro = task.get_coro()
+    while coro is not None and len(coros) < 8:
+        coros.append(getattr(coro, "__qualname__", repr(coro)))
+        coro = getattr(coro, "cr_await", None)
+    return f"{task.get_name()} ({' > '.join(coros)})"
+
+
+class LoopMonitor:
+    """Measures the lag of the event loop and reports callbacks that block it.
+
+    The lag is measured by sleeping for ``interval`` seconds and comparing the time the sleep actually ended to the
+    requested time, and the last ``window`` measurements are kept for rolling percentiles.
+
+    If ``slow_callback_duration`` is set, every callback run by the event loop is timed, and the ones that take longer
+    are logged and kept in ``slow_callbacks``. This works like asyncio's debug mode but without its other overhead. The
+    timing replaces ``asyncio.Handle._run`` for the whole process until ``stop`` is called, so only one monitor at a
+    time may time callbacks.
+    """
+
+    lags: Deque[float]
+    slow_callbacks: Deque[SlowCallback]
+
+    _active: Optional["LoopMonitor"] = None
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, window: int = LOOP_MONITOR_WINDOW,
+                 slow_callback_duration: Optional[float] = LOOP_SLOW_CALLBACK_DURATION):
+        self.interval = interval
+        self.slow_callback_duration = slow_callback_duration
+        self.lags = deque(maxlen=window)
+        self.slow_callbacks = deque(maxlen=LOOP_SLOW_CALLBACK_HISTORY)
+        self._task = None
+        self._original_run = None
+
+    def start(self):
+        if self._task is not None:
+            raise RuntimeError("monitor already started")
+        self._task = create_task(log_errors(self._measure_lag()))
+        if self.slow_callback_duration is not None:
+            self._hook_handles()
+
+    def stop(self):
+        if self._task is None:
+            raise RuntimeError("monitor not started")
+        self._task.cancel()
+        self._task = None
+        self._unhook_handles()
+
+    def _unhook_handles(self):
+        if self._original_run is None:
+            return
+        Handle._run = self._original_run  # pylint: disable=protected-access
+        self._original_run = None
+        LoopMonitor._active = None
+
+    def _hook_handles(self):
+        if LoopMonitor._active is not None:
+            raise RuntimeError("another monitor is already timing callbacks")
+        LoopMonitor._active = self
+        self._original_run = original_run = Handle._run  # pylint: disable=protected-access
+        threshold = self.slow_callback_duration
+        report = self._report_slow
+        loop = get_running_loop()
+
+        def timed_run(handle: Handle):
+            # other event loops, e.g. ones run by tests in other threads, are not timed
+            if handle._loop is not loop:  # pylint: disable=protected-access
+                original_run(handle)
+                return
+            start = perf_counter()
+            original_run(handle)
+            duration = perf_counter() - start
+            if duration >= threshold:
+                report(handle, duration)
+
+        Handle._run = timed_run  # pylint: disable=protected-access
+
+    def _report_slow(self, handle: Handle, duration: float):
+        name = describe_callback(handle)
+        LOGGER.warning("Executing %s took %.3f seconds", name, duration)
+        self.slow_callbacks.append(SlowCallback(name, duration, get_running_loop().time()))
+
+    async def _measure_lag(self):
+        loop = get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await async_sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def lag_percentiles(self) -> Dict[str, float]:
+        """Returns the median, 90th and 99th percentile and maximum of the recent lag measurements in milliseconds."""
+        lags = sorted(self.lags)
+        if not lags:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+        percentiles = {f"p{pct}": lags[min(len(lags) - 1, len(lags) * pct // 100)] * 1000 for pct in (50, 90, 99)}
+        percentiles["max"] = lags[-1] * 1000
+        return percentiles
+
+    def summary(self) -> Dict[str, Any]:
+        now = get_running_loop().time()
+        slow: List[Dict[str, Any]] = [{"name": callback.name, "duration": callback.duration * 1000,
+                                       "ago": now - callback.time} for callback in self.slow_callbacks]
+        return {"samples": len(self.lags), "lag": self.lag_percentiles(), "slow_callbacks": slow}
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import getLogger
+from math import floor
+from os import scandir
+from os.path import dirname, realpath, join, isdir
+from random import choice
+from time import monotonic, perf_counter, sleep
+from typing import NamedTuple, Dict, List, Optional, TYPE_CHECKING, Tuple
+
+import pygame
+
+from bombgame.config import MUSIC_VOLUME, MUSIC_CROSSFADE_DURATION
+from bombgame.metrics import LATENCY
+from bombgame.websocket import InvalidMessage
+
+if TYPE_CHECKING:
+    from bombgame.audio import AudioCommandQueue
+
+MUSIC_FOLDER = join(dirname(dirname(dirname(realpath(__file__)))), "sounds", "music")
+
+# the minimum time before a music stem starts playing that it is prepared, longer if copying the stem takes longer
+MUSIC_PREPARE_AHEAD = 0.05
+
+LOGGER = getLogger("Music")
+
+
+class MusicStemLoaded(NamedTuple):
+    track_name: str
+    index: int
+    # raw samples in the mixer's format
+    samples: bytes
+
+
+class SelectMusicStem(NamedTuple):
+    track_name: str
+    index: int
+    # the perf_counter() time when the stem was selected
+    requested: float
+
+
+class MusicStemPrepared(NamedTuple):
+    """A stem rotated to start where the previous one is when it is played, handed to the audio thread on time."""
+    generation: int
+    selected: SelectMusicStem
+    sound: pygame.mixer.Sound
+    # the time.monotonic() time the stem was prepared to start at
+    at: float
+
+
+class PlayMusic(NamedTuple):
+    pass
+
+
+class StopMusic(NamedTuple):
+    pass
+
+
+class MusicTrack(NamedTuple):
+    name: str
+    filenames: List[str]
+
+
+class MusicMixer:
+    """Plays the stems of a music track on two dedicated mixer channels, crossfading from one stem to another.
+
+    The stems of a track are loops of the same length, so a new stem is started from the position the current one has
+    reached and the two stay on the beat through the crossfade. The stems are decoded by ``MusicManager`` and handed
+    over as raw samples, so the audio thread never waits for files to be read. Rotating a stem to the position it
+    starts from takes a copy of the whole stem, so a preparer thread does it for a start time ahead and hands the sound
+    back to the audio thread at that time. The lead is twice the time the last copy took for a stem of that size, but
+    at least ``MUSIC_PREPARE_AHEAD``; if preparing still misses the start time, the stem is rotated again for a later
+    one.
+
+    All methods except ``_prepare`` must be called on the pygame thread.
+    """
+
+    _channels: Tuple[pygame.mixer.ChannelType, pygame.mixer.ChannelType]
+    _commands: AudioCommandQueue
+    _preparer: ThreadPoolExecutor
+    _active: int
+    _frame_size: int
+    _frequency: int
+    _track_name: Optional[str]
+    _stems: Dict[int, bytes]
+    _selected: Optional[SelectMusicStem]
+    _current: Optional[int]
+    _preparing: Optional[int]
+    # incremented whenever the stem being prepared is no longer wanted
+    _generation: int
+    _playing: bool
+    _loop_start: float
+    # the time the last preparation took per byte of samples, written by the preparer thread
+    _prepare_time_per_byte: float
+    # the time.monotonic() time when the current stem started playing
+    changed: Optional[float]
+
+    def __init__(self, first: pygame.mixer.ChannelType, second: pygame.mixer.ChannelType,
+                 commands: AudioCommandQueue):
+        self._channels = (first, second)
+        self._commands = commands
+        self._preparer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Music mixer")
+        self._active = 0
+        frequency, size, channels = pygame.mixer.get_init()
+        self._frequency = frequency
+        self._frame_size = abs(size) // 8 * channels
+        self._track_name = None
+        self._stems = {}
+        self._selected = None
+        self._current = None
+        self._preparing = None
+        self._generation = 0
+        self._playing = False
+        self._loop_start = monotonic()
+        self._prepare_time_per_byte = 0.0
+        self.changed = None
+
+    def close(self):
+        self._generation += 1
+        self._preparer.shutdown(wait=True)
+
+    def stem_loaded(self, command: MusicStemLoaded):
+        if command.track_name != self._track_name:
+            return
+        self._stems[command.index] = command.samples
+        self._update()
+
+    def select(self, command: SelectMusicStem):
+        if command.track_name != self._track_name:
+            self.stop()
+            self._track_name = command.track_name
+            self._stems.clear()
+        self._selected = command
+        self._update()
+
+    def play(self):
+        self._playing = True
+        self._update()
+
+    def stop(self):
+        for channel in self._channels:
+            channel.stop()
+        self._playing = False
+        self._current = None
+        self._cancel_preparation()
+
+    def _cancel_preparation(self):
+        self._generation += 1
+        self._preparing = None
+
+    def _update(self):
+        if not self._playing or self._selected is None or self._selected.index == self._preparing:
+            return
+        if self._selected.index == self._current:
+            # the stem being prepared was deselected again before it started
+            self._cancel_preparation()
+            return
+        samples = self._stems.get(self._selected.index)
+        if samples is None:
+            LOGGER.debug("Music stem %d not loaded yet", self._selected.index)
+            return
+        self._cancel_preparation()
+        self._preparing = self._selected.index
+        # the first stem starts the loop, so it isn't rotated
+        loop_start = self._loop_start if self._current is not None else None
+        self._preparer.submit(self._prepare, self._generation, self._selected, samples,
+                              monotonic() + self._prepare_lead(len(samples)), loop_start)
+
+    def _prepare_lead(self, size: int) -> float:
+        return max(MUSIC_PREPARE_AHEAD, 2 * self._prepare_time_per_byte * size)
+
+    def _prepare(self, generation: int, selected: SelectMusicStem, samples: bytes, at: float,
+                 loop_start: Optional[float]):
+        # called on the preparer thread
+        while True:
+            started = monotonic()
+            sound = self._rotated_sound(samples, at, loop_start)
+            finished = monotonic()
+            self._prepare_time_per_byte = (finished - started) / max(len(samples), 1)
+            if finished <= at or generation != self._generation:
+                break
+            LOGGER.warning("Preparing music stem %d took %.0f ms and missed its start by %.0f ms",
+                           selected.index, (finished - started) * 1000, (finished - at) * 1000)
+            if loop_start is None:
+                # nothing to stay on the beat with, so the first stem just starts later
+                at = finished
+                break
+            # rotate it again for a later start, so that it stays on the beat
+            at = finished + self._prepare_lead(len(samples))
+        delay = at - monotonic()
+        if delay > 0:
+            sleep(delay)
+        self._commands.put(MusicStemPrepared(generation, selected, sound, at))
+
+    def _rotated_sound(self, samples: bytes, at: float, loop_start: Optional[float]) -> pygame.mixer.Sound:
+        frames = len(samples) // self._frame_size
+        if loop_start is not None and frames:
+            offset = int((at - loop_start) * self._frequency) % frames * self._frame_size
+            if offset:
+                # rotate the loop so that it plays on from where the current stem will be at the start time
+                with memoryview(samples) as view:
+                    samples = b"".join((view[offset:], view[:offset]))
+        sound = pygame.mixer.Sound(buffer=samples)
+        sound.set_volume(MUSIC_VOLUME)
+        return sound
+
+    def stem_prepared(self, command: MusicStemPrepared):
+        if command.generation != self._generation:
+            return
+        self._preparing = None
+        if self._current is None:
+            self._loop_start = command.at
+            fade_ms = 0
+        else:
+            fade_ms = int(MUSIC_CROSSFADE_DURATION * 1000)
+            self._channels[self._active].fadeout(fade_ms)
+            self._active = 1 - self._active
+        LOGGER.debug("Playing music stem %d", command.selected.index)
+        self._channels[self._active].play(command.sound, loops=-1, fade_ms=fade_ms)
+        self._current = command.selected.index
+        self.changed = monotonic()
+        if LATENCY.enabled:
+            LATENCY.record("music stem request -> play", perf_counter() - command.selected.requested)
+        # the earlier stems are not needed anymore, as the time left only decreases
+        for index in [index for index in self._stems if index < self._current]:
+            del self._stems[index]
+
+
+class MusicManager:
+    """Selects the music track and the stem of it to play based on the time left, and loads the stems in the background.
+
+    The stem following the selected one is loaded ahead of time, so that switching to it doesn't wait for the file.
+    """
+
+    _commands: AudioCommandQueue
+    _folder: str
+    _tracks: List[MusicTrack]
+    _selected_track: Optional[MusicTrack] = None
+    _selected_stem: Optional[int] = None
+    _time_left: float = 1.0
+    _loader: ThreadPoolExecutor
+    _loads: Dict[int, Future]
+
+    def __init__(self, commands: AudioCommandQueue, folder: str = MUSIC_FOLDER):
+        self._commands = commands
+        self._folder = folder
+        self._tracks = []
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Music loader")
+        self._loads = {}
+
+    def close(self):
+        self._loader.shutdown(wait=False)
+
+    def discover(self):
+        if not isdir(self._folder):
+            LOGGER.warning("Missing music folder %s", self._folder)
+            return
+
+        # the files are only listed here, and a broken one is reported when its stem is loaded
+        with scandir(self._folder) as track_dirs:
+            for track_dir in track_dirs:
+                # a music track must be a folder with >= 1 wav file
+                if not track_dir.is_dir():
+                    continue
+                with scandir(track_dir.path) as files:
+                    track_files = sorted(file.name for file in files if file.name.endswith(".wav") and file.is_file())
+                if track_files:
+                    self._tracks.append(MusicTrack(track_dir.name, track_files))
+
+        if self._tracks:
+            LOGGER.info("Discovered %s music tracks", len(self._tracks))
+        else:
+            LOGGER.warning("No music tracks discovered")
+
+    def _init_music(self):
+        if self._tracks:
+            self._stop_music()
+            self._selected_track = choice(self._tracks)
+            self._selected_stem = None
+            self._time_left = 1.0
+            for load in self._loads.values():
+                load.cancel()
+            self._loads.clear()
+            self._queue_music_file()
+        else:
+            LOGGER.warning("No music tracks available to choose from")
+
+    def _queue_music_file(self):
+        if not self._selected_track:
+            LOGGER.warning("No music track selected, can't queue file")
+            return
+        stems = len(self._selected_track.filenames)
+        index = min(stems - 1, floor((1.0 - self._time_left) * stems))
+        if index == self._selected_stem:
+            return
+        self._selected_stem = index
+        self._load_stem(index)
+        self._commands.put(SelectMusicStem(self._selected_track.name, index, perf_counter()))
+        if index + 1 < stems:
+            self._load_stem(index + 1)
+        for earlier in [earlier for earlier in self._loads if earlier < index]:
+            del self._loads[earlier]
+
+    def _load_stem(self, index: int):
+        if index in self._loads:
+            return
+        track = self._selected_track
+        path = join(self._folder, track.name, track.filenames[index])
+        load = self._loader.submit(_decode_music_stem, path)
+        load.add_done_callback(lambda _: self._stem_loaded(track, index, load))
+        self._loads[index] = load
+
+    def _stem_loaded(self, track: MusicTrack, index: int, load: Future):
+        # called on the loader thread
+        if load.cancelled():
+            return
+        try:
+            samples = load.result()
+        except (OSError, pygame.error):
+            LOGGER.error("Failed to load music stem %s", track.filenames[index], exc_info=True)
+            return
+        self._commands.put(MusicStemLoaded(track.name, index, samples))
+
+    def _play_music(self):
+        self._commands.put(PlayMusic())
+
+    def _stop_music(self):
+        self._commands.put(StopMusic())
+
+    async def handle_music_message(self, data: dict):
+        if "init" in data:
+            self._init_music()
+        elif "play" in data:
+            self._play_music()
+        elif "stop" in data:
+            self._stop_music()
+        elif "time" in data:
+            if not isinstance(data["time"], (float, int)) or not 0.0 <= data["time"] <= 1.0:
+                raise InvalidMessage("time must be numeric and between 0-1")
+            self._time_left = data["time"]
+            self._queue_music_file()
+        else:
+            raise InvalidMessage("unknown audio action")
+
+
+def _decode_music_stem(path: str) -> bytes:
+    LOGGER.debug("Loading music stem %s", path)
+    return pygame.mixer.Sound(path).get_raw()
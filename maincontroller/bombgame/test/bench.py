@@ -0,0 +1,869 @@
+"""Microbenchmarks for performance-sensitive parts of the main controller.
+
+Usage: ``python -m bombgame.test.bench [name ...]``. Runs all benchmarks if no names are given.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from os import makedirs
+import socket
+import struct
+import tempfile
+import wave
+from asyncio import run, gather, Event, sleep as async_sleep, get_running_loop, wait_for
+from random import Random
+from select import select
+from sys import argv
+from time import perf_counter, sleep
+from typing import Callable, List, Optional, Tuple
+
+import can
+
+from bombgame import mcp23017
+from bombgame.audio import (SoundBank, SoundSystem, ChannelPool, PlaybackChannel, LocalPlayingSound, SOUND_REGISTRY,
+                            AUDIO_END_EVENT, AudioCommandQueue)
+from bombgame.bomb.ping import ModulePinger
+from bombgame.bus.bus import BombBus
+from bombgame.bus.messages import BusMessage, BusMessageDecoder, BusMessageDirection, ModuleId, PingMessage
+from bombgame.bus.trace import CanTraceRecorder, CanTrace
+from bombgame.config import MODULE_PING_TIMEOUT, BOMB_CASING, GPIO_INTERRUPT_DEBOUNCE, AUDIO_CHANNELS
+from bombgame.gpio import Gpio, ModuleReadyChange
+from bombgame.metrics import LATENCY
+from bombgame.modules import load_modules
+from bombgame.modules.base import Module
+from bombgame.music import MusicManager
+from bombgame.test.mock import mock_can_bus, synthetic_frames, FakeSMBus, FakeInterruptSource
+from bombgame.events import (BombStateChanged, ModuleStriked, TimerTick, ModuleDefused, BombModuleAdded,
+                             ModuleStateChanged, BombError)
+from bombgame.utils import Registry, EventSource, OverflowPolicy
+
+BENCHMARKS: Registry[str, Callable[[], None]] = Registry()
+
+
+def _report(name: str, count: int, elapsed: float, unit: str = "frames"):
+    print(f"  {name:<24} {count / elapsed:>14,.0f} {unit}/s")
+
+
+@BENCHMARKS.register("parse")
+def bench_parse():
+    """Compares BusMessage.parse against the precomputed BusMessageDecoder."""
+    load_modules()
+    frames = synthetic_frames(10000)
+    decoder = BusMessageDecoder()
+    rounds = 10
+    start = perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            BusMessage.parse(frame)
+    _report("BusMessage.parse", rounds * len(frames), perf_counter() - start)
+    start = perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            decoder.decode(frame)
+    _report("BusMessageDecoder", rounds * len(frames), perf_counter() - start)
+
+
+@BENCHMARKS.register("send")
+def bench_send():
+    """Compares one awaited BombBus.send per frame against bursts of concurrent sends and send_many."""
+    async def measure():
+        bus = BombBus(mock_can_bus())
+        receiver = mock_can_bus()
+        bus.start()
+        messages = [PingMessage(ModuleId(1, serial % 12), number=serial % 256) for serial in range(2000)]
+        start = perf_counter()
+        for message in messages:
+            await bus.send(message)
+        _report("sequential send", len(messages), perf_counter() - start)
+        start = perf_counter()
+        for burst in range(0, len(messages), 20):
+            await gather(*(bus.send(message) for message in messages[burst:burst + 20]))
+        _report("bursts of 20 sends", len(messages), perf_counter() - start)
+        start = perf_counter()
+        for burst in range(0, len(messages), 20):
+            await bus.send_many(messages[burst:burst + 20])
+        _report("send_many of 20", len(messages), perf_counter() - start)
+        bus.stop()
+        receiver.shutdown()
+    run(measure())
+
+
+class _SocketPairBus(can.BusABC):
+    """A CAN bus backed by a Unix socket pair. ``inject`` writes a frame to be received from the other end."""
+
+    _FRAME = struct.Struct("<IB8s")
+
+    def __init__(self):
+        super().__init__(channel="socketpair")
+        self.channel_info = "socket pair"
+        self._socket, self._peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+
+    def inject(self, frame: can.Message):
+        self._peer.send(self._FRAME.pack(frame.arbitration_id, frame.dlc, bytes(frame.data)))
+
+    def send(self, msg, timeout=None):
+        pass
+
+    def _recv_internal(self, timeout):
+        if not select([self._socket], [], [], timeout)[0]:
+            return None, False
+        arbitration_id, dlc, data = self._FRAME.unpack(self._socket.recv(self._FRAME.size))
+        return can.Message(arbitration_id=arbitration_id, is_extended_id=True, data=data[:dlc]), False
+
+    def shutdown(self):
+        self._socket.close()
+        self._peer.close()
+
+    @staticmethod
+    def _detect_available_configs():
+        return []
+
+
+class _ThreadOnlySocketPairBus(_SocketPairBus):
+    def fileno(self):
+        raise NotImplementedError
+
+
+class _SocketPairBusWithFd(_SocketPairBus):
+    def fileno(self):
+        return self._socket.fileno()
+
+
+def _percentiles(samples: List[float]) -> str:
+    samples = sorted(samples)
+    return ", ".join(f"p{pct} {samples[min(len(samples) - 1, len(samples) * pct // 100)] * 1e6:.0f}us"
+                     for pct in (50, 90, 99))
+
+
+@BENCHMARKS.register("receive")
+def bench_receive():
+    """Measures latency from frame arrival to listener invocation for the thread and event loop receive modes."""
+    load_modules()
+    frame = PingMessage(ModuleId(1, 0), BusMessageDirection.IN).serialize()
+
+    async def measure(can_bus: _SocketPairBus, name: str):
+        bus = BombBus(can_bus)
+        received = Event()
+        arrival: Optional[float] = None
+        latencies = []
+
+        def listener(_):
+            latencies.append(perf_counter() - arrival)
+            received.set()
+
+        bus.add_listener(PingMessage, listener, reentrant=True)
+        bus.start()
+        for _ in range(2000):
+            received.clear()
+            arrival = perf_counter()
+            can_bus.inject(frame)
+            await received.wait()
+        bus.stop()
+        can_bus.shutdown()
+        print(f"  {name:<24} {_percentiles(latencies)}")
+
+    run(measure(_ThreadOnlySocketPairBus(), "receiver thread"))
+    run(measure(_SocketPairBusWithFd(), "event loop reader"))
+
+
+def _populated_event_source() -> Tuple[EventSource, List[Tuple[type, Callable]]]:
+    """Creates an event source with listeners like a bomb with 12 modules, the web UI and DMX attached.
+
+    Also returns the added (eventclass, callback) pairs.
+    """
+    source = EventSource()
+    listeners = []
+    eventclasses = [BombStateChanged, ModuleStriked, TimerTick, ModuleDefused] * 12
+    eventclasses += [BombModuleAdded, BombStateChanged, ModuleStateChanged, BombError, BombStateChanged, TimerTick]
+    for eventclass in eventclasses:
+        listener = (eventclass, lambda _: None)
+        source.add_listener(*listener, overflow=OverflowPolicy.DROP_OLDEST)
+        listeners.append(listener)
+    return source, listeners
+
+
+@BENCHMARKS.register("dispatch")
+def bench_dispatch():
+    """Compares a linear isinstance scan of all listeners against the memoized per-class listener lookup."""
+    async def measure():
+        source, listeners = _populated_event_source()
+        events = [ModuleStateChanged(None), TimerTick(None), BombError(None, None, "")] * 10000
+        start = perf_counter()
+        for event in events:
+            for listener in listeners:
+                if isinstance(event, listener[0]):
+                    pass
+        _report("isinstance scan", len(events), perf_counter() - start, "events")
+        start = perf_counter()
+        for event in events:
+            for listener in source._listeners_for(event.__class__):  # pylint: disable=protected-access
+                pass
+        _report("indexed lookup", len(events), perf_counter() - start, "events")
+        start = perf_counter()
+        for event in events[:3000]:
+            source.trigger(event)
+        await async_sleep(0)
+        _report("trigger", 3000, perf_counter() - start, "events")
+    run(measure())
+
+
+@BENCHMARKS.register("events")
+def bench_events():
+    """Measures listener invocations per second for events triggered on and off the event loop thread."""
+    async def measure(name: str, async_listener: bool, from_thread: bool):
+        source = EventSource()
+        count = 20000
+        done = Event()
+        received = 0
+
+        def listener(_):
+            nonlocal received
+            received += 1
+            if received == count:
+                done.set()
+
+        async def async_listener_func(event):
+            listener(event)
+
+        source.add_listener(TimerTick, async_listener_func if async_listener else listener, reentrant=True)
+
+        def trigger_all():
+            for _ in range(count):
+                source.trigger(TimerTick(None))
+
+        start = perf_counter()
+        if from_thread:
+            await get_running_loop().run_in_executor(None, trigger_all)
+        else:
+            trigger_all()
+        await done.wait()
+        _report(name, count, perf_counter() - start, "events")
+
+    run(measure("sync, other thread", False, True))
+    run(measure("sync, loop thread", False, False))
+    run(measure("async, other thread", True, True))
+    run(measure("async, loop thread", True, False))
+
+
+@BENCHMARKS.register("queue")
+def bench_queue():
+    """Floods a stalled listener with module updates under each overflow policy and reports its queue statistics."""
+    async def measure(name: str, **kwargs):
+        source = EventSource()
+        stalled = Event()
+        delivered = []
+
+        async def listener(event):
+            await stalled.wait()
+            delivered.append(event)
+
+        source.add_listener(ModuleStateChanged, listener, queue_size=64, **kwargs)
+        modules = list(range(12))
+
+        def trigger_all():
+            for number in range(5000):
+                source.trigger(ModuleStateChanged(modules[number % 12]))
+
+        start = perf_counter()
+        if kwargs.get("overflow") == OverflowPolicy.BLOCK:
+            loop = get_running_loop()
+            loop.call_later(0.2, stalled.set)
+            await loop.run_in_executor(None, trigger_all)
+        else:
+            trigger_all()
+        elapsed = perf_counter() - start
+        stats = source.listener_stats()[0]
+        stalled.set()
+        while source.listener_stats()[0].depth:
+            await async_sleep(0.01)
+        await async_sleep(0.01)
+        print(f"  {name:<24} {5000 / elapsed:>14,.0f} events/s, max depth {stats.max_depth}, "
+              f"dropped {stats.dropped}, coalesced {stats.coalesced}, delivered {len(delivered)}")
+
+    run(measure("drop oldest", overflow=OverflowPolicy.DROP_OLDEST))
+    run(measure("coalesce by module", overflow=OverflowPolicy.COALESCE, coalesce_key=lambda event: event.module))
+    run(measure("block (other thread)", overflow=OverflowPolicy.BLOCK))
+
+
+class _PingBenchModule:
+    """A stand-in for a module that never answers pings, using the real ping bookkeeping of ``Module``."""
+    ping_deadline = Module.ping_deadline
+    ping_check = Module.ping_check
+    start_ping = Module.start_ping
+
+    def __init__(self, serial: int, lateness: List[float]):
+        self.bus_id = ModuleId(1, serial)
+        self.last_received = get_running_loop().time()
+        self.last_ping_time = None
+        self.last_ping_id = 0
+        self.ping_timeout = False
+        self._lateness = lateness
+
+    def trigger_error(self, *_):
+        loop = get_running_loop()
+        self._lateness.append(loop.time() - self.last_ping_time - MODULE_PING_TIMEOUT)
+
+
+@BENCHMARKS.register("ping")
+def bench_ping():
+    """Measures how late ping timeouts are detected and in how many batches pings are sent by the ping scheduler."""
+    logging.getLogger("ModulePing").setLevel(logging.ERROR)
+
+    async def measure(count: int):
+        lateness = []
+        batches = []
+
+        class Bomb:
+            @staticmethod
+            async def send_many(messages):
+                batches.append(len(messages))
+
+        pinger = ModulePinger(Bomb())
+        for serial in range(count):
+            pinger.add(_PingBenchModule(serial, lateness))
+        task = get_running_loop().create_task(pinger.run())
+        while len(lateness) < count:
+            await async_sleep(0.1)
+        task.cancel()
+        print(f"  {count:>3} modules               timeout detected {_percentiles(lateness)} late, "
+              f"{len(batches)} ping batches")
+
+    run(measure(12))
+    run(measure(120))
+
+
+@BENCHMARKS.register("trace")
+def bench_trace():
+    """Records an hour of synthetic traffic at 100 frames/s to a CAN trace and decodes it back."""
+    load_modules()
+    frames = synthetic_frames(10000)
+    total = 3600 * 100
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/bench.trace"
+        recorder = CanTraceRecorder(path)
+        start = perf_counter()
+        for index in range(total):
+            recorder.record(index / 100, frames[index % len(frames)], index % 2 == 0)
+        recorder.close()
+        _report("record", total, perf_counter() - start)
+        decoder = BusMessageDecoder()
+        with CanTrace(path) as trace:
+            start = perf_counter()
+            for _, arbitration_id, _, dlc, data in trace.iter_raw():
+                decoder.decode_raw(arbitration_id, data[:dlc])
+            elapsed = perf_counter() - start
+            _report("read and decode", len(trace), elapsed)
+            print(f"  an hour of traffic decoded in {elapsed:.2f} s")
+
+
+@BENCHMARKS.register("gpio")
+def bench_gpio():
+    """Polls the module ready pins of a full casing on a fake SMBus and counts the I2C transactions per poll."""
+    # pylint: disable=protected-access,too-many-locals
+
+    async def measure():
+        logging.getLogger("GPIO").setLevel(logging.ERROR)
+        specs = list(BOMB_CASING.gpio_config)
+        bus = FakeSMBus([spec.mcp23017_addr for spec in specs])
+        gpio = Gpio(BOMB_CASING, bus)
+        gpio._sync_check_ready_changes()
+        changes = []
+        gpio.add_listener(ModuleReadyChange, changes.append, reentrant=True)
+        rng = Random(1)
+        toggles = [(rng.choice(specs), rng.randrange(len(specs[0].ready_pins))) for _ in range(100)]
+        polls = 10000
+
+        def poll_per_pin():
+            # the previous implementation, reading each ready pin separately inside read transactions
+            for mcp in gpio._mcps:
+                mcp.begin_read()
+            for location, module in enumerate(gpio._modules):
+                gpio._ready[location] = module.mcp.read_pin(None, module.ready)
+            for mcp in gpio._mcps:
+                mcp.end_read()
+
+        def interrupts_per_port():
+            for mcp in gpio._mcps:
+                mcp.get_interrupts(mcp23017.A)
+                mcp.get_interrupts(mcp23017.B)
+
+        def interrupts_block_read():
+            for mcp in gpio._mcps:
+                mcp.get_interrupts()
+
+        # block reads go first so that the ready changes seen are exactly the toggled pins
+        for name, poll in (("ready, block read", gpio._sync_check_ready_changes), ("ready, per pin", poll_per_pin),
+                           ("interrupts, block read", interrupts_block_read),
+                           ("interrupts, per port", interrupts_per_port)):
+            bus.transactions.clear()
+            start = perf_counter()
+            for index in range(polls):
+                if index % 100 == 0:
+                    spec, pin = toggles[index // 100]
+                    ready = spec.ready_pins[pin]
+                    bus.set_input(spec.mcp23017_addr, ready, not bus._inputs[spec.mcp23017_addr] >> ready & 1)
+                poll()
+            elapsed = perf_counter() - start
+            print(f"  {name:<24} {bus.transaction_count / polls:>6.1f} transactions/poll, "
+                  f"{elapsed / polls * 1e6:6.1f} us/poll")
+        if len(changes) != len(toggles):
+            raise SystemExit(f"expected {len(toggles)} ready changes, got {len(changes)}")
+
+    run(measure())
+
+
+@BENCHMARKS.register("outputs")
+def bench_outputs():
+    """Counts the I2C writes made to reset a full casing, to enable each module location in turn and to set widgets."""
+    # pylint: disable=protected-access
+
+    async def measure():
+        logging.getLogger("GPIO").setLevel(logging.ERROR)
+        specs = list(BOMB_CASING.gpio_config)
+        bus = FakeSMBus([spec.mcp23017_addr for spec in specs])
+        gpio = Gpio(BOMB_CASING, bus)
+        gpio._executor.start()
+        locations = range(BOMB_CASING.capacity)
+        widgets = range(BOMB_CASING.widget_capacity)
+
+        async def all_on():
+            await gpio.apply(dict.fromkeys(locations, True), dict.fromkeys(widgets, True))
+
+        async def reset_per_port():
+            # the previous implementation, which committed each changed port of a chip separately
+            for mcp in gpio._mcps:
+                mcp.begin_write()
+            for module in gpio._modules:
+                module.mcp.write_pin(None, module.enable, True)
+            for widget in gpio._widgets:
+                widget.mcp.write_pin(None, widget.widget, False)
+            for mcp in gpio._mcps:
+                for port in (mcp23017.A, mcp23017.B):
+                    if mcp._writes[port.number] != mcp._outputs[port.number]:
+                        mcp.write_port(port, mcp._writes[port.number], ignore_transaction=True)
+                mcp._writes = None
+
+        async def enumeration_per_pin():
+            for location in locations:
+                await gpio.set_enable(location, True)
+                await gpio.set_enable(location, False)
+
+        async def enumeration_batched():
+            # like Bomb._detect_modules_sequential, which disables the previous location in the same batch
+            for location in locations:
+                await gpio.apply({location: True, **({location - 1: False} if location else {})})
+            await gpio.apply({locations[-1]: False})
+
+        async def widgets_per_pin():
+            for location in widgets:
+                await gpio.set_widget(location, location % 2 == 0)
+
+        async def widgets_batched():
+            await gpio.apply(widgets={location: location % 2 == 0 for location in widgets})
+
+        for name, prepare, action in (("reset, per port", all_on, reset_per_port),
+                                      ("reset, batched", all_on, gpio.reset),
+                                      ("enumeration, per pin", gpio.reset, enumeration_per_pin),
+                                      ("enumeration, batched", gpio.reset, enumeration_batched),
+                                      ("widgets, per pin", gpio.reset, widgets_per_pin),
+                                      ("widgets, batched", gpio.reset, widgets_batched)):
+            await prepare()
+            bus.transactions.clear()
+            await action()
+            writes = bus.transactions["write_byte_data"] + bus.transactions["write_i2c_block_data"]
+            print(f"  {name:<24} {writes:>4} writes")
+        gpio._executor.shutdown(True)
+
+    run(measure())
+
+
+@BENCHMARKS.register("interrupt")
+def bench_interrupt():
+    """Measures how quickly bouncing ready pins are detected through interrupts on a fake SMBus."""
+    # pylint: disable=too-many-locals
+
+    async def measure():
+        logging.getLogger("GPIO").setLevel(logging.ERROR)
+        specs = list(BOMB_CASING.gpio_config)
+        interrupts = FakeInterruptSource()
+        bus = FakeSMBus([spec.mcp23017_addr for spec in specs], interrupts)
+        gpio = Gpio(BOMB_CASING, bus, interrupts)
+        gpio.start()
+        await gpio.check_ready_changes()
+        changes = []
+        changed = Event()
+
+        def ready_changed(change: ModuleReadyChange):
+            changes.append(change)
+            changed.set()
+
+        gpio.add_listener(ModuleReadyChange, ready_changed, reentrant=True)
+        rng = Random(1)
+        levels = {}
+        latencies = []
+        toggles = 50
+        transactions = 0
+        for _ in range(toggles):
+            spec = rng.choice(specs)
+            pin = rng.choice(spec.ready_pins)
+            level = not levels.get((spec.mcp23017_addr, pin), False)
+            levels[spec.mcp23017_addr, pin] = level
+            changed.clear()
+            bus.transactions.clear()
+            start = perf_counter()
+            # the contact bounces a few times within the debounce period
+            for bounce in (level, not level, level):
+                bus.set_input(spec.mcp23017_addr, pin, bounce)
+                await async_sleep(GPIO_INTERRUPT_DEBOUNCE / 5)
+            await wait_for(changed.wait(), 1.0)
+            latencies.append(perf_counter() - start)
+            # let any handling of the bounces finish
+            await async_sleep(GPIO_INTERRUPT_DEBOUNCE * 3)
+            transactions += bus.transaction_count
+        gpio.stop()
+        print(f"  {toggles} bouncing ready pins: {len(changes)} changes, detected {_percentiles(latencies)} "
+              f"after the first edge, {transactions / toggles:.1f} transactions each")
+        if len(changes) != toggles:
+            raise SystemExit(f"expected {toggles} ready changes, got {len(changes)}")
+
+    run(measure())
+
+
+@BENCHMARKS.register("sound")
+def bench_sound():
+    """Measures the first-play latency of the tick sound when it is loaded on demand and when it was preloaded."""
+    # pylint: disable=import-outside-toplevel,protected-access
+    from bombgame.bomb.bomb import Bomb
+
+    load_modules()
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    filename = "tick_1.0.wav"
+    rounds = 20
+
+    def first_play(system: SoundSystem) -> float:
+        start = perf_counter()
+        playing = system.play_sound_locally(filename, 0)
+        # sleep instead of yielding to the event loop to let the pygame thread have the GIL
+        while playing.channel is None:
+            sleep(1e-5)
+        return perf_counter() - start
+
+    async def measure(cache_folder: str):
+        system = SoundSystem()
+        await system.start()
+        await system.loaded
+        on_demand = []
+        preloaded = []
+        for _ in range(rounds):
+            # like before sounds were preloaded: the sound is requested right before the first tick
+            system._bank = SoundBank(None)
+            system._requested_sounds.clear()
+            system.load_sounds({Bomb})
+            on_demand.append(first_play(system))
+            system.stop_all_sounds()
+            # the bank is filled at startup, so the first tick finds its samples ready
+            system._bank = SoundBank(None)
+            system._requested_sounds.clear()
+            await system.load_sounds(SOUND_REGISTRY.keys())
+            preloaded.append(first_play(system))
+            system.stop_all_sounds()
+        decode = []
+        cached = []
+        for _ in range(rounds):
+            system._bank = SoundBank(cache_folder)
+            system._requested_sounds.clear()
+            start = perf_counter()
+            await system.load_sounds(SOUND_REGISTRY.keys())
+            (cached if decode else decode).append(perf_counter() - start)
+        system.stop()
+        sounds = len({sound.filename for sounds in SOUND_REGISTRY.values() for sound in sounds})
+        print(f"  first play, loaded on demand     {_percentiles(on_demand)}")
+        print(f"  first play, preloaded            {_percentiles(preloaded)}")
+        print(f"  load {sounds} sounds, decoding       {decode[0] * 1e6:.0f}us")
+        print(f"  load {sounds} sounds, from cache     {_percentiles(cached)}")
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        run(measure(cache_folder))
+
+
+@BENCHMARKS.register("channels")
+def bench_channels():
+    """Fires bursts of sound requests at the mixer with the channel pool and with a linear scan of the channels."""
+    # pylint: disable=import-outside-toplevel,protected-access,too-many-locals
+    import pygame
+
+    load_modules()
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.mixer.init(44100, -16, 2, 512)
+    pygame.mixer.set_num_channels(AUDIO_CHANNELS)
+    channels = [pygame.mixer.Channel(num) for num in range(AUDIO_CHANNELS)]
+    for channel in channels:
+        channel.set_endevent(AUDIO_END_EVENT)
+    bank = SoundBank(None)
+    filenames = sorted({sound.filename for sounds in SOUND_REGISTRY.values() for sound in sounds})
+    for filename in filenames:
+        bank.load(filename)
+    rng = Random(1)
+    requests = [(rng.choice(filenames), rng.randrange(4)) for _ in range(3000)]
+    burst = 15
+    # the stop commands of the played sounds are never handled here
+    commands = AudioCommandQueue()
+
+    def settle():
+        for channel in channels:
+            channel.stop()
+        sleep(0.1)
+        pygame.event.pump()
+
+    def linear(filename: str, priority: int, playback: List[PlaybackChannel]) -> Optional[PlaybackChannel]:
+        # end events were only logged before the channel pool
+        pygame.event.get(AUDIO_END_EVENT)
+        channel = next((channel for channel in playback if not channel.channel.get_busy()), None)
+        if channel is None:
+            channel = min(playback, key=lambda ch: (ch.priority, ch.end))
+            if channel.priority > priority:
+                return None
+        channel.play(bank.get(filename), LocalPlayingSound(filename, priority, commands))
+        return channel
+
+    def pooled(filename: str, priority: int, pool: ChannelPool) -> Optional[PlaybackChannel]:
+        for event in pygame.event.get(AUDIO_END_EVENT):
+            pool.ended(event.code)
+        channel = pool.acquire(priority)
+        if channel is not None:
+            pool.play(channel, bank.get(filename), LocalPlayingSound(filename, priority, commands))
+        return channel
+
+    def measure(name: str, request: Callable, target):
+        settle()
+        elapsed = 0.0
+        dropped = 0
+        for index, (filename, priority) in enumerate(requests):
+            if index % burst == 0:
+                # let some of the sounds end between bursts
+                sleep(0.01)
+            start = perf_counter()
+            if request(filename, priority, target) is None:
+                dropped += 1
+            elapsed += perf_counter() - start
+        print(f"  {name:<24} {len(requests) / elapsed:>14,.0f} requests/s, {dropped} dropped")
+
+    measure("linear scan", linear, [PlaybackChannel(channel, index) for index, channel in enumerate(channels)])
+    pool = ChannelPool(channels)
+    measure("channel pool", pooled, pool)
+    settle()
+    for event in pygame.event.get(AUDIO_END_EVENT):
+        pool.ended(event.code)
+    pygame.mixer.quit()
+    pygame.display.quit()
+    if len(pool._free) != len(pool):
+        raise SystemExit(f"{len(pool) - len(pool._free)} channels still marked busy after all sounds were stopped")
+
+
+@BENCHMARKS.register("trigger")
+def bench_trigger():
+    """Measures the latency from requesting a sound to it starting to play, for single sounds and bursts of sounds."""
+    # pylint: disable=import-outside-toplevel
+    from bombgame.bomb.bomb import TICK_SOUND_SLOW
+
+    load_modules()
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    name = "sound request -> play"
+
+    async def measure():
+        system = SoundSystem()
+        await system.start()
+        await system.loaded
+        LATENCY.enabled = True
+        for burst in (1, AUDIO_CHANNELS):
+            LATENCY.reset()
+            latencies = []
+            for _ in range(200 if burst == 1 else 20):
+                start = perf_counter()
+                playing = [system.play_sound_locally(TICK_SOUND_SLOW.filename, 0) for _ in range(burst)]
+                # sleep instead of yielding to the event loop to let the pygame thread have the GIL
+                while playing[-1].channel is None:
+                    sleep(1e-5)
+                latencies.append(perf_counter() - start)
+                system.stop_all_sounds()
+                sleep(0.005)
+            summary = LATENCY.summary()[name]
+            print(f"  burst of {burst:<2} last played   {_percentiles(latencies)}")
+            print(f"  burst of {burst:<2} {name} p50 {summary['p50'] * 1000:.0f}us, "
+                  f"p90 {summary['p90'] * 1000:.0f}us, p99 {summary['p99'] * 1000:.0f}us")
+        LATENCY.enabled = False
+        LATENCY.reset()
+        system.stop()
+
+    run(measure())
+
+
+@BENCHMARKS.register("schedule")
+def bench_schedule():
+    """Measures how late ticks start playing on a busy event loop when played on the tick and when scheduled ahead."""
+    # pylint: disable=import-outside-toplevel
+    from bombgame.bomb.bomb import TICK_SOUND_SLOW
+
+    load_modules()
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    filename = TICK_SOUND_SLOW.filename
+    ticks = 100
+    interval = 0.05
+
+    async def busy_loop(until: float):
+        # callbacks hogging the event loop for up to 20 ms at a time
+        rng = Random(1)
+        while perf_counter() < until:
+            end = perf_counter() + rng.uniform(0.0, 0.02)
+            while perf_counter() < end:
+                pass
+            await async_sleep(0)
+
+    async def measure(system: SoundSystem, name: str, play: Callable[[float], List[LocalPlayingSound]]):
+        loop = get_running_loop()
+        start = loop.time() + 0.5
+        playing = []
+
+        def schedule(tick: int):
+            at = start + tick * interval
+            playing.append((at, play(at)))
+
+        for tick in range(ticks):
+            # request each tick a few hundred milliseconds ahead, like the bomb schedules the next tick on each tick
+            loop.call_at(start + tick * interval - 0.3, schedule, tick)
+        await busy_loop(perf_counter() + 0.5 + ticks * interval + 0.1)
+        await async_sleep(0.1)
+        system.stop_all_sounds()
+        lateness = [sounds[0].started - at for at, sounds in playing if sounds and sounds[0].started is not None]
+        print(f"  {name:<24} {len(lateness)} played, late by {_percentiles(lateness)}")
+
+    async def main_task():
+        system = SoundSystem()
+        await system.start()
+        await system.loaded
+        loop = get_running_loop()
+
+        def play_on_tick(at: float) -> List[LocalPlayingSound]:
+            # the old way: start the sound from an event loop callback at the time of the tick
+            sounds = []
+            loop.call_at(at, lambda: sounds.append(system.play_sound_locally(filename, 0)))
+            return sounds
+
+        await measure(system, "played on the tick", play_on_tick)
+        await measure(system, "scheduled ahead", lambda at: [system.schedule_sound_locally(filename, 0, at)])
+        system.stop()
+
+    run(main_task())
+
+
+def _write_music_track(folder: str, name: str, stems: int, duration: float):
+    """Writes a music track of stems with a square wave of a different pitch each."""
+    makedirs(os.path.join(folder, name))
+    for stem in range(stems):
+        period = 100 - 10 * stem
+        cycle = struct.pack("<hh", 8000, 8000) * (period // 2) + struct.pack("<hh", -8000, -8000) * (period // 2)
+        with wave.Wave_write(os.path.join(folder, name, f"{stem}.wav")) as file:
+            file.setnchannels(2)
+            file.setsampwidth(2)
+            file.setframerate(44100)
+            file.writeframes(cycle * int(duration * 44100 / period))
+
+
+@BENCHMARKS.register("music")
+def bench_music():
+    """Measures the time from a music timer update to the crossfade to a new stem starting."""
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    stems = 6
+
+    async def switch(system: SoundSystem, stem: int) -> float:
+        # pylint: disable=protected-access
+        mixer = system._music_mixer
+        start = perf_counter()
+        await system._music.handle_music_message({"time": 1.0 - (stem + 0.5) / stems})
+        # sleep instead of yielding to the event loop to let the pygame thread have the GIL
+        while mixer._current != stem:
+            sleep(1e-4)
+        return perf_counter() - start
+
+    async def measure(folder: str):
+        # pylint: disable=protected-access
+        system = SoundSystem()
+        system._music = MusicManager(system._commands, folder)
+        await system.start()
+        await system._music.handle_music_message({"init": True})
+        await system._music.handle_music_message({"play": True})
+        await switch(system, 0)
+        preloaded = []
+        for stem in range(1, stems):
+            # give the next stem time to be loaded in the background
+            await async_sleep(0.5)
+            preloaded.append(await switch(system, stem))
+        await system._music.handle_music_message({"init": True})
+        await system._music.handle_music_message({"play": True})
+        await switch(system, 0)
+        await async_sleep(0.5)
+        cold = [await switch(system, stem) for stem in range(2, stems, 2)]
+        system.stop()
+        print(f"  next stem, preloaded       {_percentiles(preloaded)}")
+        print(f"  skipping a stem, loading   {_percentiles(cold)}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        _write_music_track(folder, "track", stems, 30.0)
+        run(measure(folder))
+
+
+@BENCHMARKS.register("musicscan")
+def bench_musicscan():
+    """Compares reading the first file of every music track against listing the track folders."""
+    tracks = 300
+
+    def sequential(folder: str):
+        # the earlier discovery: listdir, isfile and wave.open for every track
+        found = 0
+        for track_name in os.listdir(folder):
+            track_path = os.path.join(folder, track_name)
+            files = sorted(file for file in os.listdir(track_path)
+                           if file.endswith(".wav") and os.path.isfile(os.path.join(track_path, file)))
+            with wave.open(os.path.join(track_path, files[0]), "rb") as wavfile:
+                found += wavfile.getnframes() / wavfile.getframerate() > 0
+        return found
+
+    def discover(folder: str) -> int:
+        # pylint: disable=protected-access
+        music = MusicManager(AudioCommandQueue(), folder)
+        music.discover()
+        music.close()
+        return len(music._tracks)
+
+    def measure(name: str, function: Callable[[], int]):
+        start = perf_counter()
+        found = function()
+        print(f"  {name:<32} {(perf_counter() - start) * 1000:>8.1f} ms ({found} tracks)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for track in range(tracks):
+            _write_music_track(folder, f"track{track}", 3, 0.5)
+        measure("listdir and wave.open", lambda: sequential(folder))
+        measure("scandir listing", lambda: discover(folder))
+
+
+def main():
+    names = argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        if name not in BENCHMARKS:
+            raise SystemExit(f"unknown benchmark {name}, available: {', '.join(BENCHMARKS)}")
+    for name in names:
+        print(f"{name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
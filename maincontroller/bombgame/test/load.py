@@ -0,0 +1,167 @@
+"""Generates load on the controller with a fully populated bomb of virtual modules.
+
+The bomb runs in real time with a virtual module in every slot of the casing. Random player input is sent to the
+modules at the given average rate, and the process CPU usage, event loop lag, ping round trip and the latency
+from each received message to the bomb's reactions (see ``bombgame.metrics``) are reported.
+The strike count is reset periodically, so random input won't end the game.
+
+Usage: ``python -m bombgame.test.load [duration] [inputs per second] [seed]``.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+from asyncio import run, sleep as async_sleep
+from sys import argv
+from time import perf_counter, process_time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from bombgame.bus.messages import BusMessage, PingMessage, ModuleId
+from bombgame.config import BOMB_CASING
+from bombgame.metrics import LATENCY
+from bombgame.monitor import LoopMonitor
+from bombgame.modules import load_modules
+from bombgame.modules.button import ButtonAction
+from bombgame.modules.keypad import KeypadPosition
+from bombgame.modules.password import WORDS
+from bombgame.modules.simonsays import SimonColor
+from bombgame.modules.ventinggas import VentingGasAnswer
+from bombgame.modules.wires import WireColor
+from bombgame.test.mock import (MockPhysicalModule, MockPhysicalSimon, MockPhysicalKeypad,
+                                MockPhysicalWires, MockPhysicalComplicatedWires, MockPhysicalPassword,
+                                MockPhysicalButton, MockPhysicalVentingGas)
+from bombgame.test.sim import SimulatedBomb, FULL_BOMB_MOCKS, set_up_modules, simulated_bomb
+from bombgame.utils import Registry
+
+#: random inputs that a player could give to each kind of virtual module
+RANDOM_INPUTS: Registry[type, Callable[[MockPhysicalModule, random.Random], Awaitable]] = Registry()
+
+
+@RANDOM_INPUTS.register(MockPhysicalSimon)
+async def _press_simon(mock: MockPhysicalSimon, rng: random.Random):
+    await mock.press_button(rng.choice([color for color in SimonColor if color != SimonColor.NONE]))
+
+
+@RANDOM_INPUTS.register(MockPhysicalKeypad)
+async def _press_keypad(mock: MockPhysicalKeypad, rng: random.Random):
+    await mock.press_button(rng.choice(list(KeypadPosition)))
+
+
+@RANDOM_INPUTS.register(MockPhysicalWires)
+@RANDOM_INPUTS.register(MockPhysicalComplicatedWires)
+async def _cut_wire(mock: MockPhysicalWires, rng: random.Random):
+    connected = [pos for pos, wire in enumerate(mock.wires) if wire != WireColor.DISCONNECTED]
+    if connected:
+        await mock.cut_wire(rng.choice(connected))
+
+
+@RANDOM_INPUTS.register(MockPhysicalPassword)
+async def _submit_password(mock: MockPhysicalPassword, rng: random.Random):
+    await mock.submit(rng.choice(WORDS).encode("ascii"))
+
+
+@RANDOM_INPUTS.register(MockPhysicalButton)
+async def _act_button(mock: MockPhysicalButton, rng: random.Random):
+    await mock.act(rng.choice(list(ButtonAction)))
+
+
+@RANDOM_INPUTS.register(MockPhysicalVentingGas)
+async def _answer_venting_gas(mock: MockPhysicalVentingGas, rng: random.Random):
+    if mock.active:
+        await mock.answer(rng.choice((VentingGasAnswer.YES, VentingGasAnswer.NO)))
+
+
+def _percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "no samples"
+    samples = sorted(samples)
+    return ", ".join(f"p{pct} {samples[min(len(samples) - 1, len(samples) * pct // 100)] * 1000:.2f}ms"
+                     for pct in (50, 90, 99, 100))
+
+
+async def generate_load(duration: float, rate: float, seed: int = 0):
+    load_modules()
+    random.seed(seed)
+    rng = random.Random(seed)
+    async with simulated_bomb(FULL_BOMB_MOCKS[:BOMB_CASING.capacity]) as simulated:
+        for module in simulated.physical:
+            module.hard_reset()
+        await _run_load(simulated, duration, rate, rng)
+
+
+async def _run_load(simulated: SimulatedBomb, duration: float, rate: float, rng: random.Random):
+    # pylint: disable=protected-access,too-many-locals
+    bomb = simulated.bomb
+    # the timer message holds strike counts in a byte
+    bomb.max_strikes = 255
+    LATENCY.enabled = True
+    LATENCY.reset()
+
+    received = 0
+    pings: Dict[Tuple[ModuleId, int], float] = {}
+    ping_latencies = []
+
+    def count_received(message):
+        nonlocal received
+        received += 1
+        if isinstance(message, PingMessage):
+            sent = pings.pop((message.module, message.number), None)
+            if sent is not None:
+                ping_latencies.append(perf_counter() - sent)
+
+    async def send_inputs():
+        targets = [mock for mock in simulated.physical if type(mock) in RANDOM_INPUTS]
+        while True:
+            await async_sleep(rng.expovariate(rate))
+            mock = rng.choice(targets)
+            if bomb.strikes > bomb.max_strikes // 2:
+                bomb.strikes = 0
+            bomb.create_task(RANDOM_INPUTS[type(mock)](mock, rng))
+
+    async def send_pings(interval: float = 0.1):
+        while True:
+            await async_sleep(interval)
+            # the ping is sent as the module's next ping, so that its number can't collide with the bomb's pings
+            ping = bomb.ping_module(rng.choice(bomb.modules))
+            if ping is not None:
+                pings[ping.module, ping.number] = perf_counter()
+
+    await bomb.initialize()
+    await set_up_modules(bomb, simulated.physical)
+    bomb.start_game()
+    await async_sleep(0.5)
+    bomb.start_timer()
+    simulated.bus.add_listener(BusMessage, count_received, reentrant=True)
+    for task in (send_inputs(), send_pings()):
+        bomb.create_task(task)
+    monitor = LoopMonitor(interval=0.05, window=int(duration / 0.05) + 1, slow_callback_duration=0.05)
+    monitor.start()
+    try:
+        start_cpu, start = process_time(), perf_counter()
+        await async_sleep(duration)
+        cpu, elapsed = process_time() - start_cpu, perf_counter() - start
+    finally:
+        monitor.stop()
+    print(f"{len(bomb.modules)} modules, {elapsed:.1f} s at {rate:g} inputs/s, "
+          f"{received / elapsed:.0f} messages/s received, bomb state {bomb._state.name}, {bomb.strikes} strikes")
+    print(f"  CPU usage (controller and virtual modules): {cpu / elapsed * 100:.1f}%")
+    print(f"  event loop lag: {_percentiles(list(monitor.lags))}")
+    for callback in monitor.slow_callbacks:
+        print(f"  slow callback: {callback.name} took {callback.duration * 1000:.1f}ms")
+    print(f"  ping round trip: {_percentiles(ping_latencies)}")
+    for name, summary in LATENCY.summary().items():
+        print(f"  {name}: {summary['count']} samples, p50 {summary['p50']:.2f}ms, p90 {summary['p90']:.2f}ms, "
+              f"p99 {summary['p99']:.2f}ms, max {summary['max']:.2f}ms")
+
+
+def main():
+    logging.basicConfig(level=logging.ERROR)
+    duration = float(argv[1]) if len(argv) > 1 else 30.0
+    rate = float(argv[2]) if len(argv) > 2 else 20.0
+    seed = int(argv[3]) if len(argv) > 3 else 0
+    run(generate_load(duration, rate, seed))
+
+
+if __name__ == "__main__":
+    main()
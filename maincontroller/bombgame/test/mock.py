@@ -1,19 +1,33 @@
 from abc import ABC, abstractmethod
-from asyncio import create_task
+from asyncio import create_task, get_running_loop, sleep as async_sleep
+from collections import Counter
 from enum import Enum
-from typing import List, Tuple
+from heapq import heappush, heappop
+from itertools import count
+from random import Random
+from typing import Dict, List, Tuple, Optional, Sequence, Set
 
 import can
 
+from bombgame import mcp23017
 from bombgame.bus.bus import BombBus
 from bombgame.bus.messages import (ModuleId, BusMessageDirection, BusMessage, AnnounceMessage, ResetMessage,
                                    InitCompleteMessage, PingMessage, LaunchGameMessage, StartTimerMessage,
                                    ExplodeBombMessage, DefuseBombMessage, StrikeModuleMessage, SolveModuleMessage,
                                    NeedyActivateMessage, NeedyDeactivateMessage)
-from bombgame.gpio import AbstractGpio, ModuleReadyChange
+from bombgame.gpio import AbstractGpio, ModuleReadyChange, InterruptSource
+from bombgame.modules.button import ButtonModule, ButtonAction, ButtonActionMessage, ButtonLightMessage
+from bombgame.modules.complicatedwires import (ComplicatedWiresModule, ComplicatedWiresUpdateMessage,
+                                               ComplicatedWiresSetLedsMessage)
+from bombgame.modules.keypad import KeypadModule, KeypadPosition, KeypadPressMessage, KeypadSetLedsMessage
+from bombgame.modules.needy import NEEDY_DEFAULT_TIMER
+from bombgame.modules.password import PasswordModule, PasswordSetCharactersMessage, PasswordSubmitMessage, WORD_LENGTH
 from bombgame.modules.registry import MODULE_ID_REGISTRY
 from bombgame.modules.simonsays import SimonSaysModule, SimonColor, SimonButtonPressMessage, SimonButtonBlinkMessage
 from bombgame.modules.timer import TimerModule, SetTimerStateMessage
+from bombgame.modules.ventinggas import (VentingGasModule, VentingGasAnswer, VentingGasQuestion,
+                                         VentingGasAnswerMessage, VentingGasSetQuestionMessage)
+from bombgame.modules.wires import WiresModule, WireColor, WiresUpdateMessage
 from bombgame.utils import EventSource, VersionNumber
 
 
@@ -21,6 +35,68 @@ def mock_can_bus() -> can.BusABC:
     return can.Bus(interface="virtual", channel="test_can_bus")
 
 
+def synthetic_frames(frame_count: int, seed: int = 1) -> List[can.Message]:
+    """Generates a mix of frames resembling the traffic of a fully populated bomb."""
+    rng = Random(seed)
+    timer = ModuleId(TimerModule.module_id, 0)
+    modules = [ModuleId(module_class.module_id, serial)
+               for module_class in (SimonSaysModule, KeypadModule, WiresModule) for serial in range(3)]
+    generators = [
+        lambda: PingMessage(rng.choice(modules), BusMessageDirection.IN, number=rng.randrange(256)),
+        lambda: PingMessage(timer, BusMessageDirection.OUT, number=rng.randrange(256)),
+        lambda: SetTimerStateMessage(timer, time_left=rng.randrange(900), speed=1.0, strikes=0, max_strikes=3),
+        lambda: SimonButtonPressMessage(ModuleId(SimonSaysModule.module_id, rng.randrange(3)), BusMessageDirection.IN,
+                                        color=rng.choice(list(SimonColor))),
+        lambda: KeypadPressMessage(ModuleId(KeypadModule.module_id, rng.randrange(3)), BusMessageDirection.IN,
+                                   position=rng.choice(list(KeypadPosition))),
+        lambda: WiresUpdateMessage(ModuleId(WiresModule.module_id, rng.randrange(3)), BusMessageDirection.IN,
+                                   wires=[rng.choice(list(WireColor)[:5]) for _ in range(6)]),
+        lambda: StrikeModuleMessage(rng.choice(modules)),
+        lambda: AnnounceMessage(rng.choice(modules), BusMessageDirection.IN, hw_version=VersionNumber(1, 0),
+                                sw_version=VersionNumber(1, 0), init_complete=True),
+    ]
+    return [rng.choice(generators)().serialize() for _ in range(frame_count)]
+
+
+class ManualHandle:
+    __slots__ = ("callback", "args", "cancelled")
+
+    def __init__(self, callback, args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ManualLoop:
+    """A minimal stand-in for an event loop whose time only moves when its scheduled callbacks are run."""
+
+    def __init__(self):
+        self._now = 0.0
+        self._heap = []
+        self._counter = count()
+
+    def time(self) -> float:
+        return self._now
+
+    def call_at(self, when: float, callback, *args, context=None) -> ManualHandle:  # pylint: disable=unused-argument
+        handle = ManualHandle(callback, args)
+        heappush(self._heap, (when, next(self._counter), handle))
+        return handle
+
+    def call_soon(self, callback, *args) -> ManualHandle:
+        return self.call_at(self._now, callback, *args)
+
+    def run(self):
+        while self._heap:
+            when, _, handle = heappop(self._heap)
+            if not handle.cancelled:
+                self._now = max(self._now, when)
+                handle.callback(*handle.args)
+
+
 class MockGpioEnableChange:
     def __init__(self, location: int, state: bool):
         self.location = location
@@ -69,6 +145,116 @@ class MockGpio(AbstractGpio):
         self._widget_pins[location] = value
 
 
+class FakeInterruptSource(InterruptSource):
+    """An interrupt source for ``Gpio`` that is triggered by testing code or a ``FakeSMBus``."""
+
+    def __init__(self):
+        self._callback = None
+        self.fired = 0
+
+    def start(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    def fire(self):
+        """Raises an interrupt."""
+        self.fired += 1
+        if self._callback is not None:
+            self._callback()
+
+
+class FakeSMBus:
+    """An SMBus with virtual MCP23017 chips that counts the transactions made on it.
+
+    Passed to ``Gpio`` to run it without hardware. The chips use the default register layout with sequential
+    operation. Testing code sets the levels of input pins with ``set_input``. If ``interrupts`` is given, it is fired
+    whenever a chip starts signaling an interrupt.
+    """
+
+    # pylint: disable=unused-argument
+
+    transactions: Counter
+
+    def __init__(self, addresses: Sequence[int], interrupts: Optional[FakeInterruptSource] = None):
+        self._interrupts = interrupts
+        self._registers: Dict[int, List[int]] = {address: [0x00] * (mcp23017.OLATB + 1) for address in addresses}
+        self._inputs: Dict[int, int] = {address: 0x0000 for address in addresses}
+        for registers in self._registers.values():
+            registers[mcp23017.IODIRA] = registers[mcp23017.IODIRB] = 0xff
+        self.transactions = Counter()
+
+    @property
+    def transaction_count(self) -> int:
+        return sum(self.transactions.values())
+
+    def _word(self, address: int, register_a: int) -> int:
+        registers = self._registers[address]
+        return registers[register_a] | registers[register_a + 1] << 8
+
+    def _gpio(self, address: int) -> int:
+        inputs = self._word(address, mcp23017.IODIRA)
+        levels = (self._inputs[address] ^ self._word(address, mcp23017.IPOLA)) & inputs
+        return levels | self._word(address, mcp23017.OLATA) & ~inputs & 0xffff
+
+    def set_input(self, address: int, pin: int, level: bool):
+        """Sets the level of an input pin (0-15) and raises an interrupt for it if enabled. Called by testing code."""
+        bit = 1 << pin
+        if bool(self._inputs[address] & bit) == level:
+            return
+        self._inputs[address] ^= bit
+        registers = self._registers[address]
+        if self._word(address, mcp23017.GPINTENA) & bit:
+            signaling = self._word(address, mcp23017.INTFA) != 0
+            port = mcp23017.B if pin >= 8 else mcp23017.A
+            registers[port.INTFx] |= bit >> (port.number * 8)
+            registers[port.INTCAPx] = self._gpio(address) >> (port.number * 8) & 0xff
+            if not signaling and self._interrupts is not None:
+                self._interrupts.fire()
+
+    def _read(self, address: int, register: int) -> int:
+        registers = self._registers[address]
+        if register in (mcp23017.GPIOA, mcp23017.GPIOB):
+            port = mcp23017.B if register == mcp23017.GPIOB else mcp23017.A
+            # reading the port clears its interrupt
+            registers[port.INTFx] = 0x00
+            return self._gpio(address) >> (port.number * 8) & 0xff
+        if register in (mcp23017.INTCAPA, mcp23017.INTCAPB):
+            registers[register - mcp23017.INTCAPA + mcp23017.INTFA] = 0x00
+        return registers[register]
+
+    def _write(self, address: int, register: int, value: int):
+        if register in (mcp23017.GPIOA, mcp23017.GPIOB):
+            register += mcp23017.OLATA - mcp23017.GPIOA
+        self._registers[address][register] = value & 0xff
+
+    def read_byte_data(self, i2c_addr: int, register: int, force=None) -> int:
+        self.transactions["read_byte_data"] += 1
+        return self._read(i2c_addr, register)
+
+    def write_byte_data(self, i2c_addr: int, register: int, value: int, force=None):
+        self.transactions["write_byte_data"] += 1
+        self._write(i2c_addr, register, value)
+
+    def read_i2c_block_data(self, i2c_addr: int, register: int, length: int, force=None) -> List[int]:
+        self.transactions["read_i2c_block_data"] += 1
+        # the read values must be captured before the reads clear the interrupt flags
+        values = [self._registers[i2c_addr][register + offset] for offset in range(length)]
+        for offset in range(length):
+            if register + offset not in (mcp23017.INTFA, mcp23017.INTFB):
+                values[offset] = self._read(i2c_addr, register + offset)
+        return values
+
+    def write_i2c_block_data(self, i2c_addr: int, register: int, data: Sequence[int], force=None):
+        self.transactions["write_i2c_block_data"] += 1
+        for offset, value in enumerate(data):
+            self._write(i2c_addr, register + offset, value)
+
+    def close(self):
+        pass
+
+
 class PhysicalModuleState(Enum):
     RESET = 0
     INITIALIZATION = 1
@@ -79,6 +265,9 @@ class PhysicalModuleState(Enum):
 
 
 class MockPhysicalModule(ABC, EventSource):
+    # the time the module takes to respond to MODULE_ENABLE, e.g. because it is still finishing its reset
+    announce_delay: float = 0.0
+
     def __init__(self, bus: BombBus, gpio: MockGpio, location: int, module_id: ModuleId):
         EventSource.__init__(self)
         self._bus = bus
@@ -90,7 +279,9 @@ class MockPhysicalModule(ABC, EventSource):
         self.strikes = 0
         self._reset_state()
         gpio.add_listener(MockGpioEnableChange, self._handle_enable_change)
-        bus.add_listener(BusMessage, self._handle_message)
+        # every module sees all bus traffic, so messages for other modules are dropped before they are queued
+        bus.add_listener(BusMessage, self._receive_message, reentrant=True)
+        self.add_listener(BusMessage, self._handle_message)
 
     def unplug(self):
         self.state = PhysicalModuleState.UNPLUGGED
@@ -115,6 +306,10 @@ class MockPhysicalModule(ABC, EventSource):
             self._gpio.set_ready_state(self.location, True)
 
     async def _enter_init(self):
+        if self.announce_delay:
+            await async_sleep(self.announce_delay)
+            if self.state != PhysicalModuleState.RESET or not self._gpio.get_enable_state(self.location):
+                return
         self._gpio.set_ready_state(self.location, False)
         self.state = PhysicalModuleState.INITIALIZATION
         hw_version, sw_version, init_complete = self._announce()
@@ -134,11 +329,13 @@ class MockPhysicalModule(ABC, EventSource):
     def _announce(self) -> Tuple[VersionNumber, VersionNumber, bool]:
         pass
 
+    def _receive_message(self, message: BusMessage):
+        if message.module is ModuleId.BROADCAST or message.module is self.module_id:
+            self.trigger(message)
+
     async def _handle_message(self, message: BusMessage):
         if self.state in (PhysicalModuleState.UNPLUGGED, PhysicalModuleState.CRASHED):
             return
-        if message.module != ModuleId.BROADCAST and message.module != self.module_id:
-            return
         if isinstance(message, ResetMessage):
             self.hard_reset()
             return
@@ -216,3 +413,159 @@ class MockPhysicalSimon(MockPhysicalModule):
             self.blinks.append(message.color)
             return True
         return False
+
+
+class MockPhysicalWires(MockPhysicalModule):
+    wires: List[WireColor]
+
+    _module_class_id = WiresModule.module_id
+    _update_message = WiresUpdateMessage
+
+    def __init__(self, bus: BombBus, gpio: MockGpio, location: int, serial: int = 0):
+        MockPhysicalModule.__init__(self, bus, gpio, location, ModuleId(self._module_class_id, serial))
+
+    def _reset_state(self):
+        self.wires = [WireColor.DISCONNECTED] * 6
+
+    async def set_wires(self, wires: Sequence[WireColor]):
+        self.wires = list(wires)
+        await self._bus.send(self._update_message(self.module_id, BusMessageDirection.IN, wires=self.wires))
+
+    async def cut_wire(self, position: int):
+        wires = self.wires[:]
+        wires[position] = WireColor.DISCONNECTED
+        await self.set_wires(wires)
+
+    def _announce(self):
+        return VersionNumber(1, 0), VersionNumber(1, 0), True
+
+    async def _handle_module_message(self, message: BusMessage) -> bool:
+        return False
+
+
+class MockPhysicalComplicatedWires(MockPhysicalWires):
+    leds: Optional[Sequence[bool]]
+
+    _module_class_id = ComplicatedWiresModule.module_id
+    _update_message = ComplicatedWiresUpdateMessage
+
+    def _reset_state(self):
+        super()._reset_state()
+        self.leds = None
+
+    async def _handle_module_message(self, message: BusMessage) -> bool:
+        if isinstance(message, ComplicatedWiresSetLedsMessage):
+            self.leds = message.leds
+            return True
+        return False
+
+
+class MockPhysicalKeypad(MockPhysicalModule):
+    leds: Set[KeypadPosition]
+
+    def __init__(self, bus: BombBus, gpio: MockGpio, location: int, serial: int = 0):
+        MockPhysicalModule.__init__(self, bus, gpio, location, ModuleId(KeypadModule.module_id, serial))
+
+    def _reset_state(self):
+        self.leds = set()
+
+    async def press_button(self, position: KeypadPosition):
+        await self._bus.send(KeypadPressMessage(self.module_id, BusMessageDirection.IN, position=position))
+
+    def _announce(self):
+        return VersionNumber(1, 0), VersionNumber(1, 0), True
+
+    async def _handle_module_message(self, message: BusMessage) -> bool:
+        if isinstance(message, KeypadSetLedsMessage):
+            self.leds = message.leds
+            return True
+        return False
+
+
+class MockPhysicalPassword(MockPhysicalModule):
+    columns: List[Optional[bytes]]
+
+    def __init__(self, bus: BombBus, gpio: MockGpio, location: int, serial: int = 0):
+        MockPhysicalModule.__init__(self, bus, gpio, location, ModuleId(PasswordModule.module_id, serial))
+
+    def _reset_state(self):
+        self.columns = [None] * WORD_LENGTH
+
+    async def submit(self, word: bytes):
+        await self._bus.send(PasswordSubmitMessage(self.module_id, BusMessageDirection.IN, word=word))
+
+    def _announce(self):
+        return VersionNumber(1, 0), VersionNumber(1, 0), True
+
+    async def _handle_module_message(self, message: BusMessage) -> bool:
+        if isinstance(message, PasswordSetCharactersMessage):
+            self.columns[message.position] = message.characters
+            return True
+        return False
+
+
+class MockPhysicalButton(MockPhysicalModule):
+    light: Tuple[int, int, int]
+
+    def __init__(self, bus: BombBus, gpio: MockGpio, location: int, serial: int = 0):
+        MockPhysicalModule.__init__(self, bus, gpio, location, ModuleId(ButtonModule.module_id, serial))
+
+    def _reset_state(self):
+        self.light = (0, 0, 0)
+
+    async def act(self, action: ButtonAction):
+        await self._bus.send(ButtonActionMessage(self.module_id, BusMessageDirection.IN, action=action))
+
+    def _announce(self):
+        return VersionNumber(1, 0), VersionNumber(1, 0), True
+
+    async def _handle_module_message(self, message: BusMessage) -> bool:
+        if isinstance(message, ButtonLightMessage):
+            self.light = message.color
+            return True
+        return False
+
+
+class MockPhysicalVentingGas(MockPhysicalModule):
+    """A virtual venting gas module. Answers ``OUT_OF_TIME`` by itself if not answered in time while active."""
+
+    question: Optional[VentingGasQuestion]
+    active: bool
+
+    def __init__(self, bus: BombBus, gpio: MockGpio, location: int, serial: int = 0):
+        MockPhysicalModule.__init__(self, bus, gpio, location, ModuleId(VentingGasModule.module_id, serial))
+
+    def _reset_state(self):
+        if getattr(self, "_timeout", None) is not None:
+            self._timeout.cancel()
+        self.question = None
+        self.active = False
+        self._timeout = None
+
+    async def answer(self, answer: VentingGasAnswer):
+        self._stop_timeout()
+        await self._bus.send(VentingGasAnswerMessage(self.module_id, BusMessageDirection.IN, answer=answer))
+
+    def _stop_timeout(self):
+        if self._timeout is not None:
+            self._timeout.cancel()
+            self._timeout = None
+
+    def _time_out(self):
+        self._timeout = None
+        create_task(self.answer(VentingGasAnswer.OUT_OF_TIME))
+
+    def _announce(self):
+        return VersionNumber(1, 0), VersionNumber(1, 0), True
+
+    async def _handle_module_message(self, message: BusMessage) -> bool:
+        if isinstance(message, VentingGasSetQuestionMessage):
+            self.question = message.question
+            return True
+        if isinstance(message, NeedyActivateMessage):
+            self.active = True
+            self._timeout = get_running_loop().call_later(NEEDY_DEFAULT_TIMER, self._time_out)
+        elif isinstance(message, (NeedyDeactivateMessage, ExplodeBombMessage, DefuseBombMessage)):
+            self.active = False
+            self._stop_timeout()
+        return False
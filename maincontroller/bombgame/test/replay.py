@@ -0,0 +1,193 @@
+"""Replays a CAN trace recorded with ``CAN_TRACE_FILE``.
+
+By default, every frame in the trace is decoded like ``BombBus`` does and a summary of the traffic is printed.
+
+With ``--controller``, the frames that modules sent are fed to a new bomb at the times they were recorded, and the
+messages sent by the bomb are compared to the ones in the trace. The bomb's resets, game starts and timer starts are
+replayed from the corresponding broadcasts in the trace, and the modules that announced themselves are marked ready
+in consecutive locations. Announcements are held back until the bomb enables another location, since they answer
+the enable line rather than arriving at a fixed time. The replay runs as fast as possible on a virtual-time event loop,
+or with ``--realtime`` at the speed it was recorded.
+
+The replayed bomb generates new solutions, so the outcomes of modules diverge from the trace. ``--seed`` seeds the
+random generator before each bomb like the simulation harness does, which keeps most of a simulated trace in step.
+
+Usage: ``python -m bombgame.test.replay <trace file> [--controller [--realtime] [--seed SEED]]``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+from asyncio import run, sleep as async_sleep, get_running_loop
+from collections import Counter, deque
+from time import perf_counter
+from typing import Deque, List, Optional, Tuple
+
+from bombgame.bomb.bomb import Bomb
+from bombgame.bomb.state import BombState
+from bombgame.bus.bus import BombBus
+from bombgame.bus.messages import (BusMessage, BusMessageDecoder, ResetMessage, AnnounceMessage, LaunchGameMessage,
+                                   StartTimerMessage)
+from bombgame.bus.trace import CanTrace, TRACE_FLAG_OUTBOUND, TRACE_FLAG_EXTENDED
+from bombgame.config import BOMB_CASING
+from bombgame.modules import load_modules
+from bombgame.test.mock import MockGpio, MockGpioEnableChange
+from bombgame.test.sim import SimulatedCanNetwork, NullSoundSystem, run_simulation
+
+# a decoded trace record: timestamp, outbound, message
+DecodedRecord = Tuple[float, bool, BusMessage]
+
+
+def decode_trace(trace: CanTrace) -> Tuple[List[DecodedRecord], int]:
+    """Decodes all records of a trace. Returns the decoded records and the number of invalid frames."""
+    decoder = BusMessageDecoder()
+    decoded = []
+    invalid = 0
+    for timestamp, arbitration_id, flags, dlc, data in trace.iter_raw():
+        if not flags & TRACE_FLAG_EXTENDED:
+            invalid += 1
+            continue
+        try:
+            message = decoder.decode_raw(arbitration_id, data[:dlc])
+        except ValueError:
+            invalid += 1
+            continue
+        decoded.append((timestamp, bool(flags & TRACE_FLAG_OUTBOUND), message))
+    return decoded, invalid
+
+
+def _direction(outbound: bool) -> str:
+    return "out" if outbound else "in"
+
+
+def summarize(path: str):
+    with CanTrace(path) as trace:
+        start = perf_counter()
+        records, invalid = decode_trace(trace)
+        elapsed = perf_counter() - start
+        duration = trace.duration or 0.0
+        print(f"{len(trace)} frames over {duration:.1f} s decoded in {elapsed:.3f} s "
+              f"({len(trace) / elapsed:,.0f} frames/s, {duration / elapsed:,.0f}x real time), {invalid} invalid")
+    counts = Counter((_direction(outbound), message.__class__.__name__) for _, outbound, message in records)
+    for (direction, name), count in sorted(counts.items()):
+        print(f"  {direction:<4} {name:<32} {count:>8}")
+
+
+async def replay_controller(records: List[DecodedRecord], seed: Optional[int] = None) -> Counter:
+    """Feeds the inbound messages of a decoded trace to a new bomb. Returns the counts of messages sent by the bomb."""
+    # pylint: disable=protected-access
+    loop = get_running_loop()
+    network = SimulatedCanNetwork()
+    gpio = MockGpio()
+    modules_can = network.connect()
+    controller_can = network.connect()
+    bus = BombBus(controller_can)
+    bus.start()
+    bomb: Optional[Bomb] = None
+    sent = Counter()
+    announces: Deque[AnnounceMessage] = deque()
+
+    def location_enabled(change: MockGpioEnableChange):
+        if change.state and announces:
+            # modules de-assert MODULE_READY before announcing themselves
+            gpio.set_ready_state(change.location, False)
+            modules_can.send(announces.popleft().serialize())
+
+    gpio.add_listener(MockGpioEnableChange, location_enabled, reentrant=True)
+
+    async def wait_for_state(state: BombState, timeout: float = 5.0):
+        # the bomb may lag slightly behind the trace, especially if it was recorded on a virtual-time loop
+        deadline = loop.time() + timeout
+        while bomb._state != state and loop.time() < deadline:
+            await async_sleep(0.01)
+
+    def receive_sent():
+        while True:
+            frame = modules_can.recv(0)
+            if frame is None:
+                return
+            sent[bus._decoder.decode(frame).__class__.__name__] += 1
+
+    loop.add_reader(modules_can.fileno(), receive_sent)
+    start = records[0][0] if records else 0.0
+    loop_start = loop.time()
+    try:
+        for index, (timestamp, outbound, message) in enumerate(records):
+            delay = loop_start + timestamp - start - loop.time()
+            if delay > 0:
+                await async_sleep(delay)
+            if isinstance(message, AnnounceMessage):
+                continue
+            if not outbound:
+                modules_can.send(message.serialize())
+            elif isinstance(message, ResetMessage) and message.module.is_broadcast():
+                if bomb is not None:
+                    bomb.deinitialize()
+                announces.clear()
+                for _, later_outbound, later in records[index + 1:]:
+                    if later_outbound and isinstance(later, (ResetMessage, LaunchGameMessage)):
+                        break
+                    if isinstance(later, AnnounceMessage):
+                        announces.append(later)
+                for location in range(BOMB_CASING.capacity):
+                    gpio.set_ready_state(location, location < len(announces))
+                if seed is not None:
+                    random.seed(seed)
+                    seed += 1
+                bomb = Bomb(bus, gpio, NullSoundSystem(), BOMB_CASING)
+                bomb.create_task(bomb.initialize())
+            elif isinstance(message, LaunchGameMessage) and bomb is not None:
+                await wait_for_state(BombState.INITIALIZED)
+                bomb.start_game()
+            elif isinstance(message, StartTimerMessage) and bomb is not None:
+                await wait_for_state(BombState.GAME_STARTING)
+                bomb.start_timer()
+        await async_sleep(1.0)
+    finally:
+        if bomb is not None:
+            bomb.deinitialize()
+        loop.remove_reader(modules_can.fileno())
+        bus.stop()
+        controller_can.shutdown()
+        modules_can.shutdown()
+    return sent
+
+
+def compare(path: str, realtime: bool, seed: Optional[int]):
+    with CanTrace(path) as trace:
+        records, _ = decode_trace(trace)
+    expected = Counter(message.__class__.__name__ for _, outbound, message in records if outbound)
+    start = perf_counter()
+    if realtime:
+        sent = run(replay_controller(records, seed))
+    else:
+        sent = run_simulation(replay_controller(records, seed))
+    elapsed = perf_counter() - start
+    duration = records[-1][0] - records[0][0] if records else 0.0
+    print(f"replayed {duration:.1f} s of traffic in {elapsed:.2f} s")
+    print(f"  {'message':<32} {'trace':>8} {'replay':>8}")
+    for name in sorted(expected.keys() | sent.keys()):
+        marker = "" if expected[name] == sent[name] else "  *"
+        print(f"  {name:<32} {expected[name]:>8} {sent[name]:>8}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays a CAN trace recorded by the bomb.")
+    parser.add_argument("trace", help="the trace file")
+    parser.add_argument("--controller", action="store_true", help="feed the trace to a new bomb")
+    parser.add_argument("--realtime", action="store_true", help="replay at the speed the trace was recorded")
+    parser.add_argument("--seed", type=int, help="seed the random generator before each bomb is created, incrementing "
+                                                 "the seed for each reset in the trace")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    load_modules()
+    if args.controller:
+        compare(args.trace, args.realtime, args.seed)
+    else:
+        summarize(args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""Runs complete games against virtual modules on a virtual-time event loop.
+
+The event loop's clock jumps straight to the next scheduled callback whenever the loop would otherwise wait, so a
+15-minute game runs in a fraction of a second. Time never advances while work submitted with ``run_in_executor``
+(such as CAN transmission) is in flight, so the simulation behaves as if all I/O was instantaneous.
+
+Usage: ``python -m bombgame.test.sim [games] [seed] [trace file]``. If a trace file is given, the CAN traffic of the
+games is recorded to it (see ``bombgame.test.replay``).
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import selectors
+import socket
+from asyncio import (SelectorEventLoop, Future, sleep as async_sleep, wait_for, get_running_loop, all_tasks,
+                     gather)
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import partial
+from select import select
+from sys import argv
+from threading import Lock
+from time import perf_counter
+from typing import AsyncIterator, Callable, Deque, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+import can
+
+from bombgame.audio import PlayingSound, SoundSpec
+from bombgame.bomb.bomb import Bomb
+from bombgame.bomb.state import BombState
+from bombgame.bus.bus import BombBus
+from bombgame.bus.trace import CanTraceRecorder
+from bombgame.config import BOMB_CASING, GAME_START_DELAY
+from bombgame.events import BombStateChanged, BombModuleAdded
+from bombgame.modules import load_modules
+from bombgame.modules.base import Module, ModuleState
+from bombgame.modules.button import ButtonModule, ButtonAction, RELEASE_RULES
+from bombgame.modules.complicatedwires import ComplicatedWiresModule
+from bombgame.modules.keypad import KeypadModule, KeypadPosition
+from bombgame.modules.needy import NeedyState
+from bombgame.modules.password import PasswordModule, WORDS
+from bombgame.modules.simonsays import SimonSaysModule, MAPPING_FLASHED
+from bombgame.modules.ventinggas import VentingGasModule, VentingGasAnswer, CORRECT_ANSWERS
+from bombgame.modules.wires import WiresModule, WireColor
+from bombgame.test.mock import (MockGpio, MockPhysicalModule, MockPhysicalTimer, MockPhysicalSimon, MockPhysicalKeypad,
+                                MockPhysicalWires, MockPhysicalComplicatedWires, MockPhysicalPassword,
+                                MockPhysicalButton, MockPhysicalVentingGas)
+from bombgame.utils import Registry
+
+
+class _VirtualTimeSelector(selectors.BaseSelector):
+    """Wraps a real selector, advancing the loop's virtual time instead of blocking when nothing is ready."""
+
+    def __init__(self, selector: selectors.BaseSelector):
+        self._selector = selector
+        self.loop: Optional[VirtualTimeEventLoop] = None
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_key(self, fileobj):
+        return self._selector.get_key(fileobj)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None or self.loop.executor_jobs:
+            # nothing is scheduled, or a thread is still working; wait for it in real time
+            return self._selector.select(None)
+        self.loop.advance(timeout)
+        return []
+
+
+class VirtualTimeEventLoop(SelectorEventLoop):
+    """An event loop whose clock only moves forward when the loop has nothing to do."""
+
+    def __init__(self):
+        selector = _VirtualTimeSelector(selectors.DefaultSelector())
+        super().__init__(selector)
+        selector.loop = self
+        self._virtual_time = 0.0
+        self.executor_jobs = 0
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def advance(self, seconds: float):
+        self._virtual_time += seconds
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.executor_jobs += 1
+        future.add_done_callback(self._executor_job_done)
+        return future
+
+    def _executor_job_done(self, _: Future):
+        self.executor_jobs -= 1
+
+
+class SimulatedCanNetwork:
+    """A CAN network connecting any number of ``SimulatedCanBus`` instances."""
+
+    def __init__(self):
+        self._buses = []
+
+    def connect(self) -> SimulatedCanBus:
+        bus = SimulatedCanBus(self)
+        self._buses.append(bus)
+        return bus
+
+    def disconnect(self, bus: SimulatedCanBus):
+        self._buses.remove(bus)
+
+    def transmit(self, sender: SimulatedCanBus, frame: can.Message):
+        for bus in self._buses:
+            if bus is not sender:
+                bus.deliver(frame)
+
+
+class SimulatedCanBus(can.BusABC):
+    """A CAN bus on a ``SimulatedCanNetwork``.
+
+    Frames are delivered to the other buses immediately. Each bus signals received frames through a socket, so that
+    ``BombBus`` reads them on the event loop.
+    """
+
+    _queue: Deque[can.Message]
+
+    def __init__(self, network: SimulatedCanNetwork):
+        super().__init__(channel="simulated")
+        self.channel_info = "simulated CAN bus"
+        self._network = network
+        self._queue = deque()
+        self._lock = Lock()
+        self._notify_recv, self._notify_send = socket.socketpair()
+        self._notify_recv.setblocking(False)
+
+    @staticmethod
+    def _detect_available_configs():
+        return []
+
+    def fileno(self) -> int:
+        return self._notify_recv.fileno()
+
+    def deliver(self, frame: can.Message):
+        with self._lock:
+            self._queue.append(frame)
+        self._notify_send.send(b"\0")
+
+    def send(self, msg, timeout=None):
+        self._network.transmit(self, msg)
+
+    def _recv_internal(self, timeout):
+        if timeout != 0 and not select([self._notify_recv], [], [], timeout)[0]:
+            return None, False
+        try:
+            self._notify_recv.recv(1)
+        except BlockingIOError:
+            return None, False
+        with self._lock:
+            return self._queue.popleft(), False
+
+    def shutdown(self):
+        self._network.disconnect(self)
+        self._notify_recv.close()
+        self._notify_send.close()
+
+
+class NullPlayingSound(PlayingSound):
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def stop(self):
+        pass
+
+
+class NullSoundSystem:
+    """A sound system that plays nothing and only counts the sounds requested from it."""
+
+    def __init__(self):
+        self.played = 0
+
+    async def load_sounds(self, classes):
+        pass
+
+    def play_sound(self, sound: SoundSpec, priority: int = 0) -> Optional[PlayingSound]:
+        # pylint: disable=unused-argument
+        self.played += 1
+        return NullPlayingSound(sound.filename)
+
+    def schedule_sound(self, sound: SoundSpec, at: float, priority: int = 0) -> Optional[PlayingSound]:
+        # pylint: disable=unused-argument
+        self.played += 1
+        return NullPlayingSound(sound.filename)
+
+    def stop_all_sounds(self):
+        pass
+
+    def init_music(self):
+        pass
+
+    def update_music_timer(self, time_spent: float):
+        pass
+
+    def play_music(self):
+        pass
+
+    def stop_music(self):
+        pass
+
+
+class SimulatedPlayer:
+    """Decides how quickly and how accurately the virtual modules are interacted with."""
+
+    def __init__(self, rng: random.Random, mistake_chance: float, think_time=(0.5, 3.0)):
+        self.rng = rng
+        self.mistake_chance = mistake_chance
+        self.think_time = think_time
+
+    async def think(self):
+        await async_sleep(self.rng.uniform(*self.think_time))
+
+    def choose(self, correct, options: Sequence):
+        wrong = [option for option in options if option != correct]
+        if wrong and self.rng.random() < self.mistake_chance:
+            return self.rng.choice(wrong)
+        return correct
+
+
+#: strategies for solving modules, called with the player, the bomb, the controller-side module and the virtual module
+PLAYER_STRATEGIES: Registry[Type[Module], Callable] = Registry()
+#: actions done by the game master to set up virtual modules between initialization and the start of the game,
+#: called with the controller-side module and the virtual module
+OPERATOR_SETUP: Registry[Type[Module], Callable] = Registry()
+
+
+def _playing(bomb: Bomb, module: Module) -> bool:
+    # pylint: disable=protected-access
+    return bomb._state == BombState.GAME_STARTED and module.state == ModuleState.GAME
+
+
+@PLAYER_STRATEGIES.register(SimonSaysModule)
+async def _solve_simon(player: SimulatedPlayer, bomb: Bomb, module: SimonSaysModule, mock: MockPhysicalSimon):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if not _playing(bomb, module):
+            return
+        flashed = module._sequence[len(module._pressed)]
+        await mock.press_button(player.choose(module._color_map()[flashed], MAPPING_FLASHED))
+
+
+@PLAYER_STRATEGIES.register(KeypadModule)
+async def _solve_keypad(player: SimulatedPlayer, bomb: Bomb, module: KeypadModule, mock: MockPhysicalKeypad):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if not _playing(bomb, module):
+            return
+        unpressed = [position for position in KeypadPosition if position not in module._pressed]
+        await mock.press_button(player.choose(module._solution[len(module._pressed)], unpressed))
+
+
+@OPERATOR_SETUP.register(WiresModule)
+@OPERATOR_SETUP.register(ComplicatedWiresModule)
+async def _connect_wires(module: WiresModule, mock: MockPhysicalWires):
+    # pylint: disable=protected-access
+    await mock.set_wires(module._initial_connected)
+
+
+@PLAYER_STRATEGIES.register(WiresModule)
+async def _solve_wires(player: SimulatedPlayer, bomb: Bomb, module: WiresModule, mock: MockPhysicalWires):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if not _playing(bomb, module):
+            return
+        connected = [pos for pos, wire in enumerate(mock.wires) if wire != WireColor.DISCONNECTED]
+        await mock.cut_wire(player.choose(module._solution, connected))
+
+
+@PLAYER_STRATEGIES.register(ComplicatedWiresModule)
+async def _solve_complicated_wires(player: SimulatedPlayer, bomb: Bomb, module: ComplicatedWiresModule,
+                                   mock: MockPhysicalComplicatedWires):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if not _playing(bomb, module):
+            return
+        connected = [pos for pos, wire in enumerate(mock.wires) if wire != WireColor.DISCONNECTED]
+        to_cut = [pos for pos in connected if module._solution[pos]]
+        await mock.cut_wire(player.choose(to_cut[0], connected))
+
+
+@PLAYER_STRATEGIES.register(PasswordModule)
+async def _solve_password(player: SimulatedPlayer, bomb: Bomb, module: PasswordModule, mock: MockPhysicalPassword):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if not _playing(bomb, module):
+            return
+        await mock.submit(player.choose(module._solution, WORDS).encode("ascii"))
+
+
+@PLAYER_STRATEGIES.register(ButtonModule)
+async def _solve_button(player: SimulatedPlayer, bomb: Bomb, module: ButtonModule, mock: MockPhysicalButton):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if not _playing(bomb, module):
+            return
+        await mock.act(ButtonAction.PRESS)
+        if not player.choose(module._should_hold, (True, False)):
+            await mock.act(ButtonAction.RELEASE_PRESS)
+            continue
+        await async_sleep(0.5)
+        await mock.act(ButtonAction.HOLD)
+        expected = RELEASE_RULES[module._light_color]
+        while _playing(bomb, module) and player.choose(expected, "0123456789") not in bomb.timer_digits:
+            await async_sleep(0.1)
+        await mock.act(ButtonAction.RELEASE_HOLD)
+
+
+@PLAYER_STRATEGIES.register(VentingGasModule)
+async def _solve_venting_gas(player: SimulatedPlayer, bomb: Bomb, module: VentingGasModule,
+                             mock: MockPhysicalVentingGas):
+    # pylint: disable=protected-access
+    while True:
+        await player.think()
+        if bomb._state != BombState.GAME_STARTED or module.needy_state == NeedyState.DEACTIVATED:
+            return
+        if mock.active and mock.question is not None:
+            answers = (VentingGasAnswer.YES, VentingGasAnswer.NO)
+            await mock.answer(player.choose(CORRECT_ANSWERS[mock.question], answers))
+
+
+MockFactory = Callable[[BombBus, MockGpio, int], MockPhysicalModule]
+
+DEFAULT_MOCKS: Tuple[MockFactory, ...] = (MockPhysicalTimer, MockPhysicalSimon)
+
+#: a full vanilla casing with a timer, a needy module and at least one of every other module
+FULL_BOMB_MOCKS: Tuple[MockFactory, ...] = (
+    MockPhysicalTimer, MockPhysicalSimon, MockPhysicalKeypad, MockPhysicalWires,
+    MockPhysicalPassword, MockPhysicalButton, MockPhysicalComplicatedWires, MockPhysicalVentingGas,
+    partial(MockPhysicalSimon, serial=1), partial(MockPhysicalKeypad, serial=1),
+    partial(MockPhysicalWires, serial=1), partial(MockPhysicalButton, serial=1),
+)
+
+
+class SimulatedBomb(NamedTuple):
+    bomb: Bomb
+    physical: List[MockPhysicalModule]
+    mock_bus: BombBus
+    gpio: MockGpio
+    sound_system: NullSoundSystem
+    bus: BombBus
+
+
+@asynccontextmanager
+async def simulated_bomb(mocks: Sequence[MockFactory],
+                         trace: Optional[CanTraceRecorder] = None) -> AsyncIterator[SimulatedBomb]:
+    """Connects a new bomb and the given virtual modules to a simulated CAN network, and tears them down afterwards.
+
+    The virtual modules are placed in consecutive locations but not reset yet, so that they can be configured first.
+    Modules appended to ``physical`` are unplugged with the others. If ``trace`` is given, the CAN frames sent and
+    received by the bomb are recorded to it.
+    """
+    network = SimulatedCanNetwork()
+    gpio = MockGpio()
+    mock_can = network.connect()
+    mock_bus = BombBus(mock_can)
+    mock_bus.start()
+    physical = [mock(mock_bus, gpio, location) for location, mock in enumerate(mocks)]
+    controller_can = network.connect()
+    bus = BombBus(controller_can, trace)
+    bus.start()
+    sound_system = NullSoundSystem()
+    bomb = Bomb(bus, gpio, sound_system, BOMB_CASING)
+    try:
+        yield SimulatedBomb(bomb, physical, mock_bus, gpio, sound_system, bus)
+    finally:
+        bomb.deinitialize()
+        for module in physical:
+            module.unplug()
+        bus.stop()
+        mock_bus.stop()
+        controller_can.shutdown()
+        mock_can.shutdown()
+
+
+async def set_up_modules(bomb: Bomb, physical: Sequence[MockPhysicalModule]):
+    """Does what the operator has to do on each virtual module after initialization, such as connecting wires."""
+    for mock in physical:
+        module = bomb.modules_by_location[mock.location]
+        setup = OPERATOR_SETUP.get(type(module))
+        if setup is not None:
+            await setup(module, mock)
+
+
+class InitializationTimes(NamedTuple):
+    initialization: float
+    hotswap: float
+
+
+class GameResult(NamedTuple):
+    seed: int
+    state: BombState
+    strikes: int
+    time_left: float
+    duration: float
+    sounds: int
+
+
+async def simulate_game(seed: int, mocks: Sequence[MockFactory] = DEFAULT_MOCKS, mistake_chance: float = 0.05,
+                        trace: Optional[CanTraceRecorder] = None) -> GameResult:
+    """Initializes a bomb with the given virtual modules and plays a game on it until it is defused or explodes.
+
+    If ``trace`` is given, the CAN frames sent and received by the bomb are recorded to it.
+    """
+    # pylint: disable=protected-access,too-many-locals
+    random.seed(seed)
+    loop = get_running_loop()
+    async with simulated_bomb(mocks, trace) as (bomb, physical, _, _, sound_system, _):
+        for module in physical:
+            module.hard_reset()
+        finished = loop.create_future()
+
+        def state_changed(event: BombStateChanged):
+            if event.state in (BombState.DEFUSED, BombState.EXPLODED) and not finished.done():
+                finished.set_result(event.state)
+
+        bomb.add_listener(BombStateChanged, state_changed, reentrant=True)
+        await bomb.initialize()
+        if bomb._state != BombState.INITIALIZED:
+            raise RuntimeError(f"bomb failed to initialize: {bomb._state}")
+        await set_up_modules(bomb, physical)
+        bomb.start_game()
+        await async_sleep(GAME_START_DELAY)
+        bomb.start_timer()
+        player = SimulatedPlayer(random.Random(seed), mistake_chance)
+        start = loop.time()
+        for mock in physical:
+            module = bomb.modules_by_location[mock.location]
+            strategy = PLAYER_STRATEGIES.get(type(module))
+            if strategy is not None:
+                bomb.create_task(strategy(player, bomb, module, mock))
+        state = await wait_for(finished, bomb.starting_time + 60)
+        return GameResult(seed, state, bomb.strikes, bomb.time_left, loop.time() - start, sound_system.played)
+
+
+async def measure_initialization(seed: int, mocks: Sequence[MockFactory] = FULL_BOMB_MOCKS,
+                                 slow_module_delay: float = 0.4) -> InitializationTimes:
+    """Measures the virtual time it takes to initialize a bomb.
+
+    Every module takes a random short time to respond to MODULE_ENABLE, and one of them is still busy resetting for
+    ``slow_module_delay`` seconds. After the bomb is initialized, the last module is replaced by a new one to measure
+    the time it takes to hot-swap a single module.
+    """
+    # pylint: disable=protected-access,too-many-locals
+    rng = random.Random(seed)
+    loop = get_running_loop()
+    async with simulated_bomb(mocks) as (bomb, physical, mock_bus, gpio, _, _):
+        for module in physical:
+            module.announce_delay = rng.uniform(0.0, 0.02)
+        rng.choice(physical).announce_delay = slow_module_delay
+        for module in physical:
+            module.hard_reset()
+        start = loop.time()
+        await bomb.initialize()
+        if bomb._state != BombState.INITIALIZED:
+            raise RuntimeError(f"bomb failed to initialize: {bomb._state}")
+        initialization = loop.time() - start
+        # swap the last module for a new module of the same type
+        replaced = physical[-1]
+        replaced.unplug()
+        replacement = type(replaced)(mock_bus, gpio, replaced.location, serial=replaced.module_id.serial + 100)
+        replacement.announce_delay = rng.uniform(0.0, 0.02)
+        physical.append(replacement)
+        added = loop.create_future()
+        bomb.add_listener(BombModuleAdded, lambda event: added.done() or added.set_result(None), reentrant=True)
+        start = loop.time()
+        replacement.hard_reset()
+        await wait_for(added, 5.0)
+        hotswap = loop.time() - start
+        if bomb.modules_by_location[replaced.location].bus_id != replacement.module_id:
+            raise RuntimeError("hot-swapped module was not registered")
+        # let the tasks started by the bomb run before they are cancelled
+        await async_sleep(0)
+        return InitializationTimes(initialization, hotswap)
+
+
+def run_simulation(coroutine):
+    """Runs the given coroutine to completion on a new virtual-time event loop."""
+    loop = VirtualTimeEventLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        # finish off listener tasks left over from the last game
+        remaining = all_tasks(loop)
+        for task in remaining:
+            task.cancel()
+        if remaining:
+            loop.run_until_complete(gather(*remaining, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+
+async def simulate_games(count: int, seed: int = 0, **kwargs) -> List[GameResult]:
+    load_modules()
+    return [await simulate_game(seed + game, **kwargs) for game in range(count)]
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    count = int(argv[1]) if len(argv) > 1 else 100
+    seed = int(argv[2]) if len(argv) > 2 else 0
+    trace = CanTraceRecorder(argv[3]) if len(argv) > 3 else None
+    start = perf_counter()
+    try:
+        results = run_simulation(simulate_games(count, seed, mocks=FULL_BOMB_MOCKS, trace=trace))
+    finally:
+        if trace is not None:
+            trace.close()
+    elapsed = perf_counter() - start
+    defused = sum(result.state == BombState.DEFUSED for result in results)
+    virtual = sum(result.duration for result in results)
+    print(f"{count} games in {elapsed:.2f} s ({count / elapsed:.1f} games/s, {virtual / elapsed:,.0f}x real time)")
+    print(f"  {defused} defused, {count - defused} exploded, "
+          f"{sum(result.strikes for result in results) / count:.2f} strikes per game")
+    times = run_simulation(measure_initialization(seed))
+    print(f"  initialization of {len(FULL_BOMB_MOCKS)} modules: {times.initialization:.2f} s, "
+          f"{times.hotswap:.3f} s to hot-swap a single module")
+
+if __name__ == "__main__":
+    main()
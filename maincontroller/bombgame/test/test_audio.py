@@ -0,0 +1,148 @@
+import os
+import tempfile
+from concurrent.futures import CancelledError, Future
+from unittest import TestCase
+
+import pygame
+
+from bombgame.audio import (AudioCommandQueue, AudioStoppedError, LoadSound, SoundsLoaded, SoundBank, ChannelPool,
+                           LocalPlayingSound, SOUND_FOLDER)
+
+
+class _FakeSound:
+    def __init__(self, length: float):
+        self.length = length
+
+    def get_length(self) -> float:
+        return self.length
+
+
+class _FakeChannel:
+    def __init__(self):
+        self.played = []
+
+    def play(self, sound: _FakeSound):
+        self.played.append(sound)
+
+
+class AudioCommandQueueTest(TestCase):
+    def test_closing_after_a_crash_fails_waiting_loads(self):
+        queue = AudioCommandQueue()
+        taken, queued, later = Future(), Future(), Future()
+        queue.put(SoundsLoaded(taken))
+        unhandled = queue.wait(0)
+        queue.put(LoadSound("tick_1.0.wav"))
+        queue.put(SoundsLoaded(queued))
+        queue.close(unhandled, failed=True)
+        queue.put(SoundsLoaded(later))
+        for future in (taken, queued, later):
+            with self.assertRaises(AudioStoppedError):
+                future.result(0)
+        self.assertEqual(queue.drain(), [])
+
+    def test_closing_on_stop_cancels_waiting_loads(self):
+        queue = AudioCommandQueue()
+        queued, later = Future(), Future()
+        queue.put(SoundsLoaded(queued))
+        queue.close()
+        queue.put(SoundsLoaded(later))
+        for future in (queued, later):
+            with self.assertRaises(CancelledError):
+                future.result(0)
+
+
+class SoundBankTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        pygame.mixer.init(44100, -16, 2, 512)
+
+    @classmethod
+    def tearDownClass(cls):
+        pygame.mixer.quit()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.cache_folder = directory.name
+
+    def test_cached_samples_round_trip(self):
+        # pylint: disable=protected-access
+        bank = SoundBank(self.cache_folder)
+        decoded = bank.load("tick_1.0.wav")
+        cache_path = bank._cache_path(os.path.join(SOUND_FOLDER, "tick_1.0.wav"))
+        self.assertTrue(os.path.isfile(cache_path))
+        self.assertEqual([name for name in os.listdir(self.cache_folder) if not name.endswith(".pcm")], [])
+        cached = SoundBank._load_cached(cache_path)
+        self.assertEqual(cached.get_raw(), decoded.get_raw())
+        # a new bank, e.g. in another process, maps the cached samples instead of decoding the file
+        self.assertEqual(SoundBank(self.cache_folder).load("tick_1.0.wav").get_raw(), decoded.get_raw())
+
+    def test_missing_or_broken_cache_files_are_ignored(self):
+        # pylint: disable=protected-access
+        path = os.path.join(self.cache_folder, "missing.pcm")
+        self.assertIsNone(SoundBank._load_cached(path))
+        with open(path, "wb"):
+            pass
+        self.assertIsNone(SoundBank._load_cached(path))
+
+
+class ChannelPoolTest(TestCase):
+    def setUp(self):
+        self.commands = AudioCommandQueue()
+        self.pool = ChannelPool([_FakeChannel() for _ in range(3)])
+
+    def play(self, priority: int, length: float = 1.0) -> LocalPlayingSound:
+        channel = self.pool.acquire(priority)
+        self.assertIsNotNone(channel)
+        playing = LocalPlayingSound(f"sound{priority}.wav", priority, self.commands)
+        self.pool.play(channel, _FakeSound(length), playing)
+        return playing
+
+    def test_free_channels_are_used_in_order(self):
+        sounds = [self.play(0) for _ in range(3)]
+        self.assertEqual([sound.channel.index for sound in sounds], [0, 1, 2])
+        self.assertTrue(self.pool.busy)
+        self.assertIs(self.pool.ended(1), sounds[1])
+        self.assertIs(self.play(0).channel.index, 1)
+
+    def test_preempts_the_lowest_priority_ending_soonest(self):
+        self.play(1, 5.0)
+        later = self.play(0, 3.0)
+        soonest = self.play(0, 2.0)
+        self.assertIs(self.play(1).channel, soonest.channel)
+        self.assertIs(self.play(1).channel, later.channel)
+        # the busy channels now play priority 1 sounds, which a priority 0 sound may not preempt
+        self.assertIsNone(self.pool.acquire(0))
+        self.assertIsNotNone(self.pool.acquire(1))
+
+    def test_end_events_of_preempted_sounds_are_ignored(self):
+        for _ in range(3):
+            self.play(0)
+        preempting = self.play(1)
+        index = preempting.channel.index
+        self.assertIsNone(self.pool.ended(index))
+        self.assertIsNotNone(preempting.channel)
+        self.assertIs(self.pool.ended(index), preempting)
+        self.assertIsNone(preempting.channel.current_sound)
+        self.assertIs(self.pool.acquire(0), preempting.channel)
+
+    def test_entries_of_reused_channels_are_skipped(self):
+        low = self.play(0)
+        self.play(2)
+        self.play(2)
+        self.pool.ended(low.channel.index)
+        # the channel is reused for a higher priority sound, so its old heap entry is stale
+        self.assertIs(self.play(2).channel, low.channel)
+        self.assertIsNone(self.pool.acquire(1))
+
+    def test_stale_entries_are_compacted(self):
+        # pylint: disable=protected-access
+        for number in range(100):
+            sound = self.play(number % 3)
+            self.pool.ended(sound.channel.index)
+            self.assertLessEqual(len(self.pool._busy), 2 * len(self.pool))
+        self.assertFalse(self.pool.busy)
+        sounds = [self.play(1) for _ in range(3)]
+        self.assertIsNone(self.pool.acquire(0))
+        self.assertIn(self.pool.acquire(1), [sound.channel for sound in sounds])
@@ -0,0 +1,94 @@
+from asyncio import sleep as async_sleep
+from unittest import TestCase
+
+from bombgame.bomb.state import BombState
+from bombgame.config import GAME_START_DELAY, MODULE_INIT_TIMEOUT
+from bombgame.events import BombError
+from bombgame.modules import load_modules
+from bombgame.modules.needy import NeedyState, NEEDY_INITIAL_DELAY, NEEDY_DEFAULT_TIMER
+from bombgame.test.mock import MockPhysicalTimer, MockPhysicalVentingGas, MockPhysicalSimon
+from bombgame.test.sim import simulated_bomb, run_simulation
+from bombgame.utils import VersionNumber
+
+
+class _NeverInitializingSimon(MockPhysicalSimon):
+    """A Simon Says module that announces itself but never reports that it has finished initializing."""
+
+    def _announce(self):
+        return VersionNumber(1, 0), VersionNumber(1, 0), False
+
+
+class PauseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_modules()
+
+    def test_pause_holds_clock_needy_modules_and_strikes(self):
+        run_simulation(self._pause_holds_clock_needy_modules_and_strikes())
+
+    async def _pause_holds_clock_needy_modules_and_strikes(self):
+        # the unsolved Simon Says module keeps the bomb from being defused right away
+        mocks = [MockPhysicalTimer, MockPhysicalVentingGas, MockPhysicalSimon]
+        async with simulated_bomb(mocks) as (bomb, physical, _, _, sounds, _):
+            for module in physical:
+                module.hard_reset()
+            await bomb.initialize()
+            self.assertEqual(bomb._state, BombState.INITIALIZED)  # pylint: disable=protected-access
+            needy = bomb.modules_by_location[1]
+            bomb.start_game()
+            await async_sleep(GAME_START_DELAY)
+            bomb.start_timer()
+            await async_sleep(10)
+
+            # the needy module's initial delay doesn't run out while paused
+            bomb.pause_game()
+            time_left = bomb.time_left
+            await async_sleep(NEEDY_INITIAL_DELAY * 2)
+            self.assertEqual(bomb.time_left, time_left)
+            self.assertEqual(needy.needy_state, NeedyState.INITIAL_SLEEP)
+            self.assertFalse(await needy.strike())
+            self.assertEqual(bomb.strikes, 0)
+
+            bomb.resume_game()
+            await async_sleep(NEEDY_INITIAL_DELAY - 11)
+            self.assertEqual(needy.needy_state, NeedyState.INITIAL_SLEEP)
+            await async_sleep(2)
+            self.assertEqual(needy.needy_state, NeedyState.ACTIVE)
+
+            # neither the warning sounds nor the needy timer run while paused
+            bomb.pause_game()
+            played = sounds.played
+            await async_sleep(NEEDY_DEFAULT_TIMER * 2)
+            self.assertEqual(sounds.played, played)
+            self.assertEqual(needy.needy_state, NeedyState.ACTIVE)
+            bomb.resume_game()
+            await async_sleep(NEEDY_DEFAULT_TIMER)
+            self.assertGreater(sounds.played, played)
+
+
+class HotswapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_modules()
+
+    def test_module_that_never_initializes_is_dropped(self):
+        run_simulation(self._module_that_never_initializes_is_dropped())
+
+    async def _module_that_never_initializes_is_dropped(self):
+        async with simulated_bomb([MockPhysicalTimer, MockPhysicalSimon]) as (bomb, physical, mock_bus, gpio, _, _):
+            for module in physical:
+                module.hard_reset()
+            await bomb.initialize()
+            self.assertEqual(bomb._state, BombState.INITIALIZED)  # pylint: disable=protected-access
+            errors = []
+            bomb.add_listener(BombError, errors.append, reentrant=True)
+            replaced = physical[1]
+            replaced.unplug()
+            replacement = _NeverInitializingSimon(mock_bus, gpio, replaced.location, serial=100)
+            replacement.hard_reset()
+            await async_sleep(MODULE_INIT_TIMEOUT + 1)
+            self.assertEqual(bomb._state, BombState.INITIALIZED)  # pylint: disable=protected-access
+            self.assertNotIn(replaced.location, bomb.modules_by_location)
+            self.assertEqual([module.location for module in bomb.modules], [physical[0].location])
+            self.assertEqual(len(errors), 1)
+            self.assertIn("did not finish initializing", errors[0].details)
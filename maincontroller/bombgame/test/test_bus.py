@@ -0,0 +1,45 @@
+from asyncio import Event, run, sleep as async_sleep
+from unittest import TestCase
+
+from bombgame.bus.bus import BombBus
+from bombgame.bus.messages import BusMessage
+from bombgame.modules import load_modules
+from bombgame.test.mock import synthetic_frames
+from bombgame.test.sim import SimulatedCanNetwork
+from bombgame.utils import OverflowPolicy
+
+
+class BombBusTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_modules()
+
+    def test_reading_on_the_loop_pauses_while_a_blocking_listener_is_full(self):
+        async def test():
+            network = SimulatedCanNetwork()
+            module_bus = network.connect()
+            bus = BombBus(network.connect())
+            received = []
+            released = Event()
+
+            async def listener(message):
+                await released.wait()
+                received.append(message)
+
+            bus.add_listener(BusMessage, listener, queue_size=8, overflow=OverflowPolicy.BLOCK)
+            bus.start()
+            frames = synthetic_frames(100)
+            for frame in frames:
+                module_bus.send(frame)
+            await async_sleep(0.05)
+            self.assertEqual(bus.listener_stats()[0].depth, 8)
+            released.set()
+            for _ in range(100):
+                if len(received) == len(frames):
+                    break
+                await async_sleep(0.01)
+            bus.stop()
+            self.assertEqual(bus.listener_stats()[0].dropped, 0)
+            self.assertEqual([message.serialize().arbitration_id for message in received],
+                             [frame.arbitration_id for frame in frames])
+        run(test())
@@ -0,0 +1,73 @@
+from fractions import Fraction
+from typing import Dict, List, Tuple
+from unittest import TestCase
+
+from bombgame.bomb.clock import GameClock
+from bombgame.test.mock import ManualLoop
+
+
+def _exact_ticks(starting_time: int, changes: List[Tuple[str, str]]) -> Dict[int, Fraction]:
+    """Computes the exact loop time each second is reached at with rational arithmetic.
+
+    ``changes`` are ``(time, change)`` pairs with the time as a decimal string and the change being "strike" (speeding
+    the clock up by 0.25), "pause" or "resume".
+    """
+    changes = sorted((Fraction(at), change) for at, change in changes)
+    segment_start, segment_left, speed, running = Fraction(0), Fraction(starting_time), Fraction(1), True
+    expected = {}
+    for second in range(starting_time - 1, -1, -1):
+        while True:
+            reached = segment_start + (segment_left - second) / speed if running else None
+            if changes and (reached is None or changes[0][0] < reached):
+                at, change = changes.pop(0)
+                if running:
+                    segment_left -= (at - segment_start) * speed
+                segment_start = at
+                if change == "strike":
+                    speed += Fraction(1, 4)
+                else:
+                    running = change == "resume"
+                continue
+            expected[second] = reached
+            break
+    return expected
+
+
+class GameClockTest(TestCase):
+    def test_ticks_do_not_drift(self):
+        """Runs 15 minutes of game clock with strikes and a pause and checks every tick against the exact times."""
+        loop = ManualLoop()
+        ticks = []
+        expired = []
+        clock = GameClock(lambda second: ticks.append((loop.time(), second)), lambda: expired.append(loop.time()),
+                          loop=loop)
+        clock.reset(900.0)
+        changes = [("100.3", "strike"), ("250.7", "strike"), ("300.2", "pause"), ("342.323", "resume"),
+                   ("400.1", "strike"), ("555.5", "strike")]
+        for at, change in changes:
+            if change == "strike":
+                loop.call_at(float(at), lambda: clock.set_speed(clock.speed + 0.25))
+            else:
+                loop.call_at(float(at), clock.stop if change == "pause" else clock.start)
+        clock.start()
+        loop.run()
+
+        expected = _exact_ticks(900, changes)
+        self.assertEqual([second for _, second in ticks], list(range(899, 0, -1)))
+        self.assertEqual(len(expired), 1)
+        for at, second in ticks + [(expired[0], 0)]:
+            self.assertLess(abs(Fraction(at) - expected[second]), Fraction(1, 10 ** 6), f"tick {second} drifted")
+
+    def test_time_left_is_frozen_while_paused(self):
+        loop = ManualLoop()
+        clock = GameClock(lambda _: None, lambda: None, loop=loop)
+        clock.reset(60.0)
+        clock.start()
+        paused_at = []
+        loop.call_at(10.5, clock.stop)
+        loop.call_at(20.0, lambda: paused_at.append(clock.time_left))
+        loop.call_at(30.0, clock.start)
+        loop.call_at(40.0, lambda: paused_at.append(clock.time_left))
+        loop.run()
+        self.assertAlmostEqual(paused_at[0], 49.5)
+        self.assertAlmostEqual(paused_at[1], 39.5)
@@ -0,0 +1,96 @@
+from asyncio import Event, run, sleep as async_sleep, wait_for
+from typing import List, Tuple
+from unittest import TestCase
+
+from bombgame.config import BOMB_CASING, GPIO_INTERRUPT_DEBOUNCE
+from bombgame.gpio import Gpio, ModuleReadyChange
+from bombgame.test.mock import FakeSMBus, FakeInterruptSource
+
+SPECS = list(BOMB_CASING.gpio_config)
+# the chip address and ready pin of each module location
+READY_PINS: List[Tuple[int, int]] = [(spec.mcp23017_addr, pin) for spec in SPECS for pin in spec.ready_pins]
+
+
+def _writes(bus: FakeSMBus) -> int:
+    return bus.transactions["write_byte_data"] + bus.transactions["write_i2c_block_data"]
+
+
+class GpioTest(TestCase):
+    def test_ready_pins_are_polled_with_one_read_per_chip(self):
+        async def test():
+            bus = FakeSMBus([spec.mcp23017_addr for spec in SPECS])
+            # interrupts are never fired by the bus, which keeps the background polling out of the way
+            gpio = Gpio(BOMB_CASING, bus, FakeInterruptSource())
+            gpio.start()
+            # let the first background poll pass
+            await async_sleep(0.05)
+            present = set(await gpio.check_ready_changes())
+            changes = []
+            gpio.add_listener(ModuleReadyChange, changes.append, reentrant=True)
+            levels = {}
+            for location in (0, 5, 6, 11, 5):
+                address, pin = READY_PINS[location]
+                levels[location] = not levels.get(location, False)
+                bus.set_input(address, pin, levels[location])
+                bus.transactions.clear()
+                now_present = set(await gpio.check_ready_changes())
+                self.assertEqual(dict(bus.transactions), {"read_i2c_block_data": len(SPECS)})
+                self.assertEqual(now_present ^ present, {location})
+                self.assertEqual([(change.location, change.present) for change in changes],
+                                 [(location, location in now_present)])
+                changes.clear()
+                present = now_present
+            gpio.stop()
+        run(test())
+
+    def test_outputs_are_written_once_per_changed_chip(self):
+        async def test():
+            bus = FakeSMBus([spec.mcp23017_addr for spec in SPECS])
+            gpio = Gpio(BOMB_CASING, bus, FakeInterruptSource())
+            gpio.start()
+            await gpio.apply(dict.fromkeys(range(BOMB_CASING.capacity), True),
+                             dict.fromkeys(range(BOMB_CASING.widget_capacity), True))
+            bus.transactions.clear()
+            await gpio.reset()
+            self.assertEqual(_writes(bus), len(SPECS))
+            bus.transactions.clear()
+            await gpio.reset()
+            self.assertEqual(_writes(bus), 0)
+            # moving the enable from one location to the next on the same chip
+            await gpio.set_enable(0, True)
+            bus.transactions.clear()
+            await gpio.apply({0: False, 1: True})
+            self.assertEqual(_writes(bus), 1)
+            gpio.stop()
+        run(test())
+
+    def test_bouncing_ready_pins_are_reported_once(self):
+        async def test():
+            interrupts = FakeInterruptSource()
+            bus = FakeSMBus([spec.mcp23017_addr for spec in SPECS], interrupts)
+            gpio = Gpio(BOMB_CASING, bus, interrupts)
+            gpio.start()
+            await gpio.check_ready_changes()
+            changes = []
+            changed = Event()
+
+            def ready_changed(change: ModuleReadyChange):
+                changes.append(change.location)
+                changed.set()
+
+            gpio.add_listener(ModuleReadyChange, ready_changed, reentrant=True)
+            toggled = [0, 7, 11, 7, 3]
+            levels = {}
+            for location in toggled:
+                address, pin = READY_PINS[location]
+                level = levels[location] = not levels.get(location, False)
+                changed.clear()
+                # the contact bounces a few times within the debounce period
+                for bounce in (level, not level, level):
+                    bus.set_input(address, pin, bounce)
+                    await async_sleep(GPIO_INTERRUPT_DEBOUNCE / 5)
+                await wait_for(changed.wait(), 1.0)
+                await async_sleep(GPIO_INTERRUPT_DEBOUNCE * 3)
+            gpio.stop()
+            self.assertEqual(changes, toggled)
+        run(test())
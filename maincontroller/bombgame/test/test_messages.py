@@ -0,0 +1,61 @@
+import pickle
+from unittest import TestCase
+
+import can
+
+from bombgame.bus.messages import BusMessage, BusMessageDecoder, ModuleId
+from bombgame.modules import load_modules
+from bombgame.test.mock import synthetic_frames
+
+
+class ModuleIdTest(TestCase):
+    def test_ids_are_interned(self):
+        self.assertIs(ModuleId(3, 7), ModuleId(3, 7))
+        self.assertIs(ModuleId.of(3, 7), ModuleId(3, 7))
+        self.assertIs(ModuleId(0, 0), ModuleId.BROADCAST)
+        self.assertIsNot(ModuleId(3, 7), ModuleId(3, 8))
+        self.assertEqual(len({ModuleId(3, 7), ModuleId(3, 7), ModuleId(3, 8)}), 2)
+
+    def test_pickling_preserves_identity(self):
+        module_id = ModuleId(5, 12)
+        self.assertIs(pickle.loads(pickle.dumps(module_id)), module_id)
+        self.assertIs(pickle.loads(pickle.dumps(ModuleId.BROADCAST)), ModuleId.BROADCAST)
+
+    def test_ids_are_immutable(self):
+        module_id = ModuleId(3, 7)
+        with self.assertRaises(AttributeError):
+            module_id.serial = 8
+        with self.assertRaises(AttributeError):
+            module_id.other = 1
+        with self.assertRaises(AttributeError):
+            del module_id.type
+        self.assertEqual((module_id.type, module_id.serial), (3, 7))
+
+    def test_invalid_ids_are_rejected(self):
+        for type_, serial in ((-1, 0), (4096, 0), (1, 1024), (0, 1)):
+            with self.assertRaises(ValueError):
+                ModuleId(type_, serial)
+
+
+class BusMessageDecoderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_modules()
+
+    def test_decoder_matches_parse(self):
+        decoder = BusMessageDecoder()
+        for frame in synthetic_frames(2000):
+            decoded = decoder.decode(frame)
+            parsed = BusMessage.parse(frame)
+            self.assertIs(decoded.__class__, parsed.__class__)
+            self.assertIs(decoded.module, parsed.module)
+            self.assertEqual(decoded.direction, parsed.direction)
+            self.assertEqual(str(decoded), str(parsed))
+            serialized = decoded.serialize()
+            self.assertEqual(serialized.arbitration_id, frame.arbitration_id)
+            self.assertEqual(bytes(serialized.data), bytes(frame.data))
+
+    def test_decoder_rejects_invalid_frames(self):
+        decoder = BusMessageDecoder()
+        with self.assertRaises(ValueError):
+            decoder.decode(can.Message(arbitration_id=0x123, is_extended_id=False, data=b""))
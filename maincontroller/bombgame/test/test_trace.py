@@ -0,0 +1,76 @@
+import os
+import tempfile
+from time import monotonic, sleep
+from unittest import TestCase
+
+from bombgame.bus.trace import CanTraceRecorder, CanTrace, TRACE_HEADER, TRACE_RECORD
+from bombgame.modules import load_modules
+from bombgame.test.mock import synthetic_frames
+
+
+class CanTraceTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_modules()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "test.trace")
+
+    def test_round_trip(self):
+        frames = synthetic_frames(500)
+        recorder = CanTraceRecorder(self.path)
+        for index, frame in enumerate(frames):
+            recorder.record(index / 100, frame, index % 3 == 0)
+        recorder.close()
+        with CanTrace(self.path) as trace:
+            self.assertEqual(len(trace), len(frames))
+            self.assertAlmostEqual(trace.duration, (len(frames) - 1) / 100)
+            for index, (record, frame) in enumerate(zip(trace, frames)):
+                self.assertEqual(record.timestamp, index / 100)
+                self.assertEqual(record.outbound, index % 3 == 0)
+                self.assertEqual(record.frame.arbitration_id, frame.arbitration_id)
+                self.assertTrue(record.frame.is_extended_id)
+                self.assertEqual(bytes(record.frame.data), bytes(frame.data))
+
+    def test_records_are_written_within_the_flush_interval(self):
+        recorder = CanTraceRecorder(self.path, flush_interval=0.05)
+        self.addCleanup(recorder.close)
+        for index, frame in enumerate(synthetic_frames(3)):
+            recorder.record(index, frame, False)
+        size = TRACE_HEADER.size + 3 * TRACE_RECORD.size
+        deadline = monotonic() + 1.0
+        while os.path.getsize(self.path) < size and monotonic() < deadline:
+            sleep(0.01)
+        self.assertEqual(os.path.getsize(self.path), size)
+        with CanTrace(self.path) as trace:
+            self.assertEqual([record.timestamp for record in trace], [0, 1, 2])
+
+    def test_appending_drops_a_partial_record(self):
+        frames = synthetic_frames(20)
+        recorder = CanTraceRecorder(self.path)
+        for index, frame in enumerate(frames[:10]):
+            recorder.record(index, frame, False)
+        recorder.close()
+        with open(self.path, "ab") as file:
+            file.write(b"\0" * (TRACE_RECORD.size // 2))
+        with CanTrace(self.path) as trace:
+            self.assertEqual(len(trace), 10)
+        recorder = CanTraceRecorder(self.path)
+        for index, frame in enumerate(frames[10:], 10):
+            recorder.record(index, frame, True)
+        recorder.close()
+        self.assertEqual(os.path.getsize(self.path), TRACE_HEADER.size + 20 * TRACE_RECORD.size)
+        with CanTrace(self.path) as trace:
+            self.assertEqual([record.frame.arbitration_id for record in trace],
+                             [frame.arbitration_id for frame in frames])
+            self.assertEqual([record.outbound for record in trace], [False] * 10 + [True] * 10)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a trace" * 10)
+        with self.assertRaises(ValueError):
+            CanTrace(self.path)
+        with self.assertRaises(ValueError):
+            CanTraceRecorder(self.path)
@@ -0,0 +1,211 @@
+from asyncio import Event, get_running_loop, run, sleep as async_sleep, wait_for
+from contextvars import ContextVar
+from threading import get_ident
+from typing import Any, List, NamedTuple
+from unittest import TestCase
+
+from bombgame.utils import EventSource, OverflowPolicy
+
+TRIGGERED_BY: ContextVar[str] = ContextVar("TRIGGERED_BY", default="nobody")
+
+
+class _Update(NamedTuple):
+    module: int
+    number: int
+
+
+class _Other(NamedTuple):
+    number: int
+
+
+class _SpecialUpdate(_Update):
+    pass
+
+
+class _StalledListener:
+    """A listener that records the events it receives once ``released`` is set."""
+
+    def __init__(self):
+        self.released = Event()
+        self.received: List[Any] = []
+
+    async def listen(self, event):
+        await self.released.wait()
+        self.received.append(event)
+
+    async def drain(self, source: EventSource):
+        self.released.set()
+        while source.listener_stats()[0].depth:
+            await async_sleep(0.001)
+        await async_sleep(0.01)
+
+
+class EventDispatchTest(TestCase):
+    def test_listeners_receive_events_of_their_class_and_subclasses(self):
+        async def test():
+            source = EventSource()
+            received = []
+            source.add_listener(_Update, lambda event: received.append(("update", event)), reentrant=True)
+            source.add_listener(_SpecialUpdate, lambda event: received.append(("special", event)), reentrant=True)
+            source.add_listener(object, lambda event: received.append(("any", event)), reentrant=True)
+            update, special, other = _Update(0, 1), _SpecialUpdate(0, 2), _Other(3)
+            for event in (update, special, other):
+                source.trigger(event)
+            self.assertEqual(received, [("update", update), ("any", update),
+                                        ("update", special), ("special", special), ("any", special),
+                                        ("any", other)])
+        run(test())
+
+    def test_adding_and_removing_listeners_updates_the_dispatch(self):
+        async def test():
+            source = EventSource()
+            received = []
+
+            def first(event):
+                received.append(("first", event.number))
+
+            def second(event):
+                received.append(("second", event.number))
+
+            source.add_listener(_Update, first, reentrant=True)
+            source.trigger(_Update(0, 1))
+            source.add_listener(_Update, second, reentrant=True)
+            source.trigger(_Update(0, 2))
+            source.remove_listener(_Update, first)
+            source.trigger(_Update(0, 3))
+            self.assertEqual(received, [("first", 1), ("first", 2), ("second", 2), ("second", 3)])
+            with self.assertRaises(ValueError):
+                source.remove_listener(_Update, first)
+            # queued listeners are indexed the same way
+            source.add_listener(_Update, first)
+            source.trigger(_SpecialUpdate(0, 4))
+            await async_sleep(0.01)
+            self.assertEqual(received[4:], [("second", 4), ("first", 4)])
+        run(test())
+
+
+class LoopFastPathTest(TestCase):
+    def test_reentrant_listeners_run_before_trigger_returns_on_the_loop(self):
+        async def test():
+            source = EventSource()
+            received = []
+            source.add_listener(_Update, lambda event: received.append(event.number), reentrant=True)
+            source.trigger(_Update(0, 1))
+            self.assertEqual(received, [1])
+        run(test())
+
+    def test_triggers_from_other_threads_run_listeners_on_the_loop(self):
+        async def test():
+            source = EventSource()
+            loop_thread = get_ident()
+            threads = []
+            done = Event()
+
+            def listener(_):
+                threads.append(get_ident())
+                done.set()
+
+            source.add_listener(_Update, listener, reentrant=True)
+            await get_running_loop().run_in_executor(None, source.trigger, _Update(0, 1))
+            await wait_for(done.wait(), 1.0)
+            self.assertEqual(threads, [loop_thread])
+        run(test())
+
+    def test_queued_events_run_in_the_context_of_their_trigger(self):
+        async def test():
+            source = EventSource()
+            received = []
+            released = Event()
+
+            async def listener(event):
+                await released.wait()
+                received.append((event.number, TRIGGERED_BY.get()))
+
+            source.add_listener(_Update, listener, overflow=OverflowPolicy.COALESCE,
+                                coalesce_key=lambda event: event.module)
+            for number in range(1, 7):
+                TRIGGERED_BY.set(f"trigger {number}")
+                source.trigger(_Update(number % 2, number))
+            released.set()
+            await async_sleep(0.01)
+            # a coalesced event keeps its place in the queue, but runs in the context of the trigger that replaced it
+            self.assertEqual(received, [(5, "trigger 5"), (6, "trigger 6")])
+        run(test())
+
+
+class ListenerQueueTest(TestCase):
+    def test_drop_oldest_keeps_the_newest_events(self):
+        async def test():
+            source = EventSource()
+            listener = _StalledListener()
+            source.add_listener(_Update, listener.listen, queue_size=8)
+            for number in range(100):
+                source.trigger(_Update(0, number))
+            stats = source.listener_stats()[0]
+            self.assertEqual(stats.max_depth, 8)
+            await listener.drain(source)
+            # the consumer only starts once the loop runs, so all events went through the queue
+            self.assertEqual([event.number for event in listener.received], list(range(92, 100)))
+            self.assertEqual(source.listener_stats()[0].dropped, 92)
+        run(test())
+
+    def test_coalesce_keeps_the_latest_event_per_key_in_place(self):
+        async def test():
+            source = EventSource()
+            listener = _StalledListener()
+            source.add_listener(_Update, listener.listen, queue_size=8, overflow=OverflowPolicy.COALESCE,
+                                coalesce_key=lambda event: event.module)
+            source.trigger(_Update(9, 0))
+            await async_sleep(0)
+            for number in range(1, 61):
+                source.trigger(_Update(number % 3, number))
+            await listener.drain(source)
+            self.assertEqual(listener.received, [_Update(9, 0), _Update(1, 58), _Update(2, 59), _Update(0, 60)])
+            stats = source.listener_stats()[0]
+            self.assertEqual((stats.dropped, stats.coalesced), (0, 57))
+        run(test())
+
+    def test_block_waits_for_space_off_the_loop(self):
+        async def test():
+            source = EventSource()
+            listener = _StalledListener()
+            source.add_listener(_Update, listener.listen, queue_size=4, overflow=OverflowPolicy.BLOCK)
+
+            def trigger_all():
+                for number in range(50):
+                    source.trigger(_Update(0, number))
+
+            get_running_loop().call_later(0.1, listener.released.set)
+            await wait_for(get_running_loop().run_in_executor(None, trigger_all), 5.0)
+            await listener.drain(source)
+            self.assertEqual([event.number for event in listener.received], list(range(50)))
+            stats = source.listener_stats()[0]
+            self.assertEqual((stats.max_depth, stats.dropped), (4, 0))
+        run(test())
+
+    def test_block_gives_up_once_closed(self):
+        async def test():
+            source = EventSource()
+            listener = _StalledListener()
+            source.add_listener(_Update, listener.listen, queue_size=4, overflow=OverflowPolicy.BLOCK)
+
+            def trigger_all():
+                for number in range(50):
+                    source.trigger(_Update(0, number))
+
+            get_running_loop().call_later(0.1, source.close_listener_queues)
+            await wait_for(get_running_loop().run_in_executor(None, trigger_all), 5.0)
+            self.assertGreater(source.listener_stats()[0].dropped, 0)
+            await listener.drain(source)
+        run(test())
+
+    def test_block_does_not_wait_on_the_loop(self):
+        async def test():
+            source = EventSource()
+            listener = _StalledListener()
+            source.add_listener(_Update, listener.listen, queue_size=4, overflow=OverflowPolicy.BLOCK)
+            for number in range(50):
+                source.trigger(_Update(0, number))
+            self.assertEqual(source.listener_stats()[0].dropped, 46)
+            await listener.drain(source)
+        run(test())
@@ -1,55 +1,337 @@
 from abc import ABC, abstractmethod
-from asyncio import get_running_loop, iscoroutinefunction, Lock as AsyncLock, run_coroutine_threadsafe, CancelledError
+from asyncio import (get_running_loop, iscoroutinefunction, run_coroutine_threadsafe, sleep, current_task, CancelledError,
+                     shield, Future as AsyncFuture)
 from asyncio.locks import Event
 from collections import deque
 from concurrent.futures import Executor, Future
+from contextvars import copy_context
+from enum import Enum, auto
 from logging import getLogger
 from signal import SIGINT
-from threading import Thread, RLock, Condition
-from typing import Any, Union, Callable, NamedTuple, Awaitable, Dict, TypeVar, Deque, Tuple, Sequence, Mapping
+from threading import Thread, Lock, RLock, Condition, get_ident
+from typing import (Any, Union, Callable, NamedTuple, Awaitable, Dict, TypeVar, Deque, Tuple, Sequence, Mapping,
+                    Optional, List)
+
+from bombgame.config import EVENT_QUEUE_SIZE
 
 K = TypeVar("K")
 V = TypeVar("V")
 T = TypeVar("T")
 
 
+class OverflowPolicy(Enum):
+    """What a listener queue does when an event is queued while the queue is full."""
+    #: discard the oldest queued event
+    DROP_OLDEST = auto()
+    #: replace a queued event with the same key (see ``coalesce_key``) in place, otherwise discard the oldest one
+    COALESCE = auto()
+    #: wait for the listener to make space when triggered from another thread, otherwise discard the oldest event
+    BLOCK = auto()
+
+
+class ListenerStats(NamedTuple):
+    """Statistics of the event queue of a non-reentrant listener."""
+    eventclass: type
+    callback: Callable[[Any], Any]
+    depth: int
+    max_depth: int
+    dropped: int
+    coalesced: int
+
+
+class _ListenerQueue:
+    """An ordered queue of events to a single non-reentrant listener.
+
+    Events are delivered one at a time by a consumer task that is started when the first event is queued and exits
+    when the queue is empty. Each event is handled in the context it was triggered in. The queue may be appended to
+    from any thread.
+    """
+
+    __slots__ = ("callback", "size", "overflow", "coalesce_key", "max_depth", "dropped", "coalesced",
+                 "_loop", "_items", "_keyed", "_lock", "_space", "_space_waiter", "_running", "_overflowing", "_closed")
+
+    def __init__(self, loop, callback: Callable[[Any], Any], size: int, overflow: OverflowPolicy,
+                 coalesce_key: Optional[Callable[[Any], Any]]):
+        self.callback = callback
+        self.size = size
+        self.overflow = overflow
+        self.coalesce_key = coalesce_key
+        self.max_depth = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._loop = loop
+        # the items are [event, context] lists so that coalescing can replace an event without moving it
+        self._items: Deque[list] = deque()
+        self._keyed: Dict[Any, list] = {}
+        self._lock = Lock()
+        self._space = Condition(self._lock)
+        # a future on the loop waiting for space, see wait_for_space
+        self._space_waiter: Optional[AsyncFuture] = None
+        self._running = False
+        self._overflowing = False
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    @property
+    def blocked(self) -> bool:
+        """Whether the queue is full and still open, so that events triggered off the loop would wait for space."""
+        return len(self._items) >= self.size and not self._closed
+
+    def put(self, event: Any, on_loop: bool) -> None:
+        with self._lock:
+            if self.coalesce_key is not None:
+                key = self.coalesce_key(event)
+                item = self._keyed.get(key)
+                if item is not None:
+                    item[0] = event
+                    item[1] = copy_context()
+                    self.coalesced += 1
+                    return
+            if len(self._items) >= self.size:
+                self._make_space(on_loop)
+            item = [event, copy_context()]
+            self._items.append(item)
+            if self.coalesce_key is not None:
+                self._keyed[key] = item
+            self.max_depth = max(self.max_depth, len(self._items))
+            if self._running:
+                return
+            self._running = True
+        if on_loop:
+            self._loop.create_task(self._consume())
+        else:
+            self._loop.call_soon_threadsafe(self._loop.create_task, self._consume())
+
+    def close(self):
+        """Stops triggering threads from waiting for space in the queue."""
+        with self._lock:
+            self._closed = True
+            self._space.notify_all()
+        if self._space_waiter is not None:
+            self._loop.call_soon_threadsafe(self._wake_space_waiter)
+
+    async def wait_for_space(self):
+        """Waits on the loop thread until the queue is not full or has been closed."""
+        while self.blocked:
+            if self._space_waiter is None:
+                self._space_waiter = self._loop.create_future()
+            await shield(self._space_waiter)
+
+    def _wake_space_waiter(self):
+        if self._space_waiter is not None:
+            if not self._space_waiter.done():
+                self._space_waiter.set_result(None)
+            self._space_waiter = None
+
+    def _make_space(self, on_loop: bool):
+        if self.overflow == OverflowPolicy.BLOCK:
+            # waiting for the consumer on the loop thread would deadlock, and once the source is closed or the loop
+            # has stopped, nothing may be left to make space
+            if not on_loop:
+                while len(self._items) >= self.size and not self._closed and self._loop.is_running():
+                    self._space.wait(0.1)
+                if len(self._items) < self.size:
+                    return
+            if not self._overflowing:
+                getLogger("EventSource").warning("Event queue of %s full, dropping the oldest events",
+                                                 _callback_name(self.callback))
+                self._overflowing = True
+        self._drop_oldest()
+
+    def _drop_oldest(self):
+        dropped = self._items.popleft()
+        if self.coalesce_key is not None:
+            self._forget(dropped)
+        self.dropped += 1
+
+    def _forget(self, item: list):
+        key = self.coalesce_key(item[0])
+        if self._keyed.get(key) is item:
+            del self._keyed[key]
+
+    def _take(self) -> Optional[list]:
+        with self._lock:
+            if not self._items:
+                self._running = False
+                self._overflowing = False
+                return None
+            item = self._items.popleft()
+            if self.coalesce_key is not None:
+                self._forget(item)
+            self._space.notify()
+        # called on the loop thread by the consumer
+        self._wake_space_waiter()
+        return item
+
+    async def _consume(self):
+        current_task().set_name(f"listener {_callback_name(self.callback)}")
+        is_async = iscoroutinefunction(self.callback)
+        while True:
+            item = self._take()
+            if item is None:
+                return
+            event, context = item
+            try:
+                if is_async:
+                    # a task runs in a copy of the context it is created in
+                    await context.run(self._loop.create_task, self.callback(event))
+                else:
+                    context.run(self.callback, event)
+                    await sleep(0)
+            except CancelledError:
+                with self._lock:
+                    self._running = False
+                raise
+            except Exception as ex:  # pylint: disable=broad-except
+                _report_listener_error(self._loop, self.callback, event, ex)
+
+
 class EventSource:
-    """A mixin class that provides event listener functionality."""
+    """A mixin class that provides event listener functionality.
+
+    Listeners are indexed by event class: the listeners matching a class (including its base classes) are resolved
+    once and memoized until a listener is added or removed, so triggering an event only touches its listeners.
+
+    Events may be triggered from any thread. When triggered from the event loop's own thread, listeners are scheduled
+    directly on the loop, and non-async reentrant listeners are called synchronously before ``trigger`` returns.
+
+    Non-reentrant listeners receive events in order through a bounded queue of their own (see ``add_listener``).
+    Call ``close_listener_queues`` when the source stops, so that no triggering thread stays blocked on a full queue.
+    A source that reads its events on the loop thread can't block, so it should stop reading while
+    ``listener_queues_full`` and resume after ``wait_for_listener_queues``.
+    """
 
     def __init__(self):
-        self.__listeners = []
+        self.__listeners = ()
+        self.__blocking_queues = ()
+        self.__dispatch = {}
         self.__loop = get_running_loop()
-
-    def add_listener(self, eventclass: type, callback: Callable[[Any], Any], reentrant: bool = False) -> None:
-        lock = None if reentrant else AsyncLock()
-        self.__listeners.append((eventclass, callback, lock))
+        self.__loop_thread = get_ident()
+
+    def add_listener(self, eventclass: type, callback: Callable[[Any], Any], reentrant: bool = False, *,
+                     queue_size: Optional[int] = None, overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                     coalesce_key: Optional[Callable[[Any], Any]] = None) -> None:
+        """Adds a listener for events of the given class and its subclasses.
+
+        Reentrant listeners are invoked for each event as soon as it is triggered. Other listeners are invoked one
+        event at a time, in order, from a queue holding up to ``queue_size`` events (``EVENT_QUEUE_SIZE`` by default);
+        ``overflow`` decides what happens when the queue is full, by default dropping the oldest queued event. With
+        ``OverflowPolicy.COALESCE``, ``coalesce_key`` must be given, and a queued event is replaced by a new event with
+        the same key.
+        """
+        if reentrant:
+            if queue_size is not None or coalesce_key is not None or overflow != OverflowPolicy.DROP_OLDEST:
+                raise ValueError("reentrant listeners have no queue")
+            queue = None
+        else:
+            if (overflow == OverflowPolicy.COALESCE) != (coalesce_key is not None):
+                raise ValueError("coalesce_key must be given if and only if using OverflowPolicy.COALESCE")
+            if queue_size is None:
+                queue_size = EVENT_QUEUE_SIZE
+            if queue_size < 1:
+                raise ValueError("queue_size must be positive")
+            queue = _ListenerQueue(self.__loop, callback, queue_size, overflow, coalesce_key)
+        self.__listeners = (*self.__listeners, (eventclass, callback, queue))
+        self.__update_blocking_queues()
+        self.__dispatch = {}
 
     def remove_listener(self, eventclass: type, callback: Callable[[Any], Any]) -> None:
+        remaining = tuple(listener for listener in self.__listeners
+                          if listener[0] != eventclass or listener[1] != callback)
+        if len(remaining) == len(self.__listeners):
+            raise ValueError("listener not found")
+        for (_, _, queue) in set(self.__listeners) - set(remaining):
+            if queue is not None:
+                queue.close()
+        self.__listeners = remaining
+        self.__update_blocking_queues()
+        self.__dispatch = {}
+
+    def __update_blocking_queues(self):
+        self.__blocking_queues = tuple(queue for (_, _, queue) in self.__listeners
+                                       if queue is not None and queue.overflow == OverflowPolicy.BLOCK)
+
+    def close_listener_queues(self) -> None:
+        """Makes threads that are blocked triggering events into full listener queues give up waiting.
+
+        Events triggered afterwards never block, so call this before waiting for a triggering thread to exit.
+        """
+        for (_, _, queue) in self.__listeners:
+            if queue is not None:
+                queue.close()
+
+    def listener_queues_full(self) -> bool:
+        """Returns whether the open queue of a listener with ``OverflowPolicy.BLOCK`` is full.
+
+        The next event triggered on the loop thread would then drop the oldest event queued for that listener.
+        """
+        return any(queue.blocked for queue in self.__blocking_queues)
+
+    async def wait_for_listener_queues(self) -> None:
+        """Waits until no queue of a listener with ``OverflowPolicy.BLOCK`` is full or the queues are closed."""
+        while self.listener_queues_full():
+            for queue in self.__blocking_queues:
+                await queue.wait_for_space()
+
+    def listener_stats(self) -> List[ListenerStats]:
+        """Returns the queue statistics of the non-reentrant listeners."""
+        return [ListenerStats(eventclass, callback, queue.depth, queue.max_depth, queue.dropped, queue.coalesced)
+                for (eventclass, callback, queue) in self.__listeners if queue is not None]
+
+    def _listeners_for(self, eventclass: type) -> Tuple[Tuple[type, Callable[[Any], Any], Optional[_ListenerQueue]],
+                                                        ...]:
+        """Returns the listeners that should receive events of the given class, in the order they were added."""
+        # may be called from other threads, so only touch the current dispatch dict and listener tuple
+        dispatch = self.__dispatch
         try:
-            for listener in self.__listeners:
-                if listener[0] == eventclass and listener[1] == callback:
-                    self.__listeners.remove(listener)
-        except ValueError:
-            raise ValueError("listener not found") from None
+            return dispatch[eventclass]
+        except KeyError:
+            matching = tuple(listener for listener in self.__listeners if issubclass(eventclass, listener[0]))
+            dispatch[eventclass] = matching
+            return matching
 
     def trigger(self, event: Any) -> None:
         getLogger("EventSource").debug("%s raised on %s", event, self)
-        for (eventclass, callback, lock) in self.__listeners:
-            if isinstance(event, eventclass):
-                run_coroutine_threadsafe(log_errors(_call_event(callback, lock, event)), self.__loop)
-
-
-async def _call_event(callback, lock, event):
-    if lock is not None:
-        await lock.acquire()
+        listeners = self._listeners_for(event.__class__)
+        on_loop = get_ident() == self.__loop_thread
+        for (_, callback, queue) in listeners:
+            if queue is not None:
+                queue.put(event, on_loop)
+            elif not on_loop:
+                run_coroutine_threadsafe(_run_listener(callback, event), self.__loop)
+            elif iscoroutinefunction(callback):
+                self.__loop.create_task(_run_listener(callback, event))
+            else:
+                try:
+                    callback(event)
+                except Exception as ex:  # pylint: disable=broad-except
+                    _report_listener_error(self.__loop, callback, event, ex)
+
+
+def _callback_name(callback) -> str:
+    return getattr(callback, "__qualname__", repr(callback))
+
+
+def _report_listener_error(loop, callback, event, ex):
+    loop.call_exception_handler({
+        "message": f"Error in listener {_callback_name(callback)} for {event!r}",
+        "exception": ex,
+    })
+
+
+async def _run_listener(callback, event):
+    # name the task after the listener so that e.g. slow callbacks can be attributed to it
+    current_task().set_name(f"listener {_callback_name(callback)}")
     try:
         if iscoroutinefunction(callback):
             await callback(event)
         else:
             callback(event)
-    finally:
-        if lock is not None:
-            lock.release()
+    except Exception as ex:  # pylint: disable=broad-except
+        _report_listener_error(get_running_loop(), callback, event, ex)
 
 
 class Registry(Dict[K, V]):
@@ -62,8 +344,7 @@ class Registry(Dict[K, V]):
 
     def __init__(self, field: Union[None, str] = None):
         super().__init__()
-        if field is not None:
-            self._field = field
+        self._field = field
 
     def register(self, id_or_class: T) -> T:
         """
@@ -3,15 +3,16 @@ from __future__ import annotations
 import json
 from asyncio import wait_for, TimeoutError as AsyncTimeoutError
 from logging import getLogger
-from typing import Optional, Any, Mapping, ClassVar, TYPE_CHECKING, Union
+from typing import Optional, Any, Mapping, ClassVar, TYPE_CHECKING, Union, List
 
 from websockets import WebSocketServerProtocol
 
 from bombgame.bomb.state import BombState
 from bombgame.config import WEB_WS_PORT, WEB_PASSWORD, WEB_LOGIN_TIMEOUT
 from bombgame.events import BombError, BombModuleAdded, BombStateChanged, ModuleStateChanged, BombChanged
+from bombgame.metrics import LATENCY
 from bombgame.modules.base import Module
-from bombgame.utils import EventSource, Registry, Ungettable
+from bombgame.utils import EventSource, Registry, Ungettable, OverflowPolicy
 from bombgame.websocket import (SingleClientWebSocketServer, InvalidMessage, close_client_invalid_message)
 
 if TYPE_CHECKING:
@@ -110,6 +111,42 @@ class UnpauseGameMessage(WebInterfaceMessage):
     receivable = True
 
 
+@MESSAGE_TYPE_REGISTRY.register
+class GetLatencyMessage(WebInterfaceMessage):
+    message_type = "get_latency"
+    fields = {}
+    receivable = True
+
+
+@MESSAGE_TYPE_REGISTRY.register
+class LatencyMessage(WebInterfaceMessage):
+    message_type = "latency"
+    fields = {"histograms": dict}
+
+    def __init__(self, histograms: Mapping[str, Mapping[str, Any]]):
+        super().__init__()
+        self.histograms = histograms
+
+
+@MESSAGE_TYPE_REGISTRY.register
+class GetLoopStatsMessage(WebInterfaceMessage):
+    message_type = "get_loop_stats"
+    fields = {}
+    receivable = True
+
+
+@MESSAGE_TYPE_REGISTRY.register
+class LoopStatsMessage(WebInterfaceMessage):
+    message_type = "loop_stats"
+    fields = {"samples": int, "lag": dict, "slow_callbacks": list}
+
+    def __init__(self, *, samples: int, lag: Mapping[str, float], slow_callbacks: List[Mapping[str, Any]]):
+        super().__init__()
+        self.samples = samples
+        self.lag = lag
+        self.slow_callbacks = slow_callbacks
+
+
 @MESSAGE_TYPE_REGISTRY.register
 class BombInfoMessage(WebInterfaceMessage):
     message_type = "bomb"
@@ -231,8 +268,10 @@ class WebInterface(EventSource, SingleClientWebSocketServer):
         await self._send(BombInfoMessage(*event.bomb.edgework.serialize()))
         event.bomb.add_listener(BombModuleAdded, self._handle_module_add)
         event.bomb.add_listener(BombStateChanged, self._handle_bomb_state)
-        event.bomb.add_listener(ModuleStateChanged, self._handle_module_update)
-        event.bomb.add_listener(BombError, self._log_bomb_error)
+        # a slow client only needs the latest state of each module, and may miss errors instead of stalling the bomb
+        event.bomb.add_listener(ModuleStateChanged, self._handle_module_update,
+                                overflow=OverflowPolicy.COALESCE, coalesce_key=lambda update: update.module)
+        event.bomb.add_listener(BombError, self._log_bomb_error, overflow=OverflowPolicy.DROP_OLDEST)
 
     async def _handle_message(self, client: WebSocketServerProtocol, data: Union[str, bytes]):
         message = await _parse_message_from_client(client, data)
@@ -245,6 +284,14 @@ class WebInterface(EventSource, SingleClientWebSocketServer):
             self._controller.bomb.start_game()
         elif isinstance(message, StartTimerMessage):
             self._controller.bomb.start_timer()
+        elif isinstance(message, PauseGameMessage):
+            self._controller.bomb.pause_game()
+        elif isinstance(message, UnpauseGameMessage):
+            self._controller.bomb.resume_game()
+        elif isinstance(message, GetLatencyMessage):
+            await self._send(LatencyMessage(LATENCY.summary()), client)
+        elif isinstance(message, GetLoopStatsMessage):
+            await self._send(LoopStatsMessage(**self._controller.monitor.summary()), client)
         else:
             await close_client_invalid_message(client, "invalid message type")
 